@@ -28,15 +28,41 @@ import logging
 import re
 import argparse
 import sys
+import atexit
+import queue
+import logging.handlers
+import select
+import struct
+import ctypes
+import ctypes.util
+import functools
+import contextlib
+import cProfile
 import webbrowser
+import json
+import hashlib
+import sqlite3
+import io
+import errno
+import fnmatch
+import tomllib
+import stat
+import socket
+import heapq
+import math
+import threading
+import contextvars
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
 # =============================================================================
-# DORMANT BASE DATA (Future validation - not yet used)
+# BASE DATA (Template and basefit names for the filename tokenizer)
 # =============================================================================
 
-# Dormant template list for future validation
+# Template names recognised at the start of file and folder names
 TEMPLATES = [
     "abby1", "abigail1", "base1", "abiola1", "abira1", "adair1", "addison1", 
     "adeline1", "adelita1", "adelka1", "adiel1", "adrianna1", "agasha1", "ailsa1", 
@@ -97,7 +123,7 @@ TEMPLATES = [
     "willow1", "wonder1", "wren1", "yazmin1", "york1", "zulah1"
 ]
 
-# Dormant basefit ID list for future matching (sorted by descending length)
+# Basefit IDs; the tokenizer always takes the longest one that fits, whatever the order here
 BASEFIT_IDS = [
     "U403RTB", "U102RM", "U102RV", "U102RSH", "U102RC", "U101RV", "U101RSH", 
     "U101RM", "U101RC", "U102SH", "U102M", "U102C", "U101SH", "U101C", "U101M", 
@@ -137,6 +163,9 @@ SUPPORTED_EXTENSIONS = []
 for extensions in EXTENSION_MAPPING.values():
     SUPPORTED_EXTENSIONS.extend(extensions)
 
+# Rule file picked up from the working directory or next to the script/.exe (see --rules)
+RULES_FILENAMES = ["template_fixer_rules.toml", "template_fixer_rules.json"]
+
 # Execution modes
 EXECUTION_MODES = {
     1: "Normal Mode: Move misplaced files without overwriting anything  \n  -CLICK THIS FOR FIRST TIME SETUP OF FOLDERS\n",
@@ -149,6 +178,43 @@ EXECUTION_MODES = {
 # ARGUMENT PARSING
 # =============================================================================
 
+def positive_int(value):
+    """Argparse type for options that need a count of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a whole number, got '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def positive_float(value):
+    """Argparse type for intervals that must be above 0."""
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number, got '{value}'")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be above 0, got {number}")
+    return number
+
+def fuzzy_threshold(value):
+    """Argparse type for --auto-fuzzy: a score above 0 and at most 1."""
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number, got '{value}'")
+    if not 0 < number <= 1:
+        raise argparse.ArgumentTypeError(f"must be above 0 and at most 1, got {number}")
+    return number
+
+def shard_spec(value):
+    """Argparse type for --shard: i/N with 1 <= i <= N."""
+    try:
+        return ShardSpec.parse(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
@@ -167,6 +233,18 @@ Examples:
   python Template_Folder_fixer.py --clean --debug
   python Template_Folder_fixer.py --reset-overwrite --no-prompt
   python Template_Folder_fixer.py --mode 3 --debug --dry-run
+  python Template_Folder_fixer.py --clean --workers 8 --no-prompt
+  python Template_Folder_fixer.py --mode 3 --plan-out plan.jsonl --no-prompt
+  python Template_Folder_fixer.py --apply plan.jsonl
+  python Template_Folder_fixer.py --resume
+  python Template_Folder_fixer.py --rollback
+  python Template_Folder_fixer.py --clean --incremental --no-prompt
+  python Template_Folder_fixer.py --clean --dedup-links --no-prompt
+  python Template_Folder_fixer.py --watch --quiet-console
+  python Template_Folder_fixer.py --clean --no-prompt --quiet-console --progress --heartbeat progress.jsonl
+  python Template_Folder_fixer.py --clean --roots-file roots.txt --processes 8 --metrics-out batch.json
+  python Template_Folder_fixer.py --clean --shard 2/4 --no-prompt --metrics-out shard2.json
+  python Template_Folder_fixer.py --merge-metrics shard1.json shard2.json shard3.json shard4.json --metrics-out run.json
         """
     )
     
@@ -185,35 +263,150 @@ Examples:
                        help='Skip execution confirmation prompt (defaults to Mode 1 if --mode not specified)')
     parser.add_argument('--log-dir', type=str, default=None,
                        help='Custom directory for log file (default: current directory)')
+    plan_group = parser.add_mutually_exclusive_group()
+    plan_group.add_argument('--plan-out', type=str, default=None, metavar='PLAN',
+                       help='Compute the operations without touching any files and write them to a JSON Lines plan (implies --dry-run)')
+    plan_group.add_argument('--apply', type=str, default=None, metavar='PLAN',
+                       help='Apply a plan written by --plan-out without rescanning or matching')
+    plan_group.add_argument('--resume', action='store_true',
+                       help='Continue an interrupted run from its journal, skipping component folders it finished')
+    plan_group.add_argument('--rollback', action='store_true',
+                       help='Undo the run recorded in the journal (finished or interrupted)')
+    plan_group.add_argument('--watch', action='store_true',
+                       help='Keep running and file new root files as they are dropped (Ctrl+C to stop)')
+    parser.add_argument('--journal', type=str, default=None, metavar='FILE',
+                       help=f'Operation journal for --resume/--rollback (default: {JOURNAL_FILENAME} in the log directory or working directory)')
+    parser.add_argument('--no-journal', action='store_true',
+                       help='Do not journal operations (the run can then not be resumed or rolled back)')
+    parser.add_argument('--keep-trash', action='store_true',
+                       help=f'Keep files a journaled run overwrites or purges in {JOURNAL_TRASH_DIRNAME} after it finishes, '
+                            'so --rollback can restore them (uses as much disk space as those files; '
+                            'by default the trash is emptied when the run finishes)')
+    parser.add_argument('--rules', type=str, default=None, metavar='FILE',
+                       help=f'TOML or JSON sorting rules (default: {RULES_FILENAMES[0]} or {RULES_FILENAMES[1]} in the working directory or next to the program, else the built-in rules)')
+    parser.add_argument('--fd-relative', action='store_true',
+                       help='Work on open directory descriptors instead of full paths during cleanup and sorting (Linux/macOS)')
+    parser.add_argument('--auto-fuzzy', type=fuzzy_threshold, default=None, metavar='THRESHOLD',
+                       help='Move unmatched root files to their closest folder when its name scores at least THRESHOLD (0-1, e.g. 0.85)')
+    parser.add_argument('--dedup-links', action='store_true',
+                       help='Replace files left in place as identical duplicates (and identical name_N copies) with reflinks, or hard links, to the kept copy and report the space reclaimed')
+    parser.add_argument('--shard', type=shard_spec, default=None, metavar='I/N',
+                       help='Process only shard I of N of the root, so N processes (on any nodes) can split one shared root')
+    parser.add_argument('--merge-metrics', nargs='+', default=None, metavar='FILE',
+                       help='Combine the --metrics-out reports of several shards into the --metrics-out file and exit')
+    parser.add_argument('--roots', nargs='+', default=None, metavar='ROOT',
+                       help='Process these root folders in batch instead of the working directory (headless, no prompts)')
+    parser.add_argument('--roots-file', type=str, default=None, metavar='FILE',
+                       help='Read batch root folders from FILE, one per line')
+    parser.add_argument('--processes', type=positive_int, default=None,
+                       help='Worker processes for batch mode (default: one per CPU, at most one per root)')
+    parser.add_argument('--poll-interval', type=positive_float, default=0.5, metavar='SECONDS',
+                       help='How often --watch lists the root where inotify is unavailable (default: 0.5)')
+    parser.add_argument('--hash-cache', type=str, default=None, metavar='DB',
+                       help=f'Hash cache database for duplicate detection (default: {HASH_CACHE_FILENAME} in the log directory or working directory)')
+    parser.add_argument('--no-hash-cache', action='store_true',
+                       help='Do not keep file hashes between runs')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Skip folders and root files unchanged since the last run')
+    parser.add_argument('--manifest', type=str, default=None, metavar='DB',
+                       help=f'Manifest database for --incremental (default: {MANIFEST_FILENAME} in the log directory or working directory)')
     parser.add_argument('--debug', action='store_true',
                        help='Enable debug-level logging for detailed operation tracking')
+    parser.add_argument('--metrics-out', type=str, default=None, metavar='FILE',
+                       help='Write per-phase timings, call and filesystem-call counts, bytes moved and per-folder timings as JSON')
+    parser.add_argument('--profile', type=str, default=None, metavar='FILE',
+                       help='Run under cProfile and write the stats to FILE (read with python -m pstats)')
+    parser.add_argument('--progress', action='store_true',
+                       help='Log a live progress line (phase, current folder, files/s, MB/s, ETA) every --progress-interval seconds')
+    parser.add_argument('--heartbeat', type=str, default=None, metavar='FILE',
+                       help='Append the same progress data to FILE as one JSON object per line every --progress-interval seconds, for job monitoring')
+    parser.add_argument('--progress-interval', type=positive_float, default=2.0, metavar='SECONDS',
+                       help='How often --progress and --heartbeat report (default: 2)')
+    parser.add_argument('--quiet-console', action='store_true',
+                       help='Print phase progress and the summary instead of one line per file (the log file keeps every line)')
+    parser.add_argument('--workers', type=positive_int, default=1,
+                       help='Number of component folders to process in parallel (default: 1)')
+    parser.add_argument('--scan-threads', type=positive_int, default=1,
+                       help='Maximum concurrent directory reads while scanning a folder tree (default: 1)')
+    
+    args = parser.parse_args()
+    
+    # Planning never touches files
+    if args.plan_out:
+        args.dry_run = True
+    
+    if (args.roots or args.roots_file) and (args.plan_out or args.apply or args.watch or args.profile
+                                            or args.resume or args.rollback):
+        parser.error("--roots/--roots-file cannot be combined with --plan-out, --apply, --watch, --profile, "
+                     "--resume or --rollback")
     
-    return parser.parse_args()
+    if args.shard and (args.roots or args.roots_file or args.apply or args.watch or args.incremental):
+        parser.error("--shard cannot be combined with --roots, --roots-file, --apply, --watch or --incremental")
+    
+    if args.merge_metrics and not args.metrics_out:
+        parser.error("--merge-metrics needs --metrics-out for the combined report")
+    
+    return args
 
 # =============================================================================
 # LOGGING SETUP
 # =============================================================================
 
-def setup_logging(log_dir=None, mode=1, dry_run=False, debug=False):
-    """Setup logging configuration for the script."""
+# Pass as extra= to keep a record on the console under --quiet-console
+CONSOLE_EXTRA = {'console': True}
+
+_log_listener = None
+_quiet_console = False
+
+class _QuietConsoleFilter(logging.Filter):
+    """Console filter for --quiet-console: only errors and records logged
+    with CONSOLE_EXTRA (phase headers, progress, summary) get through."""
+
+    def filter(self, record):
+        return record.levelno >= logging.ERROR or getattr(record, 'console', False)
+
+def log_file_path(log_dir=None):
+    """Path of the log file, creating log_dir if needed."""
     if log_dir:
         os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, "template_fixer_log.txt")
-    else:
-        log_file = "template_fixer_log.txt"
+        return os.path.join(log_dir, "template_fixer_log.txt")
+    return "template_fixer_log.txt"
+
+def setup_logging(log_dir=None, mode=1, dry_run=False, debug=False, quiet_console=False,
+                  log_file=None, console=True):
+    """Setup logging configuration for the script.
+    Callers only enqueue records; a QueueListener thread formats them (adding
+    the timestamp) and writes the log file and console. log_file overrides
+    the file in log_dir; console=False writes the log file only."""
+    global _log_listener, _quiet_console
+    if log_file is None:
+        log_file = log_file_path(log_dir)
     
     # Set logging level based on debug flag
     log_level = logging.DEBUG if debug else logging.INFO
     
+    formatter = logging.Formatter('[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    file_handler = logging.FileHandler(log_file, mode='a', encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        if quiet_console:
+            console_handler.addFilter(_QuietConsoleFilter())
+        handlers.append(console_handler)
+    _quiet_console = quiet_console and console
+    
+    # Writing happens on the listener thread, off the move loop
+    shutdown_logging()
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    
     # Configure logging
-    logging.basicConfig(
-        level=log_level,
-        format='%(message)s',
-        handlers=[
-            logging.FileHandler(log_file, mode='a', encoding='utf-8'),
-            logging.StreamHandler()
-        ]
-    )
+    logging.basicConfig(level=log_level, handlers=[queue_handler], force=True)
     
     logger = logging.getLogger(__name__)
     
@@ -221,11 +414,333 @@ def setup_logging(log_dir=None, mode=1, dry_run=False, debug=False):
     mode_name = EXECUTION_MODES.get(mode, f"Unknown Mode {mode}")
     dry_run_text = " (DRY RUN)" if dry_run else ""
     debug_text = " (DEBUG)" if debug else ""
-    logger.info(f"[{get_timestamp()}] 🚀 Template Folder Fixer v{__version__} started")
-    logger.info(f"[{get_timestamp()}] 🎯 Execution Mode: {mode} - {mode_name}{dry_run_text}{debug_text}")
+    logger.info("🚀 Template Folder Fixer v%s started", __version__, extra=CONSOLE_EXTRA)
+    logger.info("🎯 Execution Mode: %s - %s%s%s", mode, mode_name, dry_run_text, debug_text,
+                extra=CONSOLE_EXTRA)
     
     return logger
 
+def flush_logging():
+    """Wait until every queued record has been written, e.g. before printing to the console."""
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener.start()
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer, if one is running."""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+
+atexit.register(shutdown_logging)
+
+class ProgressSummary:
+    """Periodic "done/total" console line that stands in for the per-file
+    output under --quiet-console. Also feeds the phase totals of a live
+    ProgressReporter; does nothing when neither is active."""
+
+    INTERVAL = 2.0
+
+    def __init__(self, label, total):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self._last = time.monotonic()
+        self._progress = _progress.get()
+        if self._progress is not None:
+            self._progress.set_total(label, total)
+
+    def advance(self, count=1):
+        if self._progress is not None:
+            self._progress.advance(count)
+        if not _quiet_console:
+            return
+        self.done += count
+        now = time.monotonic()
+        if self.done >= self.total or now - self._last >= self.INTERVAL:
+            self._last = now
+            logging.getLogger(__name__).info("   … %s: %s/%s", self.label, self.done, self.total,
+                                             extra=CONSOLE_EXTRA)
+
+# =============================================================================
+# RUN METRICS
+# =============================================================================
+
+class RunMetrics:
+    """Timings and counters collected during a run for --metrics-out.
+
+    Phases and per-folder jobs record wall time; instrumented functions and
+    filesystem backend calls record call counts and inclusive time. Safe to
+    update from worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.functions = {}
+        self.filesystem = {}
+        self.folders = {}
+        self.bytes_moved = 0
+
+    @staticmethod
+    def _add_call(table, name, seconds):
+        entry = table.get(name)
+        if entry is None:
+            entry = table[name] = {'calls': 0, 'seconds': 0.0}
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+
+    def add_phase(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_function_call(self, name, seconds):
+        with self._lock:
+            self._add_call(self.functions, name, seconds)
+
+    def add_filesystem_call(self, name, seconds):
+        with self._lock:
+            self._add_call(self.filesystem, name, seconds)
+
+    def add_folder(self, phase, folder_name, seconds):
+        with self._lock:
+            self.folders.setdefault(phase, {})[folder_name] = seconds
+
+    def add_bytes_moved(self, size):
+        with self._lock:
+            self.bytes_moved += size
+
+    def merge(self, document, prefix=None):
+        """Add the counters of another run's to_dict() output. Folder names
+        get prefix (e.g. the root) so runs over different roots stay apart."""
+        with self._lock:
+            for name, seconds in document.get('phases', {}).items():
+                self.phases[name] = self.phases.get(name, 0.0) + seconds
+            for table, entries in ((self.functions, document.get('functions', {})),
+                                   (self.filesystem, document.get('filesystem', {}))):
+                for name, entry in entries.items():
+                    target = table.setdefault(name, {'calls': 0, 'seconds': 0.0})
+                    target['calls'] += entry['calls']
+                    target['seconds'] += entry['seconds']
+            self.bytes_moved += document.get('bytes_moved', 0)
+            for phase, timings in document.get('folders', {}).items():
+                target = self.folders.setdefault(phase, {})
+                for folder_name, seconds in timings.items():
+                    target[os.path.join(prefix, folder_name) if prefix else folder_name] = seconds
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'phases': dict(self.phases),
+                'functions': {name: dict(entry) for name, entry in self.functions.items()},
+                'filesystem': {name: dict(entry) for name, entry in self.filesystem.items()},
+                'bytes_moved': self.bytes_moved,
+                'folders': {phase: dict(timings) for phase, timings in self.folders.items()},
+            }
+
+    def write(self, path, **run_info):
+        """Write the metrics plus run_info (mode, stats, ...) as a JSON document."""
+        document = dict(run_info)
+        document.update(self.to_dict())
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(document, handle, indent=2, ensure_ascii=False)
+
+# Set by main when --metrics-out is given (or by a fixer's config); all instrumentation is a no-op while None
+_metrics = contextvars.ContextVar('metrics', default=None)
+
+def set_metrics(metrics):
+    """Make metrics the active collector of the current context and return the previous one."""
+    previous = _metrics.get()
+    _metrics.set(metrics)
+    return previous
+
+def instrumented(func):
+    """Decorator counting calls to func and their inclusive wall time."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        metrics = _metrics.get()
+        if metrics is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.add_function_call(name, time.perf_counter() - start)
+    return wrapper
+
+@contextlib.contextmanager
+def timed_phase(name):
+    """Record the wall time of a run phase."""
+    metrics = _metrics.get()
+    progress = _progress.get()
+    if progress is not None:
+        progress.begin_phase(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.add_phase(name, time.perf_counter() - start)
+
+@contextlib.contextmanager
+def timed_folder(phase, folder_path):
+    """Record how long one component folder took in a phase."""
+    metrics = _metrics.get()
+    progress = _progress.get()
+    if progress is not None:
+        progress.folder = os.path.basename(folder_path)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.add_folder(phase, os.path.basename(folder_path), time.perf_counter() - start)
+
+# =============================================================================
+# LIVE PROGRESS
+# =============================================================================
+
+class ProgressReporter:
+    """Live progress of a long run (--progress, --heartbeat).
+
+    The run itself only bumps counters: files and bytes moved, the current
+    phase and component folder, and the items a phase has done out of the
+    total it already knows (folders, root entries or roots; see
+    ProgressSummary). A background thread reads them every `interval`
+    seconds and logs one console line with files/s, MB/s (over the last
+    interval) and the phase ETA, and/or appends the same data as a JSON
+    line to heartbeat_path. run_info (root, mode, ...) is added to every
+    heartbeat. Call start() before the run and stop() after it.
+    """
+
+    def __init__(self, interval=2.0, console=True, heartbeat_path=None, **run_info):
+        self.interval = interval
+        self.console = console
+        self.heartbeat_path = heartbeat_path
+        self.run_info = run_info
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.phase = None
+        self.unit = None
+        self.folder = None
+        self.total = None
+        self.done = 0
+        self.files = 0
+        self.bytes = 0
+        self._started = self._phase_started = self._last_time = time.monotonic()
+        self._last_files = self._last_bytes = 0
+
+    # -- Called by the run ----------------------------------------------------
+
+    def begin_phase(self, name):
+        with self._lock:
+            self.phase = name
+            self.unit = self.total = self.folder = None
+            self.done = 0
+            self._phase_started = time.monotonic()
+
+    def set_total(self, unit, total):
+        """The current phase has total items of unit (e.g. 'Folders cleaned') to do."""
+        with self._lock:
+            self.unit = unit
+            self.total = total
+            self.done = 0
+            self._phase_started = time.monotonic()
+
+    def advance(self, count=1):
+        with self._lock:
+            self.done += count
+
+    def add_files(self, count=1, size=0):
+        with self._lock:
+            self.files += count
+            self.bytes += size
+
+    # -- Reporting ------------------------------------------------------------
+
+    def snapshot(self, state='running'):
+        """Return the progress as a dict (the heartbeat document)."""
+        now = time.monotonic()
+        with self._lock:
+            window = max(now - self._last_time, 1e-9)
+            files_per_s = (self.files - self._last_files) / window
+            mb_per_s = (self.bytes - self._last_bytes) / window / (1024 * 1024)
+            self._last_time, self._last_files, self._last_bytes = now, self.files, self.bytes
+            eta = None
+            if self.total and self.done:
+                eta = (self.total - self.done) * (now - self._phase_started) / self.done
+            snapshot = {
+                'time': datetime.now().isoformat(timespec='seconds'),
+                'state': state,
+                'elapsed': round(now - self._started, 1),
+                'phase': self.phase,
+                'unit': self.unit,
+                'done': self.done,
+                'total': self.total,
+                'folder': self.folder,
+                'files': self.files,
+                'bytes': self.bytes,
+                'files_per_s': round(files_per_s, 1),
+                'mb_per_s': round(mb_per_s, 2),
+                'eta': None if eta is None else round(eta, 1),
+            }
+        snapshot.update(self.run_info)
+        return snapshot
+
+    def _log_line(self, snapshot):
+        counts = f"{snapshot['done']}/{snapshot['total']} {snapshot['unit'].lower()}, " if snapshot['total'] else ""
+        folder = f" | {snapshot['folder']}" if snapshot['folder'] else ""
+        eta = f" | ETA {format_duration(snapshot['eta'])}" if snapshot['eta'] is not None else ""
+        logging.getLogger(__name__).info("⏱️ %s: %s%s files moved (%.1f files/s, %.2f MB/s)%s%s",
+                                         snapshot['phase'] or "starting", counts, snapshot['files'],
+                                         snapshot['files_per_s'], snapshot['mb_per_s'], folder, eta,
+                                         extra=CONSOLE_EXTRA)
+
+    def _write_heartbeat(self, snapshot):
+        try:
+            with open(self.heartbeat_path, 'a', encoding='utf-8') as handle:
+                handle.write(json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')) + "\n")
+        except OSError as e:
+            logging.getLogger(__name__).warning("⚠️ Heartbeats stopped, cannot write %s: %s",
+                                                self.heartbeat_path, e)
+            self.heartbeat_path = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            snapshot = self.snapshot()
+            if self.console:
+                self._log_line(snapshot)
+            if self.heartbeat_path:
+                self._write_heartbeat(snapshot)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="progress-reporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the reporter thread and send a last heartbeat with state 'finished'."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.heartbeat_path:
+            self._write_heartbeat(self.snapshot('finished'))
+
+# Set by main when --progress or --heartbeat is given (or by a fixer's config); the run skips all reporting while None
+_progress = contextvars.ContextVar('progress', default=None)
+
+def set_progress(progress):
+    """Make progress the active reporter of the current context and return the previous one."""
+    previous = _progress.get()
+    _progress.set(progress)
+    return previous
+
 # =============================================================================
 # UTILITY FUNCTIONS
 # =============================================================================
@@ -234,6 +749,19 @@ def get_timestamp():
     """Get formatted timestamp string."""
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+def new_stats():
+    """Return a zeroed stats dict, as reported by every mode."""
+    return {
+        'moved': 0,
+        'skipped': 0,
+        'unmatched': 0,
+        'failed': 0,
+        'folders_created': 0,
+        'cleanup_moved': 0,
+        'linked': 0,
+        'bytes_reclaimed': 0
+    }
+
 def normalize_name(name):
     """Normalize name for comparison (lowercase, trimmed)."""
     return name.lower().strip()
@@ -245,43 +773,7 @@ def is_hidden_or_system_file(filepath):
 
 def is_standard_subfolder(folder_name):
     """Check if folder is one of our standard subfolders."""
-    return folder_name in STANDARD_FOLDERS
-
-def extract_filename_components(filename):
-    """Extract components from filename using underscore split."""
-    # Remove extension for analysis
-    name_only = os.path.splitext(filename)[0]
-    
-    # Split by underscore
-    parts = name_only.split('_')
-    
-    if len(parts) >= 3:
-        part1 = parts[0]
-        part2 = parts[1] 
-        part3 = parts[2]
-        basefit_version = f"{part2}_{part3}"
-        basefit = part2
-    elif len(parts) >= 2:
-        part1 = parts[0]
-        part2 = parts[1]
-        part3 = ""
-        basefit_version = ""
-        basefit = part2
-    else:
-        part1 = parts[0] if parts else ""
-        part2 = ""
-        part3 = ""
-        basefit_version = ""
-        basefit = ""
-    
-    return {
-        'name_only': name_only,
-        'part1': part1,
-        'part2': part2, 
-        'part3': part3,
-        'basefit_version': basefit_version,
-        'basefit': basefit
-    }
+    return _rules.get().is_folder(folder_name)
 
 def get_execution_mode(args):
     """Get execution mode from arguments or user input."""
@@ -332,379 +824,3476 @@ def get_execution_mode(args):
             print("\n❌ Operation cancelled by user.")
             sys.exit(0)
 
+@instrumented
 def files_are_identical(file1, file2):
-    """Check if two files are identical (same size and modification time)."""
+    """Check if two files have identical content (size, then sampled blocks, then full hash)."""
     try:
-        stat1 = os.stat(file1)
-        stat2 = os.stat(file2)
-        return (stat1.st_size == stat2.st_size and 
-                abs(stat1.st_mtime - stat2.st_mtime) < 1)  # Allow 1 second difference
-    except (OSError, FileNotFoundError):
+        return _duplicates.get().are_identical(file1, file2)
+    except OSError:
         return False
 
-def resolve_filename_collision(dest_path, allow_overwrite=False, mode=1):
+@instrumented
+def resolve_filename_collision(dest_path, allow_overwrite=False, mode=1, dry_run=False, source_path=None):
     """Resolve filename collisions by adding _1, _2, etc. suffixes if overwrite is disabled.
-    In Mode 4, removes existing suffixed files and preserves only the original name."""
+    In Mode 4, removes existing suffixed files and preserves only the original name.
+    Sibling names come from the per-directory name index, so each destination
+    directory is read once instead of probing every candidate suffix.
+    With --dedup-links, a `name_N.ext` copy with the same content as
+    source_path is returned instead of a new suffix, so the move is skipped
+    as a duplicate of it."""
     logger = logging.getLogger(__name__)
     
-    if not os.path.exists(dest_path):
+    if not _name_index.get().exists(dest_path):
         return dest_path
     
     if allow_overwrite:
         return dest_path
     
+    filename = os.path.basename(dest_path)
+    
     # Mode 4 special handling: Remove suffixed versions and use original name
     if mode == 4:
-        base_dir = os.path.dirname(dest_path)
-        filename = os.path.basename(dest_path)
-        name, ext = os.path.splitext(filename)
-        
         # Find and remove all suffixed versions (_1, _2, etc.)
-        suffixed_files = []
-        for i in range(1, 1000):
-            suffixed_file = os.path.join(base_dir, f"{name}_{i}{ext}")
-            if os.path.exists(suffixed_file):
-                suffixed_files.append(suffixed_file)
-        
-        # Remove suffixed files
-        for suffixed_file in suffixed_files:
+        for suffixed_file in _name_index.get().suffixed_duplicates(dest_path):
+            trash = trash_fields(suffixed_file)
+            record_operation('purge', path=suffixed_file, **trash)
             try:
-                os.remove(suffixed_file)
-                logger.info(f"[{get_timestamp()}] 🗑️ Removed suffixed duplicate: {os.path.basename(suffixed_file)}")
+                if _applies_changes(dry_run):
+                    set_aside(suffixed_file, trash)
+                    _name_index.get().discard(suffixed_file)
+                if dry_run:
+                    logger.info("🗑️ Would remove suffixed duplicate: %s", os.path.basename(suffixed_file))
+                else:
+                    logger.info("🗑️ Removed suffixed duplicate: %s", os.path.basename(suffixed_file))
             except Exception as e:
-                logger.error(f"[{get_timestamp()}] ❌ Failed to remove suffixed file {suffixed_file}: {e}")
+                logger.error("❌ Failed to remove suffixed file %s: %s", suffixed_file, e)
         
-        logger.debug(f"[{get_timestamp()}] 🔄 Mode 4: Cleaned suffixed files, using original name: {filename}")
+        logger.debug("🔄 Mode 4: Cleaned suffixed files, using original name: %s", filename)
         return dest_path
     
     # Standard collision resolution for modes 1 and 3
-    base_dir = os.path.dirname(dest_path)
-    filename = os.path.basename(dest_path)
-    name, ext = os.path.splitext(filename)
+    # With --dedup-links, identical name_N copies left by earlier collisions become links
+    linker = _linker.get()
+    if linker is not None:
+        linker.link_suffixed(dest_path, dry_run)
+        copy_path = linker.existing_copy(source_path, dest_path) if source_path is not None else None
+        if copy_path is not None:
+            logger.debug("🔄 Same content as %s, no new suffix for: %s", os.path.basename(copy_path), filename)
+            return copy_path
     
-    counter = 1
-    while True:
-        new_filename = f"{name}_{counter}{ext}"
-        new_dest_path = os.path.join(base_dir, new_filename)
+    counter = _name_index.get().next_free_suffix(dest_path)
+    if counter is None:  # Safety limit
+        logger.error("❌ Too many filename collisions for: %s", filename)
+        return None  # Return None to indicate failure
+    
+    name, ext = os.path.splitext(filename)
+    new_filename = f"{name}_{counter}{ext}"
+    logger.debug("🔄 Collision resolved: %s → %s", filename, new_filename)
+    return os.path.join(os.path.dirname(dest_path), new_filename)
+
+# =============================================================================
+# FILENAME TOKENIZER
+# =============================================================================
+
+# Characters that separate the parts of a template/component name
+NAME_SEPARATORS = frozenset("_- ")
+
+class KeywordTrie:
+    """Character trie over a fixed word list for longest-match lookups."""
+
+    _END = ''
+
+    def __init__(self, words):
+        self._root = {}
+        for word in words:
+            node = self._root
+            for char in word.lower():
+                node = node.setdefault(char, {})
+            node[self._END] = True
+
+    def longest_match(self, text, start):
+        """Return the end of the longest word starting at text[start] that is
+        followed by a separator or the end of text, or -1 if there is none."""
+        node = self._root
+        best = -1
+        for index in range(start, len(text)):
+            node = node.get(text[index])
+            if node is None:
+                return best
+            if self._END in node and (index + 1 == len(text) or text[index + 1] in NAME_SEPARATORS):
+                best = index + 1
+        return best
+
+class NameKey:
+    """Template, basefit and version parsed from a file or folder name."""
+
+    __slots__ = ('template', 'basefit', 'version')
+
+    def __init__(self, template, basefit, version):
+        self.template = template
+        self.basefit = basefit
+        self.version = version
+
+    def match_keys(self):
+        """Lookup keys in priority order, each with the match type it gives.
+        Keys carrying the template come first, so a file prefers the folder
+        of its own template when several share the basefit."""
+        keys = []
+        if self.basefit and self.version:
+            keys.append((('ver', self.template, self.basefit, self.version), "BASE+VER"))
+            keys.append((('ver', None, self.basefit, self.version), "BASE+VER"))
+        if self.basefit:
+            keys.append((('base', self.template, self.basefit), "BASE"))
+            keys.append((('base', None, self.basefit), "BASE"))
+        return keys
+
+    def __repr__(self):
+        return f"NameKey({self.template!r}, {self.basefit!r}, {self.version!r})"
+
+class FilenameTokenizer:
+    """Parses names like MERIDIAN1_U403RB_1_Girl Top into a NameKey in one
+    left-to-right scan over the separator-delimited tokens.
+
+    The template is the longest TEMPLATES entry starting the name; the basefit
+    is the first token that is exactly a BASEFIT_IDS entry (longest match, so
+    U101RSH is never read as U101), and the version is the token after it.
+    Names whose basefit is not in the list fall back to the underscore
+    layout (TEMPLATE_BASEFIT_VERSION).
+    """
+
+    def __init__(self, templates, basefit_ids):
+        self._templates = KeywordTrie(templates)
+        self._basefits = KeywordTrie(basefit_ids)
+
+    def parse(self, name):
+        """Parse a name (without extension) into a NameKey."""
+        text = normalize_name(name)
+        length = len(text)
+        end = self._templates.longest_match(text, 0)
+        template = text[:end] if end > 0 else None
         
-        if not os.path.exists(new_dest_path):
-            logger.debug(f"[{get_timestamp()}] 🔄 Collision resolved: {filename} → {new_filename}")
-            return new_dest_path
+        start = 0
+        while start < length:
+            end = self._basefits.longest_match(text, start)
+            if end > 0:
+                version_end = end + 1
+                while version_end < length and text[version_end] not in NAME_SEPARATORS:
+                    version_end += 1
+                return NameKey(template, text[start:end], text[end + 1:version_end] or None)
+            # Move to the start of the next token
+            while start < length and text[start] not in NAME_SEPARATORS:
+                start += 1
+            start += 1
         
-        counter += 1
-        if counter > 999:  # Safety limit
-            logger.error(f"[{get_timestamp()}] ❌ Too many filename collisions for: {filename}")
-            return None  # Return None to indicate failure
+        # Unknown basefit: TEMPLATE_BASEFIT_VERSION by underscores
+        parts = text.split('_')
+        return NameKey(template or parts[0] or None,
+                       parts[1] if len(parts) >= 2 and parts[1] else None,
+                       parts[2] if len(parts) >= 3 and parts[2] else None)
+
+_tokenizer = FilenameTokenizer(TEMPLATES, BASEFIT_IDS)
+
+def parse_name(name):
+    """Parse a folder name, or a file name without its extension, into a NameKey."""
+    return _tokenizer.parse(name)
 
 # =============================================================================
-# CORE FUNCTIONS
+# FUZZY FOLDER SUGGESTIONS
 # =============================================================================
 
-def scan_folders(root_dir):
-    """Scan and return list of first-level subfolders (folder-first isolation)."""
-    logger = logging.getLogger(__name__)
-    folder_list = []
-    
-    try:
-        for item in os.listdir(root_dir):
-            item_path = os.path.join(root_dir, item)
-            if os.path.isdir(item_path) and not is_standard_subfolder(item):
-                folder_list.append(item)
+# Character n-gram length of the suggestion index
+FUZZY_NGRAM = 3
+# Suggestions logged for each unmatched root file
+FUZZY_SUGGESTIONS = 3
+# Suggestions scoring below this are not worth showing
+FUZZY_MIN_SCORE = 0.3
+# Most folders scored per lookup, so lookups stay fast with thousands of similar names
+FUZZY_MAX_CANDIDATES = 256
+
+def edit_distance(a, b, limit=None):
+    """Levenshtein distance between a and b. With a limit, returns limit + 1
+    as soon as the distance is known to exceed it."""
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class BKTree:
+    """Burkhard-Keller tree for edit-distance lookups: the triangle inequality
+    lets a search skip every subtree that cannot hold a close enough word."""
+
+    def __init__(self, words):
+        self._root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        if self._root is None:
+            self._root = (word, {})
+            return
+        node = self._root
+        while True:
+            distance = edit_distance(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                return
+            node = child
+
+    def search(self, word, max_distance):
+        """Return (distance, word) pairs within max_distance, closest first."""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node_word, children = stack.pop()
+            distance = edit_distance(word, node_word)
+            if distance <= max_distance:
+                found.append((distance, node_word))
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        found.sort()
+        return found
+
+class FuzzyFolderIndex:
+    """Ranks folders by how close their names are to a file that matched none.
+
+    Folder names are indexed once as a character n-gram inverted index and
+    scored by the Dice coefficient of the two n-gram sets (0 to 1). A lookup
+    reads the file's rarest n-grams first and stops once no folder it has not
+    seen could still reach the current k-th best score, so it touches a few
+    posting lists instead of every folder. A misspelt template at the start
+    of the file name is first corrected to the nearest TEMPLATES entry
+    through a BK-tree.
+    """
+
+    # Template BK-trees by template list; building one takes tens of milliseconds
+    _template_trees = {}
+
+    def __init__(self, folder_list, templates=TEMPLATES, n=FUZZY_NGRAM, max_candidates=FUZZY_MAX_CANDIDATES):
+        self.folders = list(folder_list)
+        self.n = n
+        self.max_candidates = max_candidates
+        self._postings = {}
+        self._folder_grams = []
+        for index, folder in enumerate(self.folders):
+            grams = frozenset(self._grams(self._canonical(folder)))
+            self._folder_grams.append(grams)
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(index)
+        self._templates = tuple(template.lower() for template in templates)
+
+    @staticmethod
+    def _canonical(name):
+        """Normalized name with every run of separators turned into one space."""
+        text = normalize_name(name)
+        for separator in NAME_SEPARATORS:
+            text = text.replace(separator, ' ')
+        return ' '.join(text.split())
+
+    def _grams(self, text):
+        padded = f" {text} "
+        return {padded[i:i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    def _correct_template(self, text):
+        """Swap a leading token for the nearest template when it is close to one."""
+        token, _, rest = text.partition(' ')
+        if parse_name(token).template == token:
+            return text
+        tree = self._template_trees.get(self._templates)
+        if tree is None:
+            tree = self._template_trees.setdefault(self._templates, BKTree(self._templates))
+        matches = tree.search(token, max(1, len(token) // 4))
+        if not matches:
+            return text
+        return f"{matches[0][1]} {rest}" if rest else matches[0][1]
+
+    def suggest(self, name, k=FUZZY_SUGGESTIONS, min_score=FUZZY_MIN_SCORE):
+        """Return up to k (folder, score) pairs for a name without extension, best first."""
+        grams = self._grams(self._correct_template(self._canonical(name)))
+        query_size = len(grams)
+        empty = frozenset()
+        order = sorted(grams, key=lambda gram: len(self._postings.get(gram, empty)))
         
-        logger.info(f"[{get_timestamp()}] 📁 Scanned folders: {len(folder_list)} found")
-        return folder_list
+        # Min-heap of the k best (score, -index) pairs; ties go to the first folder
+        best = []
+        seen = set()
+        threshold = min_score
+        used = 0
         
-    except Exception as e:
-        logger.error(f"[{get_timestamp()}] ❌ Error scanning folders: {e}")
-        return []
+        def lists_to_read(threshold):
+            # A folder scoring >= threshold shares at least ceil(threshold * q / (2 - threshold))
+            # of the q query n-grams, so it is in one of any q - that + 1 of their posting lists
+            overlap = math.ceil(threshold * query_size / (2 - threshold) - 1e-9)
+            return min(query_size, query_size - overlap + 1)
+        
+        while used < lists_to_read(threshold) and len(seen) < self.max_candidates:
+            fresh = self._postings.get(order[used], empty) - seen
+            seen |= fresh
+            for index in fresh:
+                folder_grams = self._folder_grams[index]
+                score = 2.0 * len(grams & folder_grams) / (query_size + len(folder_grams))
+                if score < threshold:
+                    continue
+                entry = (score, -index)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+                if len(best) == k:
+                    threshold = max(min_score, best[0][0])
+            used += 1
+        
+        best.sort(reverse=True)
+        return [(self.folders[-index], round(score, 3)) for score, index in best]
 
-def find_matching_folder(filename, folder_list):
-    """Find matching folder using priority-based matching system."""
-    components = extract_filename_components(filename)
-    name_only_normalized = normalize_name(components['name_only'])
-    
-    # Step 1: [FULL] Match - Exact folder name match
-    for folder in folder_list:
-        folder_normalized = normalize_name(folder)
-        if name_only_normalized == folder_normalized:
-            return folder, "FULL"
-    
-    # Step 2: [BASE+VER] Match - Folder contains basefit+version
-    if components['basefit_version']:
-        basefit_version_normalized = normalize_name(components['basefit_version'])
-        for folder in folder_list:
-            folder_normalized = normalize_name(folder)
-            if basefit_version_normalized in folder_normalized:
-                return folder, "BASE+VER"
-    
-    # Step 3: [BASE] Match - Folder contains basefit only
-    if components['basefit']:
-        basefit_normalized = normalize_name(components['basefit'])
-        for folder in folder_list:
-            folder_normalized = normalize_name(folder)
-            if basefit_normalized in folder_normalized:
-                return folder, "BASE"
-    
-    # Step 4: [NONE] - No match found
-    return None, "NONE"
+# =============================================================================
+# SORTING RULES
+# =============================================================================
 
-def move_file_safely(source_path, dest_path, match_type, allow_overwrite=False, dry_run=False):
-    """Move file safely with comprehensive error handling."""
-    logger = logging.getLogger(__name__)
-    
-    try:
-        # Check if source and destination are the same
-        if os.path.abspath(source_path) == os.path.abspath(dest_path):
-            logger.info(f"[{get_timestamp()}] [{match_type}] ⚠️ Source equals destination, skipping: {source_path}")
-            return "skipped"
+class SortingRules:
+    """Compiled rules deciding which standard subfolder a file belongs in.
+
+    A rule names a folder and any mix of extensions, glob patterns and
+    regular expressions (matched against the whole file name, ignoring
+    case); the first rule that matches wins. Extensions compile into one
+    dict lookup and all globs and regexes into one combined regex, so a
+    file is classified with at most one lookup and one match however many
+    rules there are. Built from STANDARD_FOLDERS/EXTENSION_MAPPING by
+    default, or loaded from a TOML/JSON rule file:
+
+        folders = ["Maya-Blender files", "MD files", "Output format files"]
+
+        [[rules]]
+        folder = "Maya-Blender files"
+        extensions = [".fbx", ".blend", ".blend1", ".ma", ".mb"]
+        globs = ["*_rig.zip"]
+        regex = ["render_\\d+\\.exr"]
+
+    Patterns are combined, so group numbers shift: named groups and
+    references to groups by number are rejected.
+    """
+
+    # \1-\99 or a (?(1)...) conditional not preceded by an escaping backslash
+    _GROUP_REFERENCE = re.compile(r'(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?\(\d)')
+
+    def __init__(self, rules, folders=None, source="built-in"):
+        self.source = source
+        self.rules = []
+        self._by_extension = {}
+        patterns = []
+        self._group_rules = {}
         
-        # Check if destination file already exists
-        if os.path.exists(dest_path):
-            if not allow_overwrite:
-                # Check if files are identical
-                if files_are_identical(source_path, dest_path):
-                    logger.warning(f"[{get_timestamp()}] [{match_type}] ⚠️ Skipped duplicate during cleanup: {os.path.basename(source_path)}")
-                else:
-                    logger.warning(f"[{get_timestamp()}] [{match_type}] ⚠️ File already exists, skipping: {source_path}")
-                return "skipped"
-            else:
-                if dry_run:
-                    logger.info(f"[{get_timestamp()}] [{match_type}] 🔄 Would overwrite: {source_path} → {dest_path}")
-                    return "would_overwrite"
-                else:
-                    logger.info(f"[{get_timestamp()}] [{match_type}] 🔄 Overwriting: {source_path} → {dest_path}")
+        for index, rule in enumerate(rules):
+            folder = rule.get('folder')
+            if not self._plain_name(folder):
+                raise ValueError(f"rule {index + 1}: 'folder' must be a plain folder name")
+            extensions = [self._extension(value, index) for value in rule.get('extensions', [])]
+            globs = list(rule.get('globs', []))
+            regexes = list(rule.get('regex', []))
+            self.rules.append({'folder': folder, 'extensions': extensions, 'globs': globs, 'regex': regexes})
+            
+            for extension in extensions:
+                self._by_extension.setdefault(extension, (index, folder))
+            for pattern in [fnmatch.translate(glob) for glob in globs] + regexes:
+                try:
+                    compiled = re.compile(pattern)
+                except (re.error, TypeError) as e:
+                    raise ValueError(f"rule {index + 1}: bad pattern {pattern!r}: {e}") from None
+                if compiled.groupindex or self._GROUP_REFERENCE.search(pattern):
+                    raise ValueError(f"rule {index + 1}: pattern {pattern!r} uses named groups or group "
+                                     "references, which rule patterns do not support")
+                group = f"_rule{len(self._group_rules)}"
+                self._group_rules[group] = (index, folder)
+                patterns.append(f"(?P<{group}>{pattern})")
         
-        # Perform move operation
-        if dry_run:
-            logger.info(f"[{get_timestamp()}] [{match_type}] 📁 Would move: {source_path} → {dest_path}")
-            return "would_move"
-        else:
-            shutil.move(source_path, dest_path)
-            logger.info(f"[{get_timestamp()}] [{match_type}] 📁 Moved: {source_path} → {dest_path}")
-            return "moved"
+        try:
+            self._pattern = re.compile("|".join(patterns), re.IGNORECASE | re.DOTALL) if patterns else None
+        except re.error as e:
+            raise ValueError(f"{source}: the rule patterns cannot be combined: {e}") from None
+        self._extension_folders = {extension: folder for extension, (_, folder) in self._by_extension.items()}
         
-    except Exception as e:
-        logger.error(f"[{get_timestamp()}] [{match_type}] ❌ Move failed: {source_path} → {dest_path} | Error: {e}")
-        return "failed"
+        rule_folders = list(dict.fromkeys(rule['folder'] for rule in self.rules))
+        if folders is not None and (not isinstance(folders, list) or not all(map(self._plain_name, folders))):
+            raise ValueError("'folders' must be a list of plain folder names")
+        self.folders = list(folders) if folders is not None else rule_folders
+        missing = [folder for folder in rule_folders if folder not in self.folders]
+        if missing:
+            raise ValueError(f"rules sort into folders missing from 'folders': {', '.join(missing)}")
+        self._folder_set = frozenset(self.folders)
+        self.fingerprint = hashlib.blake2b(
+            json.dumps([self.folders, self.rules], sort_keys=True).encode('utf-8'), digest_size=8
+        ).hexdigest()
+
+    @staticmethod
+    def _plain_name(name):
+        return (isinstance(name, str) and bool(name.strip()) and name not in ('.', '..')
+                and not any(sep in name for sep in ('/', '\\')))
+
+    @staticmethod
+    def _extension(value, index):
+        if not isinstance(value, str) or not value.strip('.'):
+            raise ValueError(f"rule {index + 1}: bad extension {value!r}")
+        value = value.lower()
+        return value if value.startswith('.') else '.' + value
+
+    @classmethod
+    def from_mapping(cls, folders, extension_mapping, source="built-in"):
+        """Build the rule set for a folder -> extensions mapping."""
+        return cls([{'folder': folder, 'extensions': extensions}
+                    for folder, extensions in extension_mapping.items()], folders, source)
+
+    @classmethod
+    def load(cls, path):
+        """Load a .toml or .json rule file. Raises OSError or ValueError."""
+        with open(path, 'rb') as handle:
+            if path.lower().endswith('.json'):
+                try:
+                    document = json.load(handle)
+                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                    raise ValueError(f"invalid JSON: {e}") from None
+            else:
+                try:
+                    document = tomllib.load(handle)
+                except tomllib.TOMLDecodeError as e:
+                    raise ValueError(f"invalid TOML: {e}") from None
+        if not isinstance(document, dict) or not isinstance(document.get('rules'), list) \
+                or not all(isinstance(rule, dict) for rule in document['rules']):
+            raise ValueError("expected a 'rules' list of tables")
+        return cls(document['rules'], document.get('folders'), source=path)
 
-def collect_all_files_recursively(folder_path, cleanup_mode=False):
-    """Recursively collect all files from subfolders. In cleanup mode, processes ALL subfolders."""
+    def classify(self, filename):
+        """Return the standard folder for filename, or None if no rule matches."""
+        extension = os.path.splitext(filename)[1].lower()
+        if self._pattern is None:
+            # Extension-only rules (the built-in set): a single dict lookup
+            return self._extension_folders.get(extension)
+        hit = self._by_extension.get(extension)
+        match = self._pattern.fullmatch(filename)
+        if match is not None:
+            pattern_hit = self._group_rules[match.lastgroup]
+            if hit is None or pattern_hit[0] < hit[0]:
+                hit = pattern_hit
+        return hit[1] if hit is not None else None
+
+    def is_folder(self, name):
+        """True if name is one of the standard folders these rules create."""
+        return name in self._folder_set
+
+DEFAULT_RULES = SortingRules.from_mapping(STANDARD_FOLDERS, EXTENSION_MAPPING)
+
+# Rules used by every phase; a fixer swaps in a rule file with set_rules
+_rules = contextvars.ContextVar('rules', default=DEFAULT_RULES)
+
+def set_rules(rules):
+    """Make rules the active rule set of the current context and return the previous one."""
+    previous = _rules.get()
+    _rules.set(rules)
+    return previous
+
+def find_rules_file(root_dir=None):
+    """Return the first rule file found in root_dir (default: the working
+    directory) or next to the script/.exe, or None."""
+    program_dir = os.path.dirname(os.path.abspath(sys.executable if getattr(sys, 'frozen', False) else __file__))
+    for directory in (root_dir or os.getcwd(), program_dir):
+        for filename in RULES_FILENAMES:
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path):
+                return path
+    return None
+
+# =============================================================================
+# FILESYSTEM BACKENDS
+# =============================================================================
+
+# Cross-device copies stream through one buffer of this size
+MOVE_CHUNK_SIZE = 8 * 1024 * 1024
+# Progress is logged (at debug level) every this many bytes of a cross-device copy
+MOVE_PROGRESS_EVERY = 1024 * 1024 * 1024
+
+def _fsync_directory(dir_path):
+    """Persist a rename in dir_path where the platform allows opening directories."""
+    if os.name != 'posix':
+        return
+    dir_fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+def _copy_with_checksum(source_path, dest_path):
+    """Copy source to dest through one reusable buffer, hashing the data in
+    the same pass. The copy is fsynced. Returns (bytes_copied, bytes_on_disk,
+    digest), where bytes_on_disk is the size of dest after the fsync."""
     logger = logging.getLogger(__name__)
-    all_files = []
-    all_folders = []
-    
-    def _collect_files_and_folders(current_path, relative_path=""):
-        try:
-            items = os.listdir(current_path)
-            logger.debug(f"[{get_timestamp()}] 🔍 Scanning: {current_path} ({len(items)} items)")
-            
-            for item in items:
-                item_path = os.path.join(current_path, item)
-                relative_item_path = os.path.join(relative_path, item) if relative_path else item
-                
-                if os.path.isfile(item_path):
-                    # Skip hidden/system files
-                    if not is_hidden_or_system_file(item_path):
-                        all_files.append({
-                            'full_path': item_path,
-                            'filename': item,
-                            'relative_path': relative_item_path,
-                            'source_folder': current_path
-                        })
-                        logger.debug(f"[{get_timestamp()}] 📄 Found file: {relative_item_path}")
-                elif os.path.isdir(item_path):
-                    # In cleanup mode, process ALL subfolders. Otherwise skip standard ones.
-                    if cleanup_mode or not is_standard_subfolder(item):
-                        all_folders.append(item_path)
-                        logger.debug(f"[{get_timestamp()}] 📁 Found folder: {relative_item_path}")
-                        _collect_files_and_folders(item_path, relative_item_path)
-                    else:
-                        logger.debug(f"[{get_timestamp()}] ⏭️ Skipping standard subfolder: {item}")
-        except (OSError, PermissionError) as e:
-            logger.error(f"[{get_timestamp()}] ❌ Error accessing {current_path}: {e}")
-    
-    _collect_files_and_folders(folder_path)
-    logger.debug(f"[{get_timestamp()}] 📊 Collection complete: {len(all_files)} files, {len(all_folders)} folders")
-    return all_files, all_folders
+    digest = hashlib.blake2b()
+    buffer = bytearray(MOVE_CHUNK_SIZE)
+    view = memoryview(buffer)
+    copied = 0
+    next_progress = MOVE_PROGRESS_EVERY
+    with open(source_path, 'rb', buffering=0) as source, open(dest_path, 'wb', buffering=0) as dest:
+        while True:
+            count = source.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+            written = 0
+            while written < count:
+                written += dest.write(view[written:count])
+            copied += count
+            if copied >= next_progress:
+                logger.debug("📦 Copying %s: %s MiB", os.path.basename(source_path), copied // (1024 * 1024))
+                next_progress += MOVE_PROGRESS_EVERY
+        os.fsync(dest.fileno())
+        on_disk = os.fstat(dest.fileno()).st_size
+    return copied, on_disk, digest.hexdigest()
 
-def cleanup_subfolders_recursively(folder_path, mode=3, dry_run=False):
-    """Recursively cleanup ALL subfolders and move files to component folder.
-    Mode 3: Skip conflicts, rename with suffixes if different
-    Mode 4: Overwrite conflicts, remove suffixed duplicates"""
+def fast_move(source_path, dest_path):
+    """Move a file, replacing any file at dest_path.
+
+    On the same device this is a single rename. Across devices the file is
+    copied to a hidden temporary name next to the destination and hashed
+    in the same pass (the digest is logged), so the source is read once and
+    the copy is never read back. It is accepted when the bytes read, the
+    bytes on disk and the source size (unchanged since before the copy) all
+    agree; it is then renamed into place and the source is deleted. An
+    interrupted copy never leaves a partial file under the destination name,
+    and the temporary file is removed on failure.
+    """
     logger = logging.getLogger(__name__)
-    moved_count = 0
-    skipped_count = 0
-    allow_overwrite = mode == 4
-    
-    # Collect all files and folders from subfolders recursively (cleanup mode = process ALL folders)
-    all_files, all_folders = collect_all_files_recursively(folder_path, cleanup_mode=True)
-    
-    if not all_files and not all_folders:
-        logger.info(f"[{get_timestamp()}] 🧹 No files or subfolders found in: {os.path.basename(folder_path)}")
-        return moved_count, skipped_count
-    
-    logger.info(f"[{get_timestamp()}] 🧹 Found {len(all_files)} files to move from subfolders")
-    logger.debug(f"[{get_timestamp()}] 🧹 Found {len(all_folders)} subfolders to process")
-    logger.debug(f"[{get_timestamp()}] 🎯 Cleanup Mode: {mode} ({'Overwrite' if allow_overwrite else 'Safe'})")
-    
-    # Check for root files that should take precedence
-    root_files = set()
     try:
-        for item in os.listdir(os.path.dirname(folder_path)):
-            item_path = os.path.join(os.path.dirname(folder_path), item)
-            if os.path.isfile(item_path):
-                root_files.add(os.path.basename(item))
-        logger.debug(f"[{get_timestamp()}] 🔍 Found {len(root_files)} files in root directory")
-    except Exception as e:
-        logger.debug(f"[{get_timestamp()}] 🔍 Could not scan root directory: {e}")
-    
-    # Move all collected files to the component folder
-    for file_info in all_files:
-        source_path = file_info['full_path']
-        filename = file_info['filename']
-        dest_path = os.path.join(folder_path, filename)
-        
-        # Check if file exists in root - if so, skip moving in Mode 3
-        if mode == 3 and filename in root_files:
-            logger.info(f"[{get_timestamp()}] 🔄 Mode 3: Keeping both files - root takes precedence: {filename}")
-            skipped_count += 1
-            continue
-        
-        # Handle filename collisions using the enhanced collision resolution function
-        if os.path.exists(dest_path) and not files_are_identical(source_path, dest_path):
-            resolved_path = resolve_filename_collision(dest_path, allow_overwrite, mode)
-            if resolved_path is None:
-                logger.error(f"[{get_timestamp()}] ❌ Too many collisions, skipping: {filename}")
-                skipped_count += 1
-                continue
-            dest_path = resolved_path
-        
-        # Move file with enhanced logging
-        result = move_file_safely(source_path, dest_path, "CLEANUP", allow_overwrite, dry_run)
-        if result in ["moved", "would_move", "would_overwrite"]:
-            moved_count += 1
-        elif result == "skipped":
-            skipped_count += 1
-    
-    # Sort folders by depth (deepest first) for proper deletion order
-    all_folders.sort(key=lambda x: x.count(os.sep), reverse=True)
-    logger.debug(f"[{get_timestamp()}] 🗂️ Processing {len(all_folders)} folders for deletion")
+        os.replace(source_path, dest_path)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
     
-    # Delete empty folders (deepest first) - now includes standard subfolders in cleanup mode
-    deleted_count = 0
-    for folder_to_delete in all_folders:
-        try:
-            if dry_run:
-                logger.info(f"[{get_timestamp()}] 🧹 Would delete subfolder: {folder_to_delete}")
-                deleted_count += 1
-            else:
-                # Check if folder is truly empty (no files or subdirectories)
-                try:
-                    folder_contents = os.listdir(folder_to_delete)
-                    if not folder_contents:
-                        os.rmdir(folder_to_delete)
-                        logger.info(f"[{get_timestamp()}] 🧹 Deleted subfolder: {folder_to_delete}")
-                        deleted_count += 1
-                    else:
-                        # Check if it only contains empty directories
-                        has_files = any(os.path.isfile(os.path.join(folder_to_delete, item)) 
-                                      for item in folder_contents)
-                        if not has_files:
-                            # Try to delete anyway - might be empty subdirs
-                            os.rmdir(folder_to_delete)
-                            logger.info(f"[{get_timestamp()}] 🧹 Deleted subfolder: {folder_to_delete}")
-                            deleted_count += 1
-                        else:
-                            logger.warning(f"[{get_timestamp()}] ⚠️ Folder not empty, skipping deletion: {folder_to_delete}")
-                except OSError:
-                    # Folder might have been deleted already or contains subdirs
-                    logger.debug(f"[{get_timestamp()}] 🔍 Folder already processed or contains subdirs: {folder_to_delete}")
-        except PermissionError as e:
-            logger.error(f"[{get_timestamp()}] ❌ Failed to delete: {folder_to_delete} (Access Denied)")
-        except Exception as e:
-            logger.error(f"[{get_timestamp()}] ❌ Failed to delete: {folder_to_delete} ({str(e)})")
+    if os.path.isdir(source_path):
+        shutil.move(source_path, dest_path)
+        return
     
-    logger.debug(f"[{get_timestamp()}] 📊 Cleanup summary: {moved_count} moved, {skipped_count} skipped, {deleted_count} folders deleted")
-    return moved_count, skipped_count
+    dest_dir = os.path.dirname(dest_path) or "."
+    temp_path = os.path.join(dest_dir, f".{os.path.basename(dest_path)}.{os.getpid()}.partial")
+    try:
+        before = os.stat(source_path)
+        copied, on_disk, digest = _copy_with_checksum(source_path, temp_path)
+        after = os.stat(source_path)
+        if not (copied == on_disk == before.st_size == after.st_size
+                and before.st_mtime_ns == after.st_mtime_ns):
+            raise OSError(errno.EIO, f"verification failed copying {source_path} to {dest_path}")
+        shutil.copystat(source_path, temp_path)
+        os.replace(temp_path, dest_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(dest_dir)
+    os.remove(source_path)
+    logger.debug("📦 Copied %s across devices: %s bytes, blake2b %s", os.path.basename(dest_path), copied, digest)
 
+class RealFilesystem:
+    """Filesystem backend that works directly on disk."""
+
+    # Virtual backends can absorb dry-run changes without touching disk
+    virtual = False
+
+    def scandir(self, dir_path):
+        with os.scandir(dir_path) as entries:
+            return [DirRecord.from_entry(entry) for entry in entries]
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def isdir(self, path):
+        return os.path.isdir(path)
+
+    def isfile(self, path):
+        return os.path.isfile(path)
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def makedirs(self, path):
+        os.makedirs(path, exist_ok=True)
+
+    def move(self, source_path, dest_path):
+        fast_move(source_path, dest_path)
+
+    def remove(self, path):
+        os.remove(path)
+
+    def link(self, source_path, dest_path):
+        return link_duplicate_file(source_path, dest_path)
+
+    def rmdir(self, path):
+        os.rmdir(path)
+
+    def open(self, path, mode='rb'):
+        return open(path, mode)
+
+def dir_fd_supported():
+    """True when the platform can run --fd-relative (dir_fd calls and scandir on a descriptor)."""
+    needed = (os.stat, os.open, os.mkdir, os.rmdir, os.unlink, os.rename)
+    return (hasattr(os, 'O_DIRECTORY') and all(func in os.supports_dir_fd for func in needed)
+            and os.scandir in os.supports_fd)
+
+class DirFdFilesystem(RealFilesystem):
+    """Disk backend that works relative to open directory descriptors (--fd-relative).
+
+    Directories under root_dir are opened one component at a time relative to
+    their already open parent, with O_NOFOLLOW, and kept in a small LRU cache;
+    every listing, stat, rename, mkdir and rmdir then names only the last
+    component. Deep paths on network shares are not resolved again for each
+    call, and a folder swapped for a symlink during the run is refused instead
+    of followed. Cross-device moves fall back to fast_move on full paths.
+    POSIX only; see dir_fd_supported().
+    """
+
+    MAX_OPEN_DIRS = 128
+
+    def __init__(self, root_dir):
+        self.root_dir = os.path.abspath(root_dir)
+        self._fds = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _open_dir(self, key):
+        """Open key relative to its parent's descriptor (or by path for the root)."""
+        parent, name = os.path.split(key)
+        if key == self.root_dir or not name or not key.startswith(self.root_dir + os.sep):
+            return os.open(key, os.O_RDONLY | os.O_DIRECTORY)
+        parent_fd = self._acquire(parent)
+        try:
+            return os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=parent_fd)
+        finally:
+            self._release(parent)
+
+    def _acquire(self, key):
+        """Return an open descriptor for the absolute path key, pinned until _release."""
+        with self._lock:
+            entry = self._fds.get(key)
+            if entry is not None:
+                entry[1] += 1
+                self._fds.move_to_end(key)
+                return entry[0]
+        fd = self._open_dir(key)
+        with self._lock:
+            entry = self._fds.get(key)
+            if entry is not None:
+                # Another thread opened it meanwhile
+                os.close(fd)
+                entry[1] += 1
+                return entry[0]
+            self._fds[key] = [fd, 1]
+            self._evict_locked()
+        return fd
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._fds.get(key)
+            if entry is not None:
+                entry[1] -= 1
+            self._evict_locked()
+
+    def _evict_locked(self):
+        # Close the least recently used descriptors that nobody is using
+        while len(self._fds) > self.MAX_OPEN_DIRS:
+            for key, entry in self._fds.items():
+                if entry[1] == 0:
+                    break
+            else:
+                return
+            del self._fds[key]
+            os.close(entry[0])
+
+    def _forget(self, dir_path):
+        """Close the cached descriptor of a directory that was moved or removed."""
+        key = os.path.abspath(dir_path)
+        with self._lock:
+            entry = self._fds.get(key)
+            if entry is not None and entry[1] == 0:
+                del self._fds[key]
+                os.close(entry[0])
+
+    @contextlib.contextmanager
+    def _parent(self, path):
+        """Yield (parent descriptor, last component) for path."""
+        parent, name = os.path.split(os.path.abspath(path))
+        parent_fd = self._acquire(parent)
+        try:
+            yield parent_fd, name
+        finally:
+            self._release(parent)
+
+    def scandir(self, dir_path):
+        key = os.path.abspath(dir_path)
+        prefix = os.path.join(dir_path, "")
+        dir_fd = self._acquire(key)
+        try:
+            with os.scandir(dir_fd) as entries:
+                return [_DirFdRecord(entry.name, prefix + entry.name, entry.is_dir(), entry.is_file(), self)
+                        for entry in entries]
+        finally:
+            self._release(key)
+
+    def stat(self, path):
+        with self._parent(path) as (parent_fd, name):
+            return os.stat(name, dir_fd=parent_fd)
+
+    def exists(self, path):
+        try:
+            self.stat(path)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def isdir(self, path):
+        try:
+            return stat.S_ISDIR(self.stat(path).st_mode)
+        except (OSError, ValueError):
+            return False
+
+    def isfile(self, path):
+        try:
+            return stat.S_ISREG(self.stat(path).st_mode)
+        except (OSError, ValueError):
+            return False
+
+    def makedirs(self, path):
+        if self.isdir(path):
+            return
+        parent = os.path.dirname(os.path.abspath(path))
+        if parent != path:
+            self.makedirs(parent)
+        with self._parent(path) as (parent_fd, name):
+            try:
+                os.mkdir(name, dir_fd=parent_fd)
+            except FileExistsError:
+                if not self.isdir(path):
+                    raise
+
+    def move(self, source_path, dest_path):
+        try:
+            with self._parent(source_path) as (source_fd, source_name), \
+                    self._parent(dest_path) as (dest_fd, dest_name):
+                os.replace(source_name, dest_name, src_dir_fd=source_fd, dst_dir_fd=dest_fd)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            fast_move(source_path, dest_path)
+        self._forget(source_path)
+
+    def remove(self, path):
+        with self._parent(path) as (parent_fd, name):
+            os.unlink(name, dir_fd=parent_fd)
+
+    def rmdir(self, path):
+        self._forget(path)
+        with self._parent(path) as (parent_fd, name):
+            os.rmdir(name, dir_fd=parent_fd)
+
+    def open(self, path, mode='rb'):
+        if mode != 'rb':
+            return super().open(path, mode)
+        with self._parent(path) as (parent_fd, name):
+            return os.fdopen(os.open(name, os.O_RDONLY, dir_fd=parent_fd), 'rb')
+
+    def close(self):
+        """Close every cached directory descriptor."""
+        with self._lock:
+            for fd, _ in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
+
+class _FsNode:
+    """File or directory held by an in-memory backend.
+    Files either carry their own bytes or point at the real file they came from."""
+
+    __slots__ = ('name', 'path', 'is_dir', 'size', 'mtime', 'data', 'real_path', 'opaque')
+
+    def __init__(self, path, is_dir, size=0, mtime=None, data=None, real_path=None):
+        self.name = os.path.basename(path)
+        self.path = path
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime = time.time() if mtime is None else mtime
+        self.data = data
+        self.real_path = real_path
+        # Directories created in memory never show entries from the disk below them
+        self.opaque = is_dir
+
+    def stat(self):
+        if self.real_path is not None:
+            return os.stat(self.real_path)
+        mode = (stat.S_IFDIR | 0o755) if self.is_dir else (stat.S_IFREG | 0o644)
+        return os.stat_result((mode, 0, 0, 1, 0, 0, self.size, self.mtime, self.mtime, self.mtime))
+
+class MemoryFilesystem:
+    """Filesystem backend held entirely in memory.
+
+    Nothing is read from or written to disk, so whole runs and benchmarks can
+    be executed against synthetic trees. Paths are keyed case-insensitively on
+    Windows, as on disk.
+    """
+
+    virtual = True
+
+    def __init__(self):
+        self._nodes = {}
+        self._children = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    # -- Base layer hooks (nothing underneath a pure in-memory tree) ----------
+
+    def _base_stat(self, path, key):
+        if os.path.dirname(key) == key:
+            return os.stat_result((stat.S_IFDIR | 0o755, 0, 0, 1, 0, 0, 0, 0, 0, 0))
+        raise FileNotFoundError(errno.ENOENT, "No such file or directory", path)
+
+    def _base_scandir(self, dir_path, key):
+        self._base_stat(dir_path, key)
+        return []
+
+    def _forget(self, key):
+        """Hook called after an entry is removed from the tree."""
+
+    # -- Tree helpers ---------------------------------------------------------
+
+    def _kind(self, path):
+        """Return 'dir', 'file' or None for path."""
+        key = self._key(path)
+        node = self._nodes.get(key)
+        if node is not None:
+            return 'dir' if node.is_dir else 'file'
+        try:
+            return 'dir' if stat.S_ISDIR(self._base_stat(path, key).st_mode) else 'file'
+        except OSError:
+            return None
+
+    def _add_node(self, node):
+        key = self._key(node.path)
+        self._nodes[key] = node
+        self._children.setdefault(os.path.dirname(key), {})[key] = node
+
+    def _remove_entry(self, path):
+        key = self._key(path)
+        node = self._nodes.pop(key, None)
+        if node is not None:
+            self._children.get(os.path.dirname(key), {}).pop(key, None)
+            self._children.pop(key, None)
+        self._forget(key)
+
+    def _require_parent(self, path):
+        parent = os.path.dirname(os.path.abspath(path))
+        if self._kind(parent) != 'dir':
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", parent)
+
+    # -- Backend interface ----------------------------------------------------
+
+    def scandir(self, dir_path):
+        with self._lock:
+            key = self._key(dir_path)
+            node = self._nodes.get(key)
+            if node is not None:
+                if not node.is_dir:
+                    raise NotADirectoryError(errno.ENOTDIR, "Not a directory", dir_path)
+                base_records = [] if node.opaque else self._base_scandir(dir_path, key)
+            else:
+                base_records = self._base_scandir(dir_path, key)
+            
+            added = self._children.get(key, {})
+            records = [record for record in base_records if self._key(record.path) not in added]
+            records.extend(DirRecord(child.name, os.path.join(dir_path, child.name), child.is_dir,
+                                     not child.is_dir, child)
+                           for child in added.values())
+            return records
+
+    def exists(self, path):
+        with self._lock:
+            return self._kind(path) is not None
+
+    def isdir(self, path):
+        with self._lock:
+            return self._kind(path) == 'dir'
+
+    def isfile(self, path):
+        with self._lock:
+            return self._kind(path) == 'file'
+
+    def stat(self, path):
+        with self._lock:
+            key = self._key(path)
+            node = self._nodes.get(key)
+            if node is not None:
+                return node.stat()
+            return self._base_stat(path, key)
+
+    def makedirs(self, path):
+        with self._lock:
+            kind = self._kind(path)
+            if kind == 'dir':
+                return
+            if kind == 'file':
+                raise FileExistsError(errno.EEXIST, "File exists", path)
+            parent = os.path.dirname(os.path.abspath(path))
+            if parent != os.path.abspath(path):
+                self.makedirs(parent)
+            self._add_node(_FsNode(os.path.abspath(path), is_dir=True))
+
+    def move(self, source_path, dest_path):
+        with self._lock:
+            if self._kind(dest_path) == 'dir':
+                dest_path = os.path.join(dest_path, os.path.basename(source_path))
+            kind = self._kind(source_path)
+            if kind is None:
+                raise FileNotFoundError(errno.ENOENT, "No such file or directory", source_path)
+            if kind == 'dir':
+                raise IsADirectoryError(errno.EISDIR, "Directory moves are not supported", source_path)
+            self._require_parent(dest_path)
+            
+            source = self._nodes.get(self._key(source_path))
+            if source is not None:
+                moved = _FsNode(os.path.abspath(dest_path), False, source.size, source.mtime,
+                                source.data, source.real_path)
+            else:
+                # File from the base layer: keep reading its content from disk
+                moved = _FsNode(os.path.abspath(dest_path), False, real_path=os.path.abspath(source_path))
+            self._remove_entry(source_path)
+            self._remove_entry(dest_path)
+            self._add_node(moved)
+
+    def link(self, source_path, dest_path):
+        """Give dest_path the content of source_path (a hard link, as far as memory goes)."""
+        with self._lock:
+            if self._kind(source_path) != 'file' or self._kind(dest_path) != 'file':
+                raise FileNotFoundError(errno.ENOENT, "No such file", source_path)
+            source = self._nodes.get(self._key(source_path))
+            if source is not None:
+                linked = _FsNode(os.path.abspath(dest_path), False, source.size, source.mtime,
+                                 source.data, source.real_path)
+            else:
+                linked = _FsNode(os.path.abspath(dest_path), False, real_path=os.path.abspath(source_path))
+            self._remove_entry(dest_path)
+            self._add_node(linked)
+            return 'hardlink'
+
+    def remove(self, path):
+        with self._lock:
+            kind = self._kind(path)
+            if kind is None:
+                raise FileNotFoundError(errno.ENOENT, "No such file or directory", path)
+            if kind == 'dir':
+                raise IsADirectoryError(errno.EISDIR, "Is a directory", path)
+            self._remove_entry(path)
+
+    def rmdir(self, path):
+        with self._lock:
+            if self._kind(path) != 'dir':
+                raise FileNotFoundError(errno.ENOENT, "No such directory", path)
+            if self.scandir(path):
+                raise OSError(errno.ENOTEMPTY, "Directory not empty", path)
+            self._remove_entry(path)
+
+    def open(self, path, mode='rb'):
+        if mode not in ('r', 'rb'):
+            raise ValueError("In-memory files can only be opened for reading")
+        with self._lock:
+            node = self._nodes.get(self._key(path))
+            if node is None:
+                if self._kind(path) is None:
+                    raise FileNotFoundError(errno.ENOENT, "No such file or directory", path)
+                return open(path, 'rb')
+            if node.is_dir:
+                raise IsADirectoryError(errno.EISDIR, "Is a directory", path)
+            if node.real_path is not None:
+                return open(node.real_path, 'rb')
+            return io.BytesIO(node.data or b"")
+
+    def write_file(self, path, data=b"", mtime=None):
+        """Create or replace an in-memory file (for building synthetic trees)."""
+        with self._lock:
+            self._require_parent(path)
+            self._remove_entry(path)
+            self._add_node(_FsNode(os.path.abspath(path), False, len(data), mtime, bytes(data)))
+
+class OverlayFilesystem(MemoryFilesystem):
+    """Copy-on-write view of the real disk.
+
+    Reads fall through to disk until a path is changed; moves, deletes and new
+    folders are recorded in memory on top of it. Dry runs use this so later
+    checks see the effects of earlier (pending) operations.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._removed = set()
+
+    def _base_stat(self, path, key):
+        if key in self._removed:
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", path)
+        return os.stat(path)
+
+    def _base_scandir(self, dir_path, key):
+        if key in self._removed:
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", dir_path)
+        with os.scandir(dir_path) as entries:
+            records = [DirRecord.from_entry(entry) for entry in entries]
+        if not self._removed:
+            return records
+        return [record for record in records if self._key(record.path) not in self._removed]
+
+    def _add_node(self, node):
+        super()._add_node(node)
+        self._removed.discard(self._key(node.path))
+
+    def _forget(self, key):
+        self._removed.add(key)
+
+    def pending_changes(self):
+        """Return (paths added in memory, paths hidden from disk)."""
+        with self._lock:
+            return sorted(node.path for node in self._nodes.values()), sorted(self._removed)
+
+# Backend used by every engine function; execute_mode swaps in an overlay for dry runs
+_filesystem = contextvars.ContextVar('filesystem', default=RealFilesystem())
+
+def set_filesystem(filesystem):
+    """Make filesystem the active backend of the current context and return the previous one."""
+    previous = _filesystem.get()
+    _filesystem.set(filesystem)
+    return previous
+
+class MeteredFilesystem:
+    """Wraps another backend and records every call into the active RunMetrics."""
+
+    def __init__(self, inner):
+        self._inner = inner
+        self.virtual = inner.virtual
+
+    def __getattr__(self, name):
+        attribute = getattr(self._inner, name)
+        if not callable(attribute):
+            return attribute
+
+        def metered(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                metrics = _metrics.get()
+                if metrics is not None:
+                    metrics.add_filesystem_call(name, time.perf_counter() - start)
+
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, metered)
+        return metered
+
+@contextlib.contextmanager
+def metered_filesystem():
+    """Count filesystem calls on the active backend while metrics are collected."""
+    if _metrics.get() is None:
+        yield
+        return
+    previous = set_filesystem(MeteredFilesystem(_filesystem.get()))
+    try:
+        yield
+    finally:
+        set_filesystem(previous)
+
+def _applies_changes(dry_run):
+    """True when a change should be made on the active backend.
+    Dry runs only change virtual backends, so they can see their own effects."""
+    return not dry_run or _filesystem.get().virtual
+
+# =============================================================================
+# DIRECTORY WALKER
+# =============================================================================
+
+class DirRecord:
+    """Compact directory entry read once per directory listing.
+
+    Entry types come from the directory read itself (d_type on Linux, the
+    FindNextFile data on Windows), so no extra stat call is made per entry.
+    stat() is only issued when a caller actually needs size or mtime and is
+    cached by the underlying DirEntry (or answered by the in-memory node).
+    """
+
+    __slots__ = ('name', 'path', 'is_dir', 'is_file', '_source')
+
+    def __init__(self, name, path, is_dir, is_file, source):
+        self.name = name
+        self.path = path
+        self.is_dir = is_dir
+        self.is_file = is_file
+        self._source = source
+
+    @classmethod
+    def from_entry(cls, entry):
+        """Build a record from an os.DirEntry."""
+        return cls(entry.name, entry.path, entry.is_dir(), entry.is_file(), entry)
+
+    def stat(self):
+        """Return the (cached) stat result for this entry."""
+        return self._source.stat()
+
+    def __repr__(self):
+        kind = "dir" if self.is_dir else "file" if self.is_file else "other"
+        return f"DirRecord({self.name!r}, {kind})"
+
+class _DirFdRecord(DirRecord):
+    """DirRecord listed through a directory descriptor. A DirEntry from
+    os.scandir(fd) needs that descriptor to stay open, so stat() goes
+    through the backend (its _source) instead."""
+
+    __slots__ = ()
+
+    def stat(self):
+        return self._source.stat(self.path)
+
+def scan_directory(dir_path):
+    """Read a directory once through the active filesystem backend and return
+    a list of DirRecord entries. Raises OSError like os.listdir if the directory
+    cannot be read."""
+    return _filesystem.get().scandir(dir_path)
+
+class TreeEntry:
+    """One step of a streaming walk: a file, or a directory whose whole
+    subtree has been walked and may now be pruned."""
+
+    __slots__ = ('path', 'name', 'relative_path', 'is_dir')
+
+    def __init__(self, path, name, relative_path, is_dir):
+        self.path = path
+        self.name = name
+        self.relative_path = relative_path
+        self.is_dir = is_dir
+
+    def __repr__(self):
+        return f"TreeEntry({self.relative_path!r}, {'dir' if self.is_dir else 'file'})"
+
+def walk_tree(folder_path, should_descend, scan_threads=1):
+    """Stream the tree under folder_path as TreeEntry records.
+
+    Files are yielded in listing order, descending into each subfolder where
+    it is listed; a subfolder itself is yielded after everything below it
+    (post-order), so callers can prune it right away. should_descend(name)
+    decides which subfolders are followed; folder_path itself is not yielded.
+    Only the listings along the current path are held in memory. With
+    scan_threads > 1 folders are read ahead concurrently, within a fixed budget."""
+    logger = logging.getLogger(__name__)
+    prefetcher = ListingPrefetcher(should_descend, scan_threads) if scan_threads > 1 else None
+    
+    def read(dir_path):
+        try:
+            records = prefetcher.read(dir_path) if prefetcher is not None else scan_directory(dir_path)
+            logger.debug("🔍 Scanning: %s (%s items)", dir_path, len(records))
+        except OSError as e:
+            logger.error("❌ Error accessing %s: %s", dir_path, e)
+            return iter(())
+        if prefetcher is not None:
+            prefetcher.prefetch(record.path for record in records
+                                if record.is_dir and should_descend(record.name))
+        return iter(records)
+    
+    stack = [(folder_path, "", read(folder_path))]
+    try:
+        while stack:
+            dir_path, relative_path, records = stack[-1]
+            for record in records:
+                item_relative = os.path.join(relative_path, record.name) if relative_path else record.name
+                if record.is_file:
+                    yield TreeEntry(record.path, record.name, item_relative, False)
+                elif record.is_dir:
+                    if should_descend(record.name):
+                        logger.debug("📁 Found folder: %s", item_relative)
+                        stack.append((record.path, item_relative, read(record.path)))
+                        break
+                    logger.debug("⏭️ Skipping standard subfolder: %s", record.name)
+            else:
+                stack.pop()
+                if stack:
+                    yield TreeEntry(dir_path, os.path.basename(dir_path), relative_path, True)
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+
+# Collision suffixes are capped at _999, as before the index existed
+MAX_COLLISION_SUFFIX = 999
+SUFFIX_PATTERN = re.compile(r'^(.*)_([1-9][0-9]*)$')
+
+class DirectoryNameIndex:
+    """Per-directory name cache used for collision handling.
+
+    Each destination directory is read once. Existing `name_N.ext` siblings
+    are grouped by (name, ext) so the next free suffix and the set of
+    suffixed duplicates are answered from memory instead of probing
+    os.path.exists up to 999 times. The run keeps the index current through
+    add() and discard() as it moves, creates and deletes entries.
+    """
+
+    def __init__(self):
+        self._dirs = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def _split_suffix(name):
+        """Return ((name, ext), N) for `name_N.ext`, or (None, None)."""
+        stem, ext = os.path.splitext(name)
+        match = SUFFIX_PATTERN.match(stem)
+        if not match:
+            return None, None
+        number = int(match.group(2))
+        if number > MAX_COLLISION_SUFFIX:
+            return None, None
+        return (match.group(1), ext), number
+
+    def _load(self, dir_path):
+        """Return the cached listing of dir_path, reading it on first use."""
+        key = self._key(dir_path)
+        listing = self._dirs.get(key)
+        if listing is None:
+            listing = {'names': set(), 'suffixes': {}, 'next_free': {}}
+            try:
+                records = scan_directory(dir_path)
+            except OSError:
+                records = []
+            for record in records:
+                self._add_name(listing, os.path.normcase(record.name))
+            self._dirs[key] = listing
+        return listing
+
+    def _add_name(self, listing, name):
+        listing['names'].add(name)
+        base, number = self._split_suffix(name)
+        if base is not None:
+            listing['suffixes'].setdefault(base, set()).add(number)
+
+    def exists(self, path):
+        """Return True if path is known to exist in its directory."""
+        with self._lock:
+            listing = self._load(os.path.dirname(path))
+            return os.path.normcase(os.path.basename(path)) in listing['names']
+
+    def next_free_suffix(self, dest_path):
+        """Return the lowest free N for `name_N.ext`, or None past the cap."""
+        with self._lock:
+            listing = self._load(os.path.dirname(dest_path))
+            base = os.path.splitext(os.path.normcase(os.path.basename(dest_path)))
+            used = listing['suffixes'].get(base, ())
+            number = listing['next_free'].get(base, 1)
+            while number in used:
+                number += 1
+            listing['next_free'][base] = number
+            return number if number <= MAX_COLLISION_SUFFIX else None
+
+    def suffixed_duplicates(self, dest_path):
+        """Return existing `name_N.ext` paths next to dest_path, lowest N first."""
+        with self._lock:
+            listing = self._load(os.path.dirname(dest_path))
+            base = os.path.splitext(os.path.normcase(os.path.basename(dest_path)))
+            name, ext = os.path.splitext(os.path.basename(dest_path))
+            base_dir = os.path.dirname(dest_path)
+            return [os.path.join(base_dir, f"{name}_{number}{ext}")
+                    for number in sorted(listing['suffixes'].get(base, ()))]
+
+    def add(self, path):
+        """Record that path now exists (only if its directory is cached)."""
+        with self._lock:
+            listing = self._dirs.get(self._key(os.path.dirname(path)))
+            if listing is not None:
+                self._add_name(listing, os.path.normcase(os.path.basename(path)))
+
+    def discard(self, path):
+        """Record that path no longer exists."""
+        with self._lock:
+            key = self._key(path)
+            self._dirs.pop(key, None)
+            listing = self._dirs.get(self._key(os.path.dirname(path)))
+            if listing is None:
+                return
+            name = os.path.normcase(os.path.basename(path))
+            listing['names'].discard(name)
+            base, number = self._split_suffix(name)
+            if base is not None:
+                listing['suffixes'].get(base, set()).discard(number)
+                if number < listing['next_free'].get(base, 1):
+                    listing['next_free'][base] = number
+
+    def clear(self):
+        """Forget every cached directory."""
+        with self._lock:
+            self._dirs.clear()
+
+# Shared by every phase of a run; reset at the start of execute_mode
+_name_index = contextvars.ContextVar('name_index', default=DirectoryNameIndex())
+
+# =============================================================================
+# DUPLICATE DETECTION
+# =============================================================================
+
+HASH_CACHE_FILENAME = ".template_fixer_hashes.db"
+
+class HashCache:
+    """SQLite sidecar cache of file digests.
+
+    Entries are keyed by inode (or path where the filesystem has no inode
+    numbers) and are only trusted while size and mtime still match, so re-runs
+    do not re-read unchanged multi-GB assets.
+    """
+
+    # Pending writes are committed in batches rather than one by one
+    COMMIT_EVERY = 200
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes ("
+            " file_key TEXT NOT NULL, kind TEXT NOT NULL, size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL,"
+            " PRIMARY KEY (file_key, kind))"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def file_key(path, file_stat):
+        if file_stat.st_ino:
+            return f"{file_stat.st_dev}:{file_stat.st_ino}"
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def _mtime_ns(file_stat):
+        return file_stat.st_mtime_ns or int(file_stat.st_mtime * 1_000_000_000)
+
+    def get(self, path, file_stat, kind):
+        """Return the cached digest for path, or None if missing or stale."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, digest FROM file_hashes WHERE file_key = ? AND kind = ?",
+                (self.file_key(path, file_stat), kind)
+            ).fetchone()
+        if row and row[0] == file_stat.st_size and row[1] == self._mtime_ns(file_stat):
+            return row[2]
+        return None
+
+    def put(self, path, file_stat, kind, digest):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?)",
+                (self.file_key(path, file_stat), kind, file_stat.st_size,
+                 self._mtime_ns(file_stat), digest)
+            )
+            self._pending += 1
+            if self._pending >= self.COMMIT_EVERY:
+                self._connection.commit()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+class DuplicateDetector:
+    """Content-based duplicate detection.
+
+    Files are compared by size first, then by a hash of their first and last
+    blocks, and only then by a full streaming hash. Digests are kept in memory
+    for the run and, when a HashCache is attached, across runs.
+    """
+
+    BLOCK_SIZE = 64 * 1024
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self._memo = {}
+        self._lock = threading.Lock()
+        self.bytes_hashed = 0
+
+    def _digest(self, path, file_stat, kind):
+        memo_key = (HashCache.file_key(path, file_stat), file_stat.st_size, file_stat.st_mtime, kind)
+        with self._lock:
+            digest = self._memo.get(memo_key)
+        if digest is not None:
+            return digest
+        
+        if self.cache is not None:
+            digest = self.cache.get(path, file_stat, kind)
+        if digest is None:
+            digest = self._sample_hash(path, file_stat.st_size) if kind == 'sample' else self._full_hash(path)
+            if self.cache is not None:
+                self.cache.put(path, file_stat, kind, digest)
+        
+        with self._lock:
+            self._memo[memo_key] = digest
+        return digest
+
+    def _sample_hash(self, path, size):
+        """Hash the first and last block of a file."""
+        hasher = hashlib.blake2b(digest_size=16)
+        with _filesystem.get().open(path, 'rb') as handle:
+            hasher.update(handle.read(self.BLOCK_SIZE))
+            if size > self.BLOCK_SIZE:
+                handle.seek(max(self.BLOCK_SIZE, size - self.BLOCK_SIZE))
+                hasher.update(handle.read(self.BLOCK_SIZE))
+        self.bytes_hashed += min(size, 2 * self.BLOCK_SIZE)
+        return hasher.hexdigest()
+
+    def _full_hash(self, path):
+        """Stream the whole file through the hash."""
+        hasher = hashlib.blake2b()
+        with _filesystem.get().open(path, 'rb') as handle:
+            while True:
+                chunk = handle.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                self.bytes_hashed += len(chunk)
+        return hasher.hexdigest()
+
+    def content_hash(self, path):
+        """Return the full content digest of path."""
+        return self._digest(path, _filesystem.get().stat(path), 'full')
+
+    def are_identical(self, path1, path2):
+        """Return True if both files have identical content."""
+        filesystem = _filesystem.get()
+        stat1 = filesystem.stat(path1)
+        stat2 = filesystem.stat(path2)
+        if stat1.st_size != stat2.st_size:
+            return False
+        if stat1.st_ino and (stat1.st_dev, stat1.st_ino) == (stat2.st_dev, stat2.st_ino):
+            return True
+        if stat1.st_size == 0:
+            return True
+        if self._digest(path1, stat1, 'sample') != self._digest(path2, stat2, 'sample'):
+            return False
+        # The first and last block already cover small files completely
+        if stat1.st_size <= 2 * self.BLOCK_SIZE:
+            return True
+        return self._digest(path1, stat1, 'full') == self._digest(path2, stat2, 'full')
+
+    def confirm_identical(self, path1, path2):
+        """Stream both files through the full hash again, ignoring every cached
+        digest. Used right before one file is replaced by the other."""
+        return self._full_hash(path1) == self._full_hash(path2)
+
+    def group_duplicates(self, paths):
+        """Group paths into lists of identical files (groups of two or more)."""
+        by_size = {}
+        for path in paths:
+            try:
+                by_size.setdefault(_filesystem.get().stat(path).st_size, []).append(path)
+            except OSError:
+                continue
+        
+        groups = []
+        for size, same_size in by_size.items():
+            if len(same_size) < 2:
+                continue
+            kind = 'sample' if size <= 2 * self.BLOCK_SIZE else 'full'
+            by_sample = {}
+            for path in same_size:
+                by_sample.setdefault(self._digest(path, _filesystem.get().stat(path), 'sample'), []).append(path)
+            for candidates in by_sample.values():
+                if len(candidates) < 2:
+                    continue
+                if kind == 'sample':
+                    groups.append(candidates)
+                    continue
+                by_full = {}
+                for path in candidates:
+                    by_full.setdefault(self.content_hash(path), []).append(path)
+                groups.extend(group for group in by_full.values() if len(group) > 1)
+        return groups
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+# Replaced by execute_mode with a detector backed by the run's hash cache
+_duplicates = contextvars.ContextVar('duplicates', default=DuplicateDetector())
+
+# =============================================================================
+# DUPLICATE LINKING
+# =============================================================================
+
+# Linux ioctl requests; the fcntl module only names FICLONE from Python 3.12
+FICLONE = 0x40049409
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_HEADER = struct.Struct('QQIIII')
+FIEMAP_EXTENT = struct.Struct('QQQQQIIII')
+
+def clone_file(source_path, dest_path):
+    """Create dest_path as a copy-on-write clone of source_path (FICLONE, e.g.
+    on Btrfs or XFS). Raises OSError where the filesystem cannot clone."""
+    if not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, "reflinks are only available on Linux")
+    import fcntl  # POSIX only
+    with open(source_path, 'rb') as source:
+        dest_fd = os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            fcntl.ioctl(dest_fd, FICLONE, source.fileno())
+        except BaseException:
+            os.close(dest_fd)
+            os.remove(dest_path)
+            raise
+        os.close(dest_fd)
+
+def _first_extent(path):
+    """Physical offset of the first data extent of path (FIEMAP), or None."""
+    if not sys.platform.startswith('linux'):
+        return None
+    import fcntl  # POSIX only
+    request = bytearray(FIEMAP_HEADER.size + FIEMAP_EXTENT.size)
+    FIEMAP_HEADER.pack_into(request, 0, 0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0)
+    try:
+        with open(path, 'rb') as handle:
+            fcntl.ioctl(handle.fileno(), FS_IOC_FIEMAP, request)
+    except OSError:
+        return None
+    if not FIEMAP_HEADER.unpack_from(request)[3]:
+        return None
+    return FIEMAP_EXTENT.unpack_from(request, FIEMAP_HEADER.size)[1] or None
+
+def share_storage(path1, path2):
+    """True when both paths already use the same data: hard links of one
+    inode, or reflinks whose first extents are the same blocks."""
+    filesystem = _filesystem.get()
+    stat1 = filesystem.stat(path1)
+    stat2 = filesystem.stat(path2)
+    if stat1.st_ino and (stat1.st_dev, stat1.st_ino) == (stat2.st_dev, stat2.st_ino):
+        return True
+    if filesystem.virtual or stat1.st_dev != stat2.st_dev or not stat1.st_size:
+        return False
+    extent = _first_extent(path1)
+    return extent is not None and extent == _first_extent(path2)
+
+def link_duplicate_file(keep_path, duplicate_path):
+    """Replace duplicate_path with a reflink of keep_path, or with a hard link
+    where the filesystem cannot clone. The link is made under a hidden
+    temporary name and renamed over the duplicate, so the duplicate's name
+    never goes missing. A reflink keeps the duplicate's timestamps and
+    permissions; a hard link shares those of keep_path. Returns 'reflink'
+    or 'hardlink'."""
+    duplicate_dir = os.path.dirname(duplicate_path) or "."
+    temp_path = os.path.join(duplicate_dir, f".{os.path.basename(duplicate_path)}.{os.getpid()}.link")
+    try:
+        try:
+            clone_file(keep_path, temp_path)
+            kind = 'reflink'
+            shutil.copystat(duplicate_path, temp_path)
+        except OSError as e:
+            if os.path.exists(temp_path):
+                raise
+            logging.getLogger(__name__).debug("🔗 No reflink for %s (%s), using a hard link",
+                                              os.path.basename(duplicate_path), e)
+            os.link(keep_path, temp_path)
+            kind = 'hardlink'
+        os.replace(temp_path, duplicate_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+    return kind
+
+class DuplicateLinker:
+    """Reclaims the space of duplicate files by turning them into links to
+    the copy that is kept (--dedup-links).
+
+    A duplicate is only replaced once the DuplicateDetector found it
+    identical and a fresh streaming hash of both files, ignoring cached
+    digests, confirmed it. Files that already share their data are left
+    alone, so re-runs do not link (or count) them again. Counts the files
+    linked and the bytes their own copies took up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = set()
+        # Dry runs cannot see their own links on disk, so linked pairs are remembered
+        self._pairs = set()
+        self.linked = 0
+        self.bytes_reclaimed = 0
+
+    def link(self, keep_path, duplicate_path, dry_run=False):
+        """Replace duplicate_path with a link to keep_path if both hold the
+        same content. Returns True when it was linked (or would be)."""
+        logger = logging.getLogger(__name__)
+        pair = frozenset(os.path.normcase(os.path.abspath(path)) for path in (keep_path, duplicate_path))
+        with self._lock:
+            if pair in self._pairs:
+                return False
+        try:
+            if (share_storage(keep_path, duplicate_path)
+                    or not _duplicates.get().are_identical(keep_path, duplicate_path)):
+                return False
+            duplicate_stat = _filesystem.get().stat(duplicate_path)
+            # Space only comes back when no other name still holds the duplicate's data
+            reclaimed = duplicate_stat.st_size if duplicate_stat.st_nlink <= 1 else 0
+            # Linking changes no names, so dry runs have nothing to play out
+            if dry_run:
+                record_operation('link', src=keep_path, path=duplicate_path)
+                logger.info("🔗 Would link duplicate: %s → %s", duplicate_path, keep_path)
+            else:
+                if not _duplicates.get().confirm_identical(keep_path, duplicate_path):
+                    logger.warning("⚠️ Content changed since it was hashed, not linking: %s", duplicate_path)
+                    return False
+                # A file written to while it was hashed is not replaced
+                current_stat = _filesystem.get().stat(duplicate_path)
+                if (current_stat.st_size, current_stat.st_mtime_ns) != (duplicate_stat.st_size,
+                                                                        duplicate_stat.st_mtime_ns):
+                    logger.warning("⚠️ Content changed since it was hashed, not linking: %s", duplicate_path)
+                    return False
+                record_operation('link', src=keep_path, path=duplicate_path)
+                kind = _filesystem.get().link(keep_path, duplicate_path)
+                logger.info("🔗 Linked duplicate (%s): %s → %s", kind, duplicate_path, keep_path)
+        except OSError as e:
+            logger.error("❌ Failed to link duplicate %s: %s", duplicate_path, e)
+            return False
+        with self._lock:
+            self._pairs.add(pair)
+            self.linked += 1
+            self.bytes_reclaimed += reclaimed
+        return True
+
+    def link_suffixed(self, dest_path, dry_run=False):
+        """Link the `name_N.ext` copies next to dest_path that duplicate it or
+        each other to the first of them (dest_path itself where it is one)."""
+        family = [dest_path] + _name_index.get().suffixed_duplicates(dest_path)
+        if len(family) < 2:
+            return
+        # Each set of copies is only hashed once per run
+        family_key = tuple(os.path.normcase(path) for path in family)
+        with self._lock:
+            if family_key in self._families:
+                return
+            self._families.add(family_key)
+        try:
+            groups = _duplicates.get().group_duplicates(family)
+        except OSError as e:
+            logging.getLogger(__name__).error("❌ Failed to compare copies of %s: %s",
+                                              os.path.basename(dest_path), e)
+            return
+        for group in groups:
+            for duplicate_path in group[1:]:
+                self.link(group[0], duplicate_path, dry_run)
+
+    def existing_copy(self, source_path, dest_path):
+        """The `name_N.ext` copy next to dest_path with the same content as
+        source_path, or None. An incoming file that is already there under a
+        suffix then stays a duplicate of it instead of taking the next suffix."""
+        for copy_path in _name_index.get().suffixed_duplicates(dest_path):
+            try:
+                if _duplicates.get().are_identical(source_path, copy_path):
+                    return copy_path
+            except OSError as e:
+                logging.getLogger(__name__).debug("🔍 Could not compare %s with %s: %s", source_path, copy_path, e)
+        return None
+
+    def add_to(self, stats):
+        """Add the files linked and bytes reclaimed to a stats dict."""
+        stats['linked'] += self.linked
+        stats['bytes_reclaimed'] += self.bytes_reclaimed
+
+# Set by execute_mode (and watch/process_files) when --dedup-links is on
+_linker = contextvars.ContextVar('linker', default=None)
+
+# =============================================================================
+# INCREMENTAL RUNS
+# =============================================================================
+
+MANIFEST_FILENAME = ".template_fixer_manifest.db"
+
+def folder_signature(folder_path):
+    """Return (digest, layout) describing the directory tree under folder_path.
+
+    The layout lists every directory with its mtime and entry count. Adding,
+    removing or renaming an entry changes the mtime of the directory holding
+    it, so only directories are read: one listing each, no per-file stat.
+    Returns None if any directory cannot be read."""
+    layout = []
+    waiting = [(folder_path, "", _filesystem.get().stat(folder_path))]
+    try:
+        while waiting:
+            dir_path, relative_path, dir_stat = waiting.pop()
+            records = scan_directory(dir_path)
+            layout.append([relative_path, HashCache._mtime_ns(dir_stat), len(records)])
+            for record in records:
+                if record.is_dir:
+                    relative_item_path = os.path.join(relative_path, record.name) if relative_path else record.name
+                    waiting.append((record.path, relative_item_path, record.stat()))
+    except OSError:
+        return None
+    layout.sort()
+    # Different sorting rules give a different result for the same tree
+    digest = hashlib.blake2b(json.dumps([_rules.get().fingerprint, layout]).encode('utf-8'), digest_size=16).hexdigest()
+    return digest, layout
+
+class RunManifest:
+    """SQLite record of what a root looked like at the end of the last real run.
+
+    Holds each component folder's subtree signature and layout, the root files
+    that were left in place, and the mode and folder set the run used. Rows are
+    keyed by root so one manifest in --log-dir can serve several roots.
+    """
+
+    def __init__(self, db_path, root_dir, mode):
+        self.db_path = db_path
+        self.root_dir = os.path.normcase(os.path.abspath(root_dir))
+        self.mode = mode
+        self.skipped_folders = set()
+        self.skipped_files = 0
+        self._lock = threading.Lock()
+        self._signatures = {}
+        self._same_folder_set = False
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " root TEXT PRIMARY KEY, mode INTEGER NOT NULL, folder_set TEXT NOT NULL, finished TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS folders ("
+            " root TEXT NOT NULL, folder TEXT NOT NULL, mode INTEGER NOT NULL,"
+            " signature TEXT NOT NULL, layout TEXT NOT NULL, PRIMARY KEY (root, folder));"
+            "CREATE TABLE IF NOT EXISTS root_files ("
+            " root TEXT NOT NULL, name TEXT NOT NULL, size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL, PRIMARY KEY (root, name));"
+        )
+        self._connection.commit()
+        
+        # Everything the checks need is loaded up front; jobs only do dict lookups
+        self._last_run = self._connection.execute(
+            "SELECT mode, folder_set FROM runs WHERE root = ?", (self.root_dir,)
+        ).fetchone()
+        self._folders = {
+            folder: (folder_mode, signature)
+            for folder, folder_mode, signature in self._connection.execute(
+                "SELECT folder, mode, signature FROM folders WHERE root = ?", (self.root_dir,))
+        }
+        self._root_files = {
+            name: (size, mtime_ns)
+            for name, size, mtime_ns in self._connection.execute(
+                "SELECT name, size, mtime_ns FROM root_files WHERE root = ?", (self.root_dir,))
+        }
+
+    @staticmethod
+    def _folder_set_digest(folder_list):
+        joined = "\n".join([_rules.get().fingerprint] + sorted(folder_list))
+        return hashlib.blake2b(joined.encode('utf-8'), digest_size=16).hexdigest()
+
+    def begin(self, folder_list):
+        """Compare the folder set with the last run. Root files are only
+        skipped while the same folders exist, since a new folder can give a
+        previously unmatched file somewhere to go."""
+        self._same_folder_set = (self._last_run is not None
+                                 and self._last_run[0] == self.mode
+                                 and self._last_run[1] == self._folder_set_digest(folder_list))
+
+    def folder_unchanged(self, folder_path):
+        """True if folder_path still matches the signature stored by the last run in this mode."""
+        name = os.path.basename(folder_path)
+        stored = self._folders.get(name)
+        signature = folder_signature(folder_path) if stored and stored[0] == self.mode else None
+        with self._lock:
+            if signature is None or signature[0] != stored[1]:
+                self._signatures.pop(name, None)
+                return False
+            self._signatures[name] = signature
+            self.skipped_folders.add(name)
+        return True
+
+    def root_file_unchanged(self, record):
+        """True if a root file was already left in place by the last run and has not changed since."""
+        if not self._same_folder_set or record.name not in self._root_files:
+            return False
+        file_stat = record.stat()
+        if self._root_files[record.name] != (file_stat.st_size, HashCache._mtime_ns(file_stat)):
+            return False
+        self.skipped_files += 1
+        return True
+
+    def save(self, root_dir, folder_list):
+        """Store the state the run left behind. Folders confirmed unchanged
+        reuse the signature computed for the check."""
+        folders = []
+        for folder_name in folder_list:
+            folder_path = os.path.join(root_dir, folder_name)
+            if not _filesystem.get().isdir(folder_path):
+                continue
+            signature = self._signatures.get(folder_name) or folder_signature(folder_path)
+            if signature is not None:
+                folders.append((self.root_dir, folder_name, self.mode, signature[0], json.dumps(signature[1])))
+        
+        root_files = []
+        for record in scan_directory(root_dir):
+            if record.is_file:
+                file_stat = record.stat()
+                root_files.append((self.root_dir, record.name, file_stat.st_size, HashCache._mtime_ns(file_stat)))
+        
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM folders WHERE root = ?", (self.root_dir,))
+            self._connection.execute("DELETE FROM root_files WHERE root = ?", (self.root_dir,))
+            self._connection.executemany("INSERT INTO folders VALUES (?, ?, ?, ?, ?)", folders)
+            self._connection.executemany("INSERT INTO root_files VALUES (?, ?, ?, ?)", root_files)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?)",
+                (self.root_dir, self.mode, self._folder_set_digest(folder_list), datetime.now().isoformat())
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+# =============================================================================
+# PARALLEL EXECUTION
+# =============================================================================
+
+class _ThreadLogCapture(logging.Filter):
+    """Hold back records logged on worker threads so they can be replayed in order.
+    Threads that have not started a capture log straight through."""
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    def filter(self, record):
+        records = getattr(self._local, 'records', None)
+        if records is None:
+            return True
+        records.append(record)
+        return False
+
+    def start(self):
+        self._local.records = []
+
+    def stop(self):
+        records = self._local.records
+        self._local.records = None
+        return records
+
+_log_capture = _ThreadLogCapture()
+logging.getLogger(__name__).addFilter(_log_capture)
+
+class FolderLockTable:
+    """One lock per component folder, so work on the same folder never overlaps."""
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def lock_for(self, folder_path):
+        key = os.path.normcase(os.path.abspath(folder_path))
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+_folder_locks = FolderLockTable()
+
+def _run_folder_job(job, folder_path, plan):
+    """Run one folder job on a worker thread, capturing its log records
+    (and planned operations, when a plan is being recorded)."""
+    _log_capture.start()
+    if plan is not None:
+        plan.start_capture()
+    error = None
+    result = None
+    operations = []
+    try:
+        with _folder_locks.lock_for(folder_path):
+            result = job(folder_path)
+    except Exception as e:
+        error = e
+    finally:
+        records = _log_capture.stop()
+        if plan is not None:
+            operations = plan.stop_capture()
+    return result, records, operations, error
+
+def run_folder_jobs(job, folder_paths, workers=1):
+    """Run job(folder_path) for every folder and yield the results in folder order.
+    With more than one worker the jobs run on a bounded thread pool, each in a
+    copy of the caller's context (so they see its backend, rules and journal);
+    each job's log output is buffered and replayed in folder order once it is
+    its turn."""
+    logger = logging.getLogger(__name__)
+    
+    if workers <= 1:
+        for folder_path in folder_paths:
+            with _folder_locks.lock_for(folder_path):
+                yield job(folder_path)
+        return
+    
+    # Keep a bounded window of submitted jobs so buffered logs stay small
+    window = workers * 2
+    pending = deque()
+    remaining = iter(folder_paths)
+    plan = _active_plan.get()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fixer-worker") as executor:
+        for folder_path in remaining:
+            pending.append(executor.submit(contextvars.copy_context().run, _run_folder_job, job, folder_path, plan))
+            if len(pending) >= window:
+                break
+        
+        while pending:
+            result, records, operations, error = pending.popleft().result()
+            for record in records:
+                logger.handle(record)
+            if operations:
+                plan.extend(operations)
+            if error is not None:
+                raise error
+            
+            next_path = next(remaining, None)
+            if next_path is not None:
+                pending.append(executor.submit(contextvars.copy_context().run, _run_folder_job, job, next_path,
+                                               plan))
+            
+            yield result
+
+class ListingPrefetcher:
+    """Reads directories ahead of a streaming walk on a small thread pool.
+
+    Each fetched listing queues the subfolders should_descend accepts, so the
+    pool keeps reading ahead of the walk. At most max_pending listings are
+    held (fetched or in flight) at once, which bounds memory no matter how
+    large the tree is; anything beyond that is read when the walk gets there.
+    """
+
+    def __init__(self, should_descend, max_inflight=8, max_pending=None):
+        self._should_descend = should_descend
+        self._max_pending = max_pending or max_inflight * 64
+        self._executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="fixer-scan")
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _fetch(self, dir_path):
+        records = scan_directory(dir_path)
+        self.prefetch(record.path for record in records if record.is_dir and self._should_descend(record.name))
+        return records
+
+    def prefetch(self, dir_paths):
+        with self._lock:
+            for dir_path in dir_paths:
+                if self._closed or len(self._pending) >= self._max_pending:
+                    return
+                if dir_path not in self._pending:
+                    self._pending[dir_path] = self._executor.submit(contextvars.copy_context().run, self._fetch,
+                                                                    dir_path)
+
+    def read(self, dir_path):
+        """Return the listing of dir_path, raising OSError like scan_directory."""
+        with self._lock:
+            future = self._pending.pop(dir_path, None)
+        if future is None:
+            return scan_directory(dir_path)
+        return future.result()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future in pending:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+
+# =============================================================================
+# OPERATION PLANS
+# =============================================================================
+
+PLAN_FORMAT_VERSION = 1
+
+# Typed operations a plan can hold
+PLAN_OPERATIONS = ('mkdir', 'move', 'rename', 'purge', 'rmdir', 'link')
+
+class OperationPlan:
+    """Ordered list of filesystem operations decided by a planning (dry) run.
+
+    Operations are plain dicts such as {'op': 'move', 'src': ..., 'dst': ...}
+    with paths stored relative to the plan root. Plans are written as JSON
+    Lines: a header line followed by one compact line per operation.
+    """
+
+    def __init__(self, root_dir, mode):
+        self.root_dir = os.path.abspath(root_dir)
+        self.mode = mode
+        self.operations = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root_dir)
+
+    def absolute(self, relative_path):
+        return os.path.join(self.root_dir, relative_path)
+
+    def record(self, op, **fields):
+        """Append an operation; path fields (src, dst, path) are made root-relative."""
+        operation = {'op': op}
+        for key, value in fields.items():
+            operation[key] = self._relative(value) if key in ('src', 'dst', 'path') else value
+        
+        captured = getattr(self._local, 'operations', None)
+        if captured is not None:
+            captured.append(operation)
+            return
+        with self._lock:
+            self.operations.append(operation)
+
+    def start_capture(self):
+        """Buffer this thread's operations (used by parallel folder jobs)."""
+        self._local.operations = []
+
+    def stop_capture(self):
+        operations = self._local.operations
+        self._local.operations = None
+        return operations
+
+    def extend(self, operations):
+        with self._lock:
+            self.operations.extend(operations)
+
+    def write(self, plan_path):
+        """Write the plan as JSON Lines."""
+        header = {
+            'plan': PLAN_FORMAT_VERSION,
+            'root': self.root_dir,
+            'mode': self.mode,
+            'created': get_timestamp(),
+            'operations': len(self.operations)
+        }
+        with open(plan_path, 'w', encoding='utf-8') as plan_file:
+            plan_file.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for operation in self.operations:
+                plan_file.write(json.dumps(operation, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+    @classmethod
+    def load(cls, plan_path):
+        """Read a plan written by write(). Raises ValueError for malformed plans."""
+        with open(plan_path, 'r', encoding='utf-8') as plan_file:
+            header_line = plan_file.readline()
+            try:
+                header = json.loads(header_line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid plan header in {plan_path}: {e}")
+            if header.get('plan') != PLAN_FORMAT_VERSION:
+                raise ValueError(f"Unsupported plan format in {plan_path}: {header.get('plan')}")
+            
+            plan = cls(header['root'], header['mode'])
+            for line_number, line in enumerate(plan_file, start=2):
+                if not line.strip():
+                    continue
+                try:
+                    operation = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Invalid plan entry on line {line_number}: {e}")
+                if operation.get('op') not in PLAN_OPERATIONS:
+                    raise ValueError(f"Unknown plan operation on line {line_number}: {operation.get('op')}")
+                plan.operations.append(operation)
+        return plan
+
+# Set by execute_mode while a plan is being recorded
+_active_plan = contextvars.ContextVar('active_plan', default=None)
+
+def record_operation(op, **fields):
+    """Record an operation in the active plan and journal, if any.
+    Callers record an operation before carrying it out."""
+    plan = _active_plan.get()
+    if plan is not None:
+        plan.record(op, **fields)
+    journal = _journal.get()
+    if journal is not None:
+        journal.record(op, **fields)
+
+@instrumented
+def apply_plan(plan, dry_run=False):
+    """Apply a previously written plan without rescanning or matching.
+    Only the source and destination of each operation are re-checked.
+    A dry run plays the plan out on an OverlayFilesystem and only logs
+    what would happen."""
+    logger = logging.getLogger(__name__)
+    
+    stats = new_stats()
+    
+    logger.info("📜 Applying plan: %s operations in %s", len(plan.operations), plan.root_dir)
+    linker = DuplicateLinker()
+    
+    previous_filesystem = None
+    if dry_run and not _filesystem.get().virtual:
+        previous_filesystem = set_filesystem(OverlayFilesystem())
+    try:
+        for operation in plan.operations:
+            _apply_operation(plan, operation, stats, linker, dry_run)
+    finally:
+        if previous_filesystem is not None:
+            set_filesystem(previous_filesystem)
+    
+    linker.add_to(stats)
+    return stats
+
+def _apply_operation(plan, operation, stats, linker, dry_run):
+    """Carry out (or, for a dry run, play out) one plan operation."""
+    logger = logging.getLogger(__name__)
+    op = operation['op']
+    
+    if op == 'mkdir':
+        path = plan.absolute(operation['path'])
+        if _filesystem.get().isdir(path):
+            logger.info("⚠️ Already exists: %s", path)
+            return
+        try:
+            _filesystem.get().makedirs(path)
+            logger.info("✅ %s: %s", "Would create" if dry_run else "Created", path)
+            stats['folders_created'] += 1
+        except Exception as e:
+            logger.error("❌ Failed to create: %s | Error: %s", path, e)
+            stats['failed'] += 1
+    
+    elif op in ('move', 'rename'):
+        source_path = plan.absolute(operation['src'])
+        dest_path = plan.absolute(operation['dst'])
+        match_type = operation.get('match', 'PLAN')
+        if not _filesystem.get().isfile(source_path):
+            logger.warning("[%s] ⚠️ Source no longer exists, skipping: %s", match_type, source_path)
+            stats['skipped'] += 1
+            return
+        if not _filesystem.get().isdir(os.path.dirname(dest_path)):
+            logger.error("[%s] ❌ Folder not found: %s", match_type, os.path.dirname(dest_path))
+            stats['failed'] += 1
+            return
+        result = move_file_safely(source_path, dest_path, match_type, operation.get('overwrite', False), dry_run)
+        if result in ["moved", "would_move", "would_overwrite"]:
+            stats['cleanup_moved' if match_type == "CLEANUP" else 'moved'] += 1
+        elif result == "skipped":
+            stats['skipped'] += 1
+        elif result == "failed":
+            stats['failed'] += 1
+    
+    elif op == 'purge':
+        path = plan.absolute(operation['path'])
+        if not _filesystem.get().isfile(path):
+            logger.debug("🔍 Suffixed duplicate already gone: %s", path)
+            return
+        try:
+            _filesystem.get().remove(path)
+            logger.info("🗑️ %s suffixed duplicate: %s", "Would remove" if dry_run else "Removed",
+                        os.path.basename(path))
+        except Exception as e:
+            logger.error("❌ Failed to remove suffixed file %s: %s", path, e)
+            stats['failed'] += 1
+    
+    elif op == 'rmdir':
+        path = plan.absolute(operation['path'])
+        try:
+            if scan_directory(path):
+                logger.warning("⚠️ Folder not empty, skipping deletion: %s", path)
+                return
+            _filesystem.get().rmdir(path)
+            logger.info("🧹 %s subfolder: %s", "Would delete" if dry_run else "Deleted", path)
+        except FileNotFoundError:
+            logger.debug("🔍 Folder already removed: %s", path)
+        except Exception as e:
+            logger.error("❌ Failed to delete: %s (%s)", path, e)
+            stats['failed'] += 1
+    
+    elif op == 'link':
+        keep_path = plan.absolute(operation['src'])
+        path = plan.absolute(operation['path'])
+        if not _filesystem.get().isfile(keep_path) or not _filesystem.get().isfile(path):
+            logger.warning("⚠️ Duplicate or its kept copy no longer exists, skipping link: %s", path)
+            stats['skipped'] += 1
+            return
+        linker.link(keep_path, path, dry_run)
+
+# =============================================================================
+# OPERATION JOURNAL
+# =============================================================================
+
+JOURNAL_FILENAME = ".template_fixer_journal.jsonl"
+JOURNAL_FORMAT_VERSION = 1
+# Files a journaled run overwrites or purges are kept here, one folder per journal
+JOURNAL_TRASH_DIRNAME = ".template_fixer_trash"
+
+class OperationJournal:
+    """Write-ahead journal of a real run, used by --resume and --rollback.
+
+    Every operation is appended (and flushed to the OS) before it is carried
+    out, so a killed process loses nothing; fsync runs in batches of
+    SYNC_EVERY entries or every SYNC_INTERVAL seconds, so after a power
+    failure only the last unsynced batch may be missing. Component folders
+    that finished a phase are marked, and a finished run ends with an end
+    marker. Paths are stored relative to the root, like plans.
+
+    Files the run overwrites or purges are moved into the journal's trash
+    folder (under JOURNAL_TRASH_DIRNAME in the root) instead of being lost,
+    and their operation records the trash name, so a rollback of an
+    interrupted run can restore them. A run that finishes empties the trash
+    unless keep_trash is set; starting a new journal empties the trash of
+    the one it replaces.
+    """
+
+    SYNC_EVERY = 256
+    SYNC_INTERVAL = 2.0
+
+    def __init__(self, path, root_dir, mode, resume_state=None, keep_trash=False):
+        self.path = path
+        self.root_dir = os.path.abspath(root_dir)
+        self.mode = mode
+        self.keep_trash = keep_trash
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.finished_folders = {'cleanup': set(), 'structure': set()}
+        self.trash_dir = os.path.join(self.root_dir, JOURNAL_TRASH_DIRNAME,
+                                      os.path.splitext(os.path.basename(path))[0].lstrip('.'))
+        self._trashed = 0
+        if resume_state is not None:
+            for phase, folders in resume_state['finished_folders'].items():
+                self.finished_folders[phase] = set(folders)
+            self.trash_dir = resume_state['header'].get('trash', self.trash_dir)
+            if os.path.isdir(self.trash_dir):
+                self._trashed = len(os.listdir(self.trash_dir))
+            self._handle = open(path, 'a', encoding='utf-8')
+            self._append({'resumed': datetime.now().isoformat()})
+        else:
+            shutil.rmtree(self.trash_dir, ignore_errors=True)
+            self._handle = open(path, 'w', encoding='utf-8')
+            self._append({'journal': JOURNAL_FORMAT_VERSION, 'root': self.root_dir, 'mode': mode,
+                          'trash': self.trash_dir, 'started': datetime.now().isoformat()})
+        self.sync()
+
+    @staticmethod
+    def read(path):
+        """Parse a journal into a dict with header, operations, finished_folders,
+        finished, trash_emptied and rolled_back. Raises ValueError for a file that is not a journal;
+        a torn last line (from a crash mid-write) is ignored."""
+        with open(path, 'r', encoding='utf-8') as handle:
+            lines = handle.read().splitlines()
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        if not entries or entries[0].get('journal') != JOURNAL_FORMAT_VERSION:
+            raise ValueError(f"not a Template Folder Fixer journal (version {JOURNAL_FORMAT_VERSION})")
+        state = {
+            'header': entries[0],
+            'operations': [],
+            'finished_folders': {'cleanup': set(), 'structure': set()},
+            'finished': False,
+            'trash_emptied': False,
+            'rolled_back': False,
+        }
+        for entry in entries[1:]:
+            if 'op' in entry:
+                state['operations'].append(entry)
+            elif 'done' in entry:
+                state['finished_folders'].setdefault(entry['done'], set()).add(entry['folder'])
+            elif 'end' in entry:
+                state['finished'] = True
+                state['trash_emptied'] = entry.get('trash_emptied', False)
+            elif 'rolled_back' in entry:
+                state['rolled_back'] = True
+        return state
+
+    def _append(self, entry):
+        self._handle.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self._handle.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.SYNC_EVERY or time.monotonic() - self._last_sync >= self.SYNC_INTERVAL:
+            self._sync_locked()
+
+    def _sync_locked(self):
+        os.fsync(self._handle.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            self._sync_locked()
+
+    def record(self, op, **fields):
+        """Append an operation that is about to be carried out."""
+        entry = {'op': op}
+        for key, value in fields.items():
+            if key in ('src', 'dst', 'path'):
+                value = os.path.relpath(os.path.abspath(value), self.root_dir)
+            entry[key] = value
+        with self._lock:
+            self._append(entry)
+
+    def folder_done(self, phase, folder_path):
+        """Mark a component folder as finished for a phase, so --resume skips it."""
+        with self._lock:
+            self._append({'done': phase, 'folder': os.path.basename(folder_path)})
+
+    def is_folder_done(self, phase, folder_path):
+        return os.path.basename(folder_path) in self.finished_folders.get(phase, ())
+
+    def reserve_trash(self, path):
+        """A fresh name in the trash for a file about to be overwritten or purged."""
+        with self._lock:
+            self._trashed += 1
+            return f"{self._trashed:06d}_{os.path.basename(path)}"
+
+    def finish(self):
+        """Mark the run as complete and close the journal. The trash is
+        emptied unless keep_trash is set."""
+        logger = logging.getLogger(__name__)
+        end = {'end': datetime.now().isoformat()}
+        if not self.keep_trash:
+            end['trash_emptied'] = True
+        with self._lock:
+            self._append(end)
+            self._sync_locked()
+            self._handle.close()
+        if not self._trashed:
+            return
+        if self.keep_trash:
+            logger.info("🗑️ %s overwritten or purged files kept for --rollback in %s (delete it once the run is checked)",
+                        self._trashed, self.trash_dir, extra=CONSOLE_EXTRA)
+            return
+        shutil.rmtree(self.trash_dir, ignore_errors=True)
+        with contextlib.suppress(OSError):
+            os.rmdir(os.path.dirname(self.trash_dir))
+        logger.info("🗑️ Emptied the trash: %s overwritten or purged files", self._trashed)
+
+    def close(self):
+        """Close without an end marker (the run did not finish)."""
+        with self._lock:
+            if not self._handle.closed:
+                self._sync_locked()
+                self._handle.close()
+
+# Set by execute_mode during a journaled real run
+_journal = contextvars.ContextVar('journal', default=None)
+
+def trash_fields(path):
+    """Journal fields for a file about to be overwritten or purged: its name
+    in the journal's trash, or nothing when no journal is kept."""
+    journal = _journal.get()
+    if journal is None:
+        return {}
+    return {'trash': journal.reserve_trash(path)}
+
+def set_aside(path, fields):
+    """Move a file about to be overwritten or purged into the trash named by
+    fields (see trash_fields). Without a trash name the file is removed."""
+    if 'trash' not in fields:
+        _filesystem.get().remove(path)
+        return
+    trash_dir = _journal.get().trash_dir
+    _filesystem.get().makedirs(trash_dir)
+    _filesystem.get().move(path, os.path.join(trash_dir, fields['trash']))
+
+@instrumented
+def rollback_journal(path, state, dry_run=False):
+    """Undo the operations of a journaled run, newest first.
+
+    Moves are moved back when the destination is still there and the source
+    name is free, created folders are removed when empty and deleted folders
+    are recreated. Purged duplicates and files replaced by an overwrite come
+    back from the journal's trash; once the trash is emptied (a run that
+    finished without keep_trash) they can not be restored, which is
+    reported. Linked duplicates still hold their content and stay links. A
+    dry run plays the rollback out on an OverlayFilesystem, only logs it and
+    leaves the journal open for a real rollback. Returns a stats dict."""
+    logger = logging.getLogger(__name__)
+    root_dir = state['header']['root']
+    trash_dir = None if state['trash_emptied'] else state['header'].get('trash')
+    stats = new_stats()
+    
+    logger.info("⏪ Rolling back %s operations in %s%s", len(state['operations']), root_dir,
+                " (DRY RUN)" if dry_run else "", extra=CONSOLE_EXTRA)
+    previous_filesystem = None
+    if dry_run and not _filesystem.get().virtual:
+        previous_filesystem = set_filesystem(OverlayFilesystem())
+    try:
+        for operation in reversed(state['operations']):
+            try:
+                _rollback_operation(root_dir, trash_dir, operation, stats, dry_run)
+            except Exception as e:
+                logger.error("❌ Rollback failed for %s: %s", operation, e)
+                stats['failed'] += 1
+    finally:
+        if previous_filesystem is not None:
+            set_filesystem(previous_filesystem)
+    
+    if dry_run:
+        return stats
+    with open(path, 'a', encoding='utf-8') as handle:
+        handle.write(json.dumps({'rolled_back': datetime.now().isoformat()}) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+    if trash_dir:
+        # Anything still in the trash could not be put back and stays for the user
+        with contextlib.suppress(OSError):
+            os.rmdir(trash_dir)
+            os.rmdir(os.path.dirname(trash_dir))
+    return stats
+
+def _restore_from_trash(trash_dir, operation, path, stats, dry_run):
+    """Put a file the run overwrote or purged back from the journal's trash."""
+    logger = logging.getLogger(__name__)
+    if not trash_dir or 'trash' not in operation:
+        logger.warning("⚠️ %s cannot be restored: %s",
+                       "Purged duplicate" if operation['op'] == 'purge' else "The file this move replaced", path)
+        return
+    trash_path = os.path.join(trash_dir, operation['trash'])
+    if not _filesystem.get().isfile(trash_path):
+        logger.warning("⚠️ Trash copy is missing, cannot restore: %s (%s)", path, trash_path)
+        stats['failed'] += 1
+        return
+    if _filesystem.get().exists(path):
+        logger.warning("⚠️ Name is taken again, leaving the trash copy in place: %s (%s)", path, trash_path)
+        stats['skipped'] += 1
+        return
+    _filesystem.get().makedirs(os.path.dirname(path))
+    _filesystem.get().move(trash_path, path)
+    logger.info("⏪ %s: %s", "Would restore from trash" if dry_run else "Restored from trash", path)
+    stats['moved'] += 1
+
+def _rollback_operation(root_dir, trash_dir, operation, stats, dry_run):
+    """Undo (or, for a dry run, play out undoing) one journaled operation."""
+    logger = logging.getLogger(__name__)
+    op = operation['op']
+    
+    if op in ('move', 'rename'):
+        source_path = os.path.join(root_dir, operation['src'])
+        dest_path = os.path.join(root_dir, operation['dst'])
+        if not _filesystem.get().isfile(dest_path) or _filesystem.get().exists(source_path):
+            logger.debug("🔍 Nothing to undo for move: %s → %s", source_path, dest_path)
+            stats['skipped'] += 1
+        else:
+            _filesystem.get().makedirs(os.path.dirname(source_path))
+            _filesystem.get().move(dest_path, source_path)
+            logger.info("⏪ %s: %s → %s", "Would move back" if dry_run else "Moved back", dest_path, source_path)
+            stats['moved'] += 1
+        if operation.get('overwrite'):
+            _restore_from_trash(trash_dir, operation, dest_path, stats, dry_run)
+    elif op == 'mkdir':
+        folder_path = os.path.join(root_dir, operation['path'])
+        if _filesystem.get().isdir(folder_path) and not scan_directory(folder_path):
+            _filesystem.get().rmdir(folder_path)
+            logger.info("⏪ %s created folder: %s", "Would remove" if dry_run else "Removed", folder_path)
+    elif op == 'rmdir':
+        folder_path = os.path.join(root_dir, operation['path'])
+        if not _filesystem.get().exists(folder_path):
+            _filesystem.get().makedirs(folder_path)
+            logger.info("⏪ %s folder: %s", "Would recreate" if dry_run else "Recreated", folder_path)
+            stats['folders_created'] += 1
+    elif op == 'purge':
+        _restore_from_trash(trash_dir, operation, os.path.join(root_dir, operation['path']), stats, dry_run)
+    elif op == 'link':
+        logger.debug("🔍 Nothing to undo for a linked duplicate (same content): %s",
+                     os.path.join(root_dir, operation['path']))
+
+# =============================================================================
+# WATCH MODE
+# =============================================================================
+
+class InotifyWatcher:
+    """Watches the root directory with Linux inotify, called through ctypes.
+
+    read_events() returns (name, is_dir, removed) tuples for files finished
+    writing or moved in and for folders created, moved or deleted. A
+    (None, False, False) event means the kernel queue overflowed and the
+    root should be listed again.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, root_dir):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = (self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO
+                | self.IN_CREATE | self.IN_DELETE)
+        if libc.inotify_add_watch(self._fd, os.fsencode(root_dir), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, f"inotify_add_watch failed for {root_dir}")
+
+    def read_events(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, length = self.EVENT_HEADER.unpack_from(buffer, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                events.append((None, False, False))
+            elif mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    events.append((name, True, False))
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    events.append((name, True, True))
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                events.append((name, False, False))
+        return events
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """Fallback watcher that lists the root every poll_interval seconds and
+    reports new or changed files and added or removed folders."""
+
+    def __init__(self, root_dir, poll_interval=0.5):
+        self.root_dir = root_dir
+        self.poll_interval = poll_interval
+        self._snapshot = self._take_snapshot()
+        self._next_poll = time.monotonic() + poll_interval
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for record in scan_directory(self.root_dir):
+            if record.is_dir:
+                snapshot[record.name] = (True, 0, 0)
+            elif record.is_file:
+                try:
+                    file_stat = record.stat()
+                except OSError:
+                    continue
+                snapshot[record.name] = (False, file_stat.st_size, file_stat.st_mtime_ns)
+        return snapshot
+
+    def read_events(self, timeout):
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(delay, 0))
+        self._next_poll = time.monotonic() + self.poll_interval
+        
+        previous, self._snapshot = self._snapshot, self._take_snapshot()
+        events = []
+        for name, entry in self._snapshot.items():
+            if previous.get(name) != entry:
+                events.append((name, entry[0], False))
+        for name, entry in previous.items():
+            if entry[0] and name not in self._snapshot:
+                events.append((name, True, True))
+        return events
+
+    def close(self):
+        pass
+
+def open_root_watcher(root_dir, poll_interval=0.5):
+    """Return an inotify watcher for root_dir, or a polling one where inotify is unavailable."""
+    logger = logging.getLogger(__name__)
+    try:
+        watcher = InotifyWatcher(root_dir)
+        logger.info("👀 Watching %s with inotify", root_dir, extra=CONSOLE_EXTRA)
+    except (OSError, AttributeError) as e:
+        watcher = PollingWatcher(root_dir, poll_interval)
+        logger.info("👀 Watching %s by polling every %ss (%s)", root_dir, poll_interval, e, extra=CONSOLE_EXTRA)
+    return watcher
+
+def watch_root(root_dir, mode=1, dry_run=False, debounce=0.3, poll_interval=0.5, stop_event=None,
+               auto_fuzzy=None, dedup_links=False):
+    """Keep filing files dropped into root_dir until interrupted.
+
+    The folder list and FolderMatcher stay in memory and are only updated for
+    folder events. Files are handled once no event has arrived for them for
+    `debounce` seconds: matched, moved into their component folder and then
+    sorted into the standard subfolder for their extension. Files already in
+    the root when the watch starts are handled first. Collisions follow the
+    rules of `mode`; the Deep Cleanup phase of modes 3 and 4 is not run.
+    Unmatched files are handled as in file_root_file, including auto_fuzzy,
+    and duplicates are linked with dedup_links as in execute_mode.
+    Returns the same stats dict as execute_mode."""
+    logger = logging.getLogger(__name__)
+    
+    stats = new_stats()
+    
+    previous_filesystem = None
+    if dry_run and not _filesystem.get().virtual:
+        previous_filesystem = set_filesystem(OverlayFilesystem())
+    
+    folders = set(scan_folders(root_dir))
+    matcher = FolderMatcher(sorted(folders))
+    prepared_folders = set()
+    pending = {}
+    
+    def queue_root_files():
+        for record in scan_directory(root_dir):
+            if record.is_file:
+                pending[record.name] = 0.0
+    
+    watcher = open_root_watcher(root_dir, poll_interval)
+    linker = DuplicateLinker() if dedup_links else None
+    linker_token = _linker.set(linker)
+    try:
+        queue_root_files()
+        while stop_event is None or not stop_event.is_set():
+            events = watcher.read_events(debounce if pending else 1.0)
+            now = time.monotonic()
+            folders_changed = False
+            for name, is_dir, removed in events:
+                if name is None:
+                    logger.warning("⚠️ Watch queue overflowed, re-reading the root")
+                    folders = set(scan_folders(root_dir))
+                    folders_changed = True
+                    queue_root_files()
+                elif is_dir:
+                    if is_standard_subfolder(name) or name in FIXER_DIRNAMES:
+                        continue
+                    if removed:
+                        folders.discard(name)
+                        prepared_folders.discard(os.path.join(root_dir, name))
+                    else:
+                        folders.add(name)
+                    folders_changed = True
+                else:
+                    pending[name] = now
+            if folders_changed:
+                matcher = FolderMatcher(sorted(folders))
+                logger.debug("📁 Folder list updated: %s folders", len(folders))
+            
+            # Only handle files that have been quiet for the debounce window
+            ready = [name for name, seen in pending.items() if now - seen >= debounce]
+            if not ready:
+                continue
+            _name_index.get().clear()
+            for name in ready:
+                del pending[name]
+                file_path = os.path.join(root_dir, name)
+                if _filesystem.get().isfile(file_path):
+                    file_and_sort_root_file(root_dir, file_path, matcher, stats, prepared_folders,
+                                            mode, dry_run, auto_fuzzy)
+            logger.info("🗂️ Handled %s dropped files (moved %s, unmatched %s so far)",
+                        len(ready), stats['moved'], stats['unmatched'], extra=CONSOLE_EXTRA)
+    except KeyboardInterrupt:
+        logger.info("🛑 Watch stopped", extra=CONSOLE_EXTRA)
+    finally:
+        watcher.close()
+        _linker.reset(linker_token)
+        if linker is not None:
+            linker.add_to(stats)
+        if previous_filesystem is not None:
+            set_filesystem(previous_filesystem)
+    
+    return stats
+
+# =============================================================================
+# BATCH MODE
+# =============================================================================
+
+def read_roots_file(path):
+    """Read root directories from a text file: one per line, blank lines and # comments ignored."""
+    with open(path, 'r', encoding='utf-8') as handle:
+        lines = (line.strip() for line in handle)
+        return [line for line in lines if line and not line.startswith('#')]
+
+def process_root(root_dir, options, log_file):
+    """Run one root headless in a batch worker process, logging to log_file.
+    Returns a result dict with the stats, duration, metrics and any error."""
+    result = {'root': root_dir, 'stats': None, 'duration': 0.0, 'metrics': None, 'error': None}
+    setup_logging(mode=options['mode'], dry_run=options['dry_run'], debug=options['debug'],
+                  log_file=log_file, console=False)
+    logger = logging.getLogger(__name__)
+    metrics = RunMetrics() if options['metrics'] else None
+    start_time = time.time()
+    try:
+        logger.info("📂 Working directory: %s", root_dir)
+        if not os.path.isdir(root_dir):
+            raise FileNotFoundError(f"root folder not found: {root_dir}")
+        hash_cache = None
+        if not options['no_hash_cache']:
+            hash_cache = options['hash_cache'] or HASH_CACHE_FILENAME
+        manifest = None
+        if options['incremental']:
+            manifest = options['manifest'] or MANIFEST_FILENAME
+        # Each root keeps its own journal so it can be resumed or rolled back on its own
+        journal = JOURNAL_FILENAME if options['journal'] else None
+        config = {key: options[key] for key in ('mode', 'dry_run', 'workers', 'scan_threads', 'keep_trash',
+                                                'fd_relative', 'auto_fuzzy', 'dedup_links', 'rules')}
+        config.update(hash_cache=hash_cache, manifest=manifest, journal=journal, metrics=metrics)
+        # Pool processes are reused; the fixer keeps its rules and metrics in its own context
+        with TemplateFolderFixer(root_dir, config) as fixer:
+            fixer.check_journal()
+            result['stats'] = fixer.run()
+    except Exception as e:
+        logger.error("❌ Root failed: %s (%s)", root_dir, e)
+        result['error'] = str(e)
+    finally:
+        result['duration'] = time.time() - start_time
+        shutdown_logging()
+    if metrics is not None:
+        result['metrics'] = metrics.to_dict()
+    return result
+
+def run_batch(roots, options, processes, log_dir=None, metrics_out=None):
+    """Process many roots on a process pool without any prompts.
+
+    Each worker logs its root to a part file next to the main log; once the
+    root is done its part is appended to the main log as its own section.
+    Stats (and metrics, with metrics_out) are merged into one summary.
+    Returns (total_stats, failed_roots)."""
+    logger = logging.getLogger(__name__)
+    log_file = log_file_path(log_dir)
+    total_stats = new_stats()
+    failed_roots = []
+    results = []
+    metrics = RunMetrics() if metrics_out else None
+    
+    logger.info("📦 Batch: %s roots on %s processes", len(roots), processes, extra=CONSOLE_EXTRA)
+    # Workers report nothing while they run, so live progress counts finished roots
+    progress = _progress.get()
+    if progress is not None:
+        progress.begin_phase('batch')
+        progress.set_total("roots", len(roots))
+    part_files = [f"{log_file}.{index}.part" for index in range(len(roots))]
+    # Spawned (not forked) workers: the parent already runs the log writer thread
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as executor:
+        # map() yields in root order, so log sections keep the order roots were given in
+        for part_file, result in zip(part_files, executor.map(process_root, roots, [options] * len(roots),
+                                                               part_files)):
+            flush_logging()
+            with open(log_file, 'a', encoding='utf-8') as log_handle:
+                log_handle.write(f"{'=' * 80}\n📂 Root: {result['root']}\n{'=' * 80}\n")
+                try:
+                    with open(part_file, 'r', encoding='utf-8') as part_handle:
+                        shutil.copyfileobj(part_handle, log_handle)
+                    os.remove(part_file)
+                except OSError as e:
+                    log_handle.write(f"(log section unavailable: {e})\n")
+            
+            if result['error'] is not None:
+                failed_roots.append(result['root'])
+                logger.error("❌ %s: %s", result['root'], result['error'])
+            else:
+                for key, value in result['stats'].items():
+                    total_stats[key] += value
+                logger.info("✅ %s: moved %s, skipped %s, unmatched %s (%.1fs)", result['root'],
+                            result['stats']['moved'], result['stats']['skipped'],
+                            result['stats']['unmatched'], result['duration'], extra=CONSOLE_EXTRA)
+            if progress is not None:
+                progress.advance()
+                if result['stats'] is not None:
+                    progress.add_files(result['stats']['moved'])
+            if metrics is not None and result['metrics'] is not None:
+                metrics.merge(result['metrics'], prefix=result['root'])
+            results.append({key: result[key] for key in ('root', 'stats', 'duration', 'error')})
+    
+    if metrics is not None:
+        try:
+            metrics.write(metrics_out, version=__version__, mode=options['mode'], dry_run=options['dry_run'],
+                          roots=results, stats=total_stats)
+            logger.info("📈 Metrics written: %s", metrics_out, extra=CONSOLE_EXTRA)
+        except OSError as e:
+            logger.error("❌ Failed to write metrics %s: %s", metrics_out, e)
+    
+    return total_stats, failed_roots
+
+# =============================================================================
+# SHARDED EXECUTION
+# =============================================================================
+
+# Root file claims of concurrent shards live here, inside the shared root
+SHARD_LOCK_DIRNAME = ".template_fixer_locks"
+# Folders the fixer keeps in the root for itself; never component folders
+FIXER_DIRNAMES = frozenset({SHARD_LOCK_DIRNAME, JOURNAL_TRASH_DIRNAME})
+
+class ShardSpec:
+    """One shard of a root split across independent processes (--shard i/N).
+
+    Component folders are assigned by a stable hash of their normalized
+    name, so every process agrees on the split without talking to the
+    others. A root file belongs to the shard of the folder it matches (an
+    unmatched file to the shard of its own name), so each folder is
+    cleaned, filled and sorted by one process in the usual phase order.
+    """
+
+    def __init__(self, index, count):
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"shard must be i/N with 1 <= i <= N, got {index}/{count}")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, text):
+        """Parse 'i/N' (1-based)."""
+        index, separator, count = text.partition('/')
+        if not separator:
+            raise ValueError(f"expected i/N, got '{text}'")
+        return cls(int(index), int(count))
+
+    def owns(self, name):
+        """True if the folder (or unmatched file) called name belongs to this shard."""
+        digest = hashlib.blake2b(normalize_name(name).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') % self.count == self.index - 1
+
+    def filename(self, filename):
+        """A default file name made unique to this shard (logs, journals, caches)."""
+        stem, extension = os.path.splitext(filename)
+        return f"{stem}.shard{self.index}of{self.count}{extension}"
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+def process_alive(pid):
+    """True if a process with this pid runs on this host, False if none does,
+    None where that cannot be checked without side effects (not POSIX)."""
+    if os.name != 'posix':
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class ShardLocks:
+    """Lock files claiming root files and component folders while one
+    process works on them.
+
+    A claim creates SHARD_LOCK_DIRNAME/<hash of the name>.lock with
+    O_CREAT | O_EXCL, which is atomic on local disks and NFS alike, so two
+    processes that both think they own a file or folder (e.g. a shard
+    started twice) never move its files at the same time. The lock is
+    removed when the claim ends. A lock left behind by a killed process is
+    stale once its owner (same host) is gone or it is older than STALE_AFTER
+    seconds; the next claim takes it over. Locks still there when a shard
+    finishes are reported by close().
+
+    The lock folder also holds the run's root listing for Mode 3 cleanup
+    (see root_snapshot).
+    """
+
+    # Claims last one folder or file; an owner that cannot be checked is given this long
+    STALE_AFTER = 6 * 3600
+
+    ROOT_SNAPSHOT_FILENAME = "root_files.json"
+
+    def __init__(self, root_dir, shard):
+        self.lock_dir = os.path.join(root_dir, SHARD_LOCK_DIRNAME)
+        self.shard = shard
+        self._snapshot_read = False
+
+    def _lock_path(self, filename):
+        digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+        return os.path.join(self.lock_dir, f"{digest}.lock")
+
+    def _create(self, lock_path, filename):
+        descriptor = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as handle:
+            json.dump({'file': filename, 'shard': str(self.shard), 'host': socket.gethostname(),
+                       'pid': os.getpid(), 'since': datetime.now().isoformat()}, handle)
+
+    @staticmethod
+    def _read(lock_path):
+        """The lock's owner record and text ({} and '' for a lock torn by a crash mid-write)."""
+        with open(lock_path, 'r', encoding='utf-8') as handle:
+            text = handle.read()
+        try:
+            return json.loads(text), text
+        except ValueError:
+            return {}, text
+
+    def stale_reason(self, lock_path):
+        """Why the lock at lock_path is stale, or None while its owner may still hold it."""
+        owner, _ = self._read(lock_path)
+        pid = owner.get('pid')
+        if owner.get('host') == socket.gethostname() and isinstance(pid, int) and process_alive(pid) is False:
+            return f"process {pid} is gone"
+        age = time.time() - os.stat(lock_path).st_mtime
+        if age > self.STALE_AFTER:
+            return f"held for {format_duration(age)}"
+        return None
+
+    def _discard(self, path, text):
+        """Remove path if it still holds text; False if another process
+        replaced it meanwhile. The file is renamed aside first, so of several
+        processes discarding it only one succeeds, and a replacement renamed
+        by mistake is put back."""
+        aside_path = f"{path}.{socket.gethostname()}.{os.getpid()}.stale"
+        try:
+            os.rename(path, aside_path)
+        except FileNotFoundError:
+            return True
+        try:
+            if self._read(aside_path)[1] != text:
+                with contextlib.suppress(FileExistsError):
+                    os.link(aside_path, path)
+                return False
+        finally:
+            os.remove(aside_path)
+        return True
+
+    def _take_over(self, lock_path):
+        """Remove lock_path if it is stale; True if it was (or it was released meanwhile)."""
+        logger = logging.getLogger(__name__)
+        try:
+            reason = self.stale_reason(lock_path)
+            if reason is None:
+                return False
+            owner, text = self._read(lock_path)
+        except FileNotFoundError:
+            # Released meanwhile: the name is free again
+            return True
+        if not self._discard(lock_path, text):
+            # Another process took the lock over and claimed it in between
+            return False
+        logger.warning("🔓 Took over a stale lock on %s (shard %s, %s): %s", owner.get('file', lock_path),
+                       owner.get('shard', '?'), owner.get('host', '?'), reason)
+        return True
+
+    @contextlib.contextmanager
+    def claim(self, filename):
+        """Yield True while this process holds the claim on filename (a root
+        file, or a component folder name ending in os.sep), False if another
+        process holds it."""
+        lock_path = self._lock_path(filename)
+        for attempt in range(3):
+            try:
+                self._create(lock_path, filename)
+                break
+            except FileNotFoundError:
+                # First claim, or another shard removed the empty folder meanwhile
+                os.makedirs(self.lock_dir, exist_ok=True)
+            except FileExistsError:
+                if not self._take_over(lock_path):
+                    yield False
+                    return
+        else:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def _done_marker(self, index):
+        return os.path.join(self.lock_dir, ShardSpec(index, self.shard.count).filename("root_files.done"))
+
+    def root_snapshot(self, list_root_files):
+        """The names of the root's files as they were before any shard of this
+        run filed one (list_root_files() lists them now).
+
+        Mode 3 cleanup keeps a nested file in place when the root holds a file
+        of the same name, while other shards may already be moving root files
+        away. The first shard to get here writes the listing, linked into
+        place so it appears whole or not at all, before it files any root
+        file; the others read it, so every shard decides as a single process
+        would. A snapshot for another shard count, one this shard already
+        finished with, or one older than STALE_AFTER is from an earlier run
+        and is replaced. close() marks the shard done; the last one removes
+        the snapshot."""
+        logger = logging.getLogger(__name__)
+        snapshot_path = os.path.join(self.lock_dir, self.ROOT_SNAPSHOT_FILENAME)
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self._snapshot_read = True
+        for attempt in range(3):
+            try:
+                snapshot, text = self._read(snapshot_path)
+            except FileNotFoundError:
+                snapshot = None
+            if snapshot is not None:
+                if (snapshot.get('shards') == self.shard.count and 'names' in snapshot
+                        and not os.path.exists(self._done_marker(self.shard.index))
+                        and time.time() - os.stat(snapshot_path).st_mtime <= self.STALE_AFTER):
+                    logger.debug("🔍 Using the root listing of this sharded run: %s files", len(snapshot['names']))
+                    return set(snapshot['names'])
+                if self._discard(snapshot_path, text):
+                    logger.debug("🔍 Replacing the root listing of an earlier sharded run")
+                    for index in range(1, self.shard.count + 1):
+                        with contextlib.suppress(OSError):
+                            os.remove(self._done_marker(index))
+                continue
+            names = sorted(list_root_files())
+            temp_path = f"{snapshot_path}.{socket.gethostname()}.{os.getpid()}.new"
+            with open(temp_path, 'w', encoding='utf-8') as handle:
+                json.dump({'shards': self.shard.count, 'shard': str(self.shard),
+                           'since': datetime.now().isoformat(), 'names': names}, handle)
+            try:
+                os.link(temp_path, snapshot_path)
+            except FileExistsError:
+                continue
+            finally:
+                os.remove(temp_path)
+            return set(names)
+        # Shards kept replacing each other's snapshot; fall back to the root as it is now
+        return set(list_root_files())
+
+    def _finish_snapshot(self):
+        """Mark this shard done with the root listing; the last shard removes it."""
+        with open(self._done_marker(self.shard.index), 'w', encoding='utf-8'):
+            pass
+        if not all(os.path.exists(self._done_marker(index)) for index in range(1, self.shard.count + 1)):
+            return
+        snapshot_path = os.path.join(self.lock_dir, self.ROOT_SNAPSHOT_FILENAME)
+        with contextlib.suppress(OSError):
+            self._discard(snapshot_path, self._read(snapshot_path)[1])
+        for index in range(1, self.shard.count + 1):
+            with contextlib.suppress(OSError):
+                os.remove(self._done_marker(index))
+
+    def report(self):
+        """Log the locks still in the lock folder (held by other shards, or stale)."""
+        logger = logging.getLogger(__name__)
+        try:
+            names = sorted(name for name in os.listdir(self.lock_dir) if name.endswith('.lock'))
+        except OSError:
+            return 0
+        for name in names:
+            lock_path = os.path.join(self.lock_dir, name)
+            try:
+                owner, _ = self._read(lock_path)
+                reason = self.stale_reason(lock_path)
+            except OSError:
+                continue
+            details = (owner.get('file', name), owner.get('shard', '?'), owner.get('host', '?'),
+                       owner.get('pid', '?'), owner.get('since', '?'))
+            if reason is None:
+                logger.info("🔒 Still claimed: %s (shard %s, %s pid %s, since %s)", *details)
+            else:
+                logger.warning("⚠️ Stale lock left: %s (shard %s, %s pid %s, since %s): %s; "
+                               "the next sharded run takes it over", *details, reason, extra=CONSOLE_EXTRA)
+        return len(names)
+
+    def close(self):
+        """Report leftover locks and remove the lock folder once no shard has a claim in it."""
+        if self._snapshot_read:
+            try:
+                self._finish_snapshot()
+            except OSError as e:
+                logging.getLogger(__name__).warning("⚠️ Could not mark the root listing done in %s: %s",
+                                                    self.lock_dir, e)
+        if self.report():
+            return
+        try:
+            os.rmdir(self.lock_dir)
+        except OSError:
+            pass
+
+def merge_metrics_files(paths, out_path):
+    """Combine the --metrics-out reports of the shards of one root into one
+    report (see RunMetrics.merge). Returns the summed stats."""
+    metrics = RunMetrics()
+    total_stats = new_stats()
+    shards = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as handle:
+            document = json.load(handle)
+        metrics.merge(document)
+        for key, value in (document.get('stats') or {}).items():
+            total_stats[key] = total_stats.get(key, 0) + value
+        shards.append({key: document.get(key) for key in ('shard', 'root', 'mode', 'duration', 'stats')})
+        shards[-1]['file'] = path
+    metrics.write(out_path, version=__version__, merged=len(paths),
+                  duration=max((shard['duration'] or 0.0 for shard in shards), default=0.0),
+                  shards=shards, stats=total_stats)
+    return total_stats
+
+# =============================================================================
+# CORE FUNCTIONS
+# =============================================================================
+
+@instrumented
+def scan_folders(root_dir):
+    """Scan and return list of first-level subfolders (folder-first isolation).
+
+    The list is sorted by name, so when several folders match a file the
+    first one by name wins, whatever order the filesystem lists them in."""
+    logger = logging.getLogger(__name__)
+    folder_list = []
+    
+    try:
+        for record in scan_directory(root_dir):
+            if record.is_dir and not is_standard_subfolder(record.name) and record.name not in FIXER_DIRNAMES:
+                folder_list.append(record.name)
+        folder_list.sort()
+        
+        logger.info("📁 Scanned folders: %s found", len(folder_list))
+        return folder_list
+        
+    except Exception as e:
+        logger.error("❌ Error scanning folders: %s", e)
+        return []
+
+def find_matching_folder(filename, folder_list):
+    """Find matching folder using priority-based matching system."""
+    name_only = os.path.splitext(filename)[0]
+    name_only_normalized = normalize_name(name_only)
+    
+    # Step 1: [FULL] Match - Exact folder name match
+    for folder in folder_list:
+        if name_only_normalized == normalize_name(folder):
+            return folder, "FULL"
+    
+    # Steps 2-3: [BASE+VER], then [BASE] - same parsed basefit (and version)
+    folder_keys = [{key for key, _ in parse_name(folder).match_keys()} for folder in folder_list]
+    for key, match_type in parse_name(name_only).match_keys():
+        for folder, keys in zip(folder_list, folder_keys):
+            if key in keys:
+                return folder, match_type
+    
+    # Step 4: [NONE] - No match found
+    return None, "NONE"
+
+class FolderMatcher:
+    """Prebuilt folder index giving the same results as find_matching_folder.
+
+    Every folder name is parsed once into its template, basefit and version;
+    [FULL] matches come from a hash lookup on normalized folder names and
+    [BASE+VER]/[BASE] matches from hash lookups on the parsed keys, first
+    folder in folder_list order (by name, from scan_folders) winning. Fuzzy
+    suggestions for files that match none come from a FuzzyFolderIndex built
+    on first use.
+    """
+
+    def __init__(self, folder_list):
+        self.folders = list(folder_list)
+        self.exact = {}
+        self.by_key = {}
+        self._fuzzy = None
+
+        for index, folder in enumerate(self.folders):
+            # First folder wins, matching the linear scans
+            self.exact.setdefault(normalize_name(folder), index)
+            for key, _ in parse_name(folder).match_keys():
+                self.by_key.setdefault(key, index)
+
+    @instrumented
+    def match(self, filename):
+        """Find matching folder using priority-based matching system."""
+        name_only = os.path.splitext(filename)[0]
+
+        # Step 1: [FULL] Match - Exact folder name match
+        index = self.exact.get(normalize_name(name_only))
+        if index is not None:
+            return self.folders[index], "FULL"
+
+        # Steps 2-3: [BASE+VER], then [BASE] - same parsed basefit (and version)
+        for key, match_type in parse_name(name_only).match_keys():
+            index = self.by_key.get(key)
+            if index is not None:
+                return self.folders[index], match_type
+
+        # Step 4: [NONE] - No match found
+        return None, "NONE"
+
+    @instrumented
+    def suggest(self, filename, k=FUZZY_SUGGESTIONS):
+        """Closest folders for a file with no match, as (folder, score) pairs, best first."""
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyFolderIndex(self.folders)
+        return self._fuzzy.suggest(os.path.splitext(filename)[0], k)
+
+def _move_operation(source_path, dest_path):
+    """Plan operation type for a move: 'rename' when a collision suffix changed the name."""
+    return 'move' if os.path.basename(source_path) == os.path.basename(dest_path) else 'rename'
+
+@instrumented
+def move_file_safely(source_path, dest_path, match_type, allow_overwrite=False, dry_run=False):
+    """Move file safely with comprehensive error handling."""
+    logger = logging.getLogger(__name__)
+    
+    try:
+        # Check if source and destination are the same
+        if os.path.abspath(source_path) == os.path.abspath(dest_path):
+            logger.info("[%s] ⚠️ Source equals destination, skipping: %s", match_type, source_path)
+            return "skipped"
+        
+        # Check if destination file already exists
+        overwriting = _filesystem.get().exists(dest_path)
+        if overwriting and not allow_overwrite:
+            # Check if files are identical
+            if files_are_identical(source_path, dest_path):
+                logger.warning("[%s] ⚠️ Skipped duplicate during cleanup: %s",
+                               match_type, os.path.basename(source_path))
+                # The duplicate stays where it is; with --dedup-links it stops taking space
+                linker = _linker.get()
+                if linker is not None:
+                    linker.link(dest_path, source_path, dry_run)
+            else:
+                logger.warning("[%s] ⚠️ File already exists, skipping: %s", match_type, source_path)
+            return "skipped"
+        
+        # A journaled run keeps the file being replaced in the trash for --rollback
+        trash = trash_fields(dest_path) if overwriting else {}
+        record_operation(_move_operation(source_path, dest_path), src=source_path, dst=dest_path,
+                         match=match_type, overwrite=overwriting, **trash)
+        
+        if overwriting and not dry_run:
+            logger.info("[%s] 🔄 Overwriting: %s → %s", match_type, source_path, dest_path)
+        
+        # Perform move operation (dry runs only move on a virtual backend)
+        if _applies_changes(dry_run):
+            metrics, progress = _metrics.get(), _progress.get()
+            size = 0
+            if metrics is not None or progress is not None:
+                size = _filesystem.get().stat(source_path).st_size
+            if metrics is not None:
+                metrics.add_bytes_moved(size)
+            if trash:
+                set_aside(dest_path, trash)
+            _filesystem.get().move(source_path, dest_path)
+            name_index = _name_index.get()
+            name_index.discard(source_path)
+            name_index.add(dest_path)
+            if progress is not None:
+                progress.add_files(1, size)
+        
+        if dry_run:
+            if overwriting:
+                logger.info("[%s] 🔄 Would overwrite: %s → %s", match_type, source_path, dest_path)
+                return "would_overwrite"
+            logger.info("[%s] 📁 Would move: %s → %s", match_type, source_path, dest_path)
+            return "would_move"
+        else:
+            logger.info("[%s] 📁 Moved: %s → %s", match_type, source_path, dest_path)
+            return "moved"
+        
+    except Exception as e:
+        logger.error("[%s] ❌ Move failed: %s → %s | Error: %s", match_type, source_path, dest_path, e)
+        return "failed"
+
+def root_file_names(root_dir):
+    """Names of the files directly in root_dir."""
+    return {record.name for record in scan_directory(root_dir) if record.is_file}
+
+@instrumented
+def cleanup_subfolders_recursively(folder_path, mode=3, dry_run=False, scan_threads=1, root_files=None):
+    """Recursively cleanup ALL subfolders and move files to component folder.
+    Mode 3: Skip conflicts, rename with suffixes if different
+    Mode 4: Overwrite conflicts, remove suffixed duplicates
+    Runs as one streaming pass: each file is moved as it is found, and each
+    subfolder is deleted as soon as everything below it has been handled.
+    root_files (names of the root's files) is read from the root when not given."""
+    logger = logging.getLogger(__name__)
+    moved_count = 0
+    skipped_count = 0
+    file_count = 0
+    folder_count = 0
+    deleted_count = 0
+    allow_overwrite = mode == 4
+    deleted_text = "Would delete" if dry_run else "Deleted"
+    
+    logger.debug("🎯 Cleanup Mode: %s (%s)", mode, 'Overwrite' if allow_overwrite else 'Safe')
+    
+    # Check for root files that should take precedence
+    if root_files is None:
+        try:
+            root_files = root_file_names(os.path.dirname(folder_path))
+            logger.debug("🔍 Found %s files in root directory", len(root_files))
+        except Exception as e:
+            logger.debug("🔍 Could not scan root directory: %s", e)
+            root_files = set()
+    
+    # In cleanup mode, process ALL subfolders (standard ones included)
+    for entry in walk_tree(folder_path, lambda name: True, scan_threads):
+        if entry.is_dir:
+            # Delete the folder now that its subtree is done - only if no files remain
+            folder_count += 1
+            folder_to_delete = entry.path
+            try:
+                if not _applies_changes(dry_run):
+                    # Dry run on a real backend: nothing changes, so report every folder
+                    record_operation('rmdir', path=folder_to_delete)
+                    logger.info("🧹 Would delete subfolder: %s", folder_to_delete)
+                    deleted_count += 1
+                else:
+                    # Check if folder is truly empty (no files or subdirectories)
+                    try:
+                        folder_contents = scan_directory(folder_to_delete)
+                        # Only empty directories left - try to delete anyway
+                        if not any(record.is_file for record in folder_contents):
+                            record_operation('rmdir', path=folder_to_delete)
+                            _filesystem.get().rmdir(folder_to_delete)
+                            _name_index.get().discard(folder_to_delete)
+                            logger.info("🧹 %s subfolder: %s", deleted_text, folder_to_delete)
+                            deleted_count += 1
+                        else:
+                            logger.warning("⚠️ Folder not empty, skipping deletion: %s", folder_to_delete)
+                    except OSError:
+                        # Folder might have been deleted already or contains subdirs
+                        logger.debug("🔍 Folder already processed or contains subdirs: %s", folder_to_delete)
+            except PermissionError as e:
+                logger.error("❌ Failed to delete: %s (Access Denied)", folder_to_delete)
+            except Exception as e:
+                logger.error("❌ Failed to delete: %s (%s)", folder_to_delete, e)
+            continue
+        
+        # Skip hidden/system files
+        source_path = entry.path
+        if is_hidden_or_system_file(source_path):
+            continue
+        file_count += 1
+        logger.debug("📄 Found file: %s", entry.relative_path)
+        filename = entry.name
+        dest_path = os.path.join(folder_path, filename)
+        
+        # Check if file exists in root - if so, skip moving in Mode 3
+        if mode == 3 and filename in root_files:
+            logger.info("🔄 Mode 3: Keeping both files - root takes precedence: %s", filename)
+            linker = _linker.get()
+            if linker is not None:
+                linker.link(os.path.join(os.path.dirname(folder_path), filename), source_path, dry_run)
+            skipped_count += 1
+            continue
+        
+        # Handle filename collisions using the enhanced collision resolution function
+        if _name_index.get().exists(dest_path) and not files_are_identical(source_path, dest_path):
+            resolved_path = resolve_filename_collision(dest_path, allow_overwrite, mode, dry_run, source_path)
+            if resolved_path is None:
+                logger.error("❌ Too many collisions, skipping: %s", filename)
+                skipped_count += 1
+                continue
+            dest_path = resolved_path
+        
+        # Move file with enhanced logging
+        result = move_file_safely(source_path, dest_path, "CLEANUP", allow_overwrite, dry_run)
+        if result in ["moved", "would_move", "would_overwrite"]:
+            moved_count += 1
+        elif result == "skipped":
+            skipped_count += 1
+    
+    if not file_count and not folder_count:
+        logger.info("🧹 No files or subfolders found in: %s", os.path.basename(folder_path))
+        return moved_count, skipped_count
+    
+    logger.info("🧹 Handled %s files from %s subfolders", file_count, folder_count)
+    logger.debug("📊 Cleanup summary: %s moved, %s skipped, %s folders deleted",
+                 moved_count, skipped_count, deleted_count)
+    return moved_count, skipped_count
+
+@instrumented
 def create_standard_folders(folder_path, dry_run=False):
     """Create standard subfolders if they don't exist."""
     logger = logging.getLogger(__name__)
     created_count = 0
     
-    for folder_name in STANDARD_FOLDERS:
+    for folder_name in _rules.get().folders:
         subfolder_path = os.path.join(folder_path, folder_name)
         
-        if not os.path.exists(subfolder_path):
+        if not _filesystem.get().exists(subfolder_path):
             try:
+                record_operation('mkdir', path=subfolder_path)
+                if _applies_changes(dry_run):
+                    _filesystem.get().makedirs(subfolder_path)
+                    _name_index.get().add(subfolder_path)
                 if dry_run:
-                    logger.info(f"[{get_timestamp()}] ✅ Would create: {subfolder_path}")
+                    logger.info("✅ Would create: %s", subfolder_path)
                 else:
-                    os.makedirs(subfolder_path, exist_ok=True)
-                    logger.info(f"[{get_timestamp()}] ✅ Created: {subfolder_path}")
+                    logger.info("✅ Created: %s", subfolder_path)
                 created_count += 1
             except Exception as e:
-                logger.error(f"[{get_timestamp()}] ❌ Failed to create: {subfolder_path} | Error: {e}")
+                logger.error("❌ Failed to create: %s | Error: %s", subfolder_path, e)
         else:
-            logger.info(f"[{get_timestamp()}] ⚠️ Already exists: {subfolder_path}")
+            logger.info("⚠️ Already exists: %s", subfolder_path)
     
     return created_count
 
+@instrumented
 def sort_files_in_folder(folder_path, mode=1, dry_run=False):
     """Sort files within folder by extension into standard subfolders."""
     logger = logging.getLogger(__name__)
     moved_count = 0
     skipped_count = 0
-    allow_overwrite = mode in [2, 4]
     
     try:
-        for filename in os.listdir(folder_path):
-            file_path = os.path.join(folder_path, filename)
+        for record in scan_directory(folder_path):
+            file_path = record.path
             
             # Skip directories and hidden/system files
-            if os.path.isdir(file_path) or is_hidden_or_system_file(file_path):
+            if record.is_dir or is_hidden_or_system_file(file_path):
                 continue
             
-            # Get file extension
-            _, ext = os.path.splitext(filename)
-            ext_lower = ext.lower()
-            
-            # Find target subfolder based on extension
-            target_subfolder = None
-            for subfolder, extensions in EXTENSION_MAPPING.items():
-                if ext_lower in extensions:
-                    target_subfolder = subfolder
-                    break
-            
-            # Move file if extension is supported
-            if target_subfolder:
-                dest_folder_path = os.path.join(folder_path, target_subfolder)
-                dest_file_path = os.path.join(dest_folder_path, filename)
-                
-                # Handle filename collisions for extension-based sorting
-                if os.path.exists(dest_file_path) and not files_are_identical(file_path, dest_file_path):
-                    resolved_path = resolve_filename_collision(dest_file_path, allow_overwrite, mode)
-                    if resolved_path is None:
-                        logger.error(f"[{get_timestamp()}] ❌ Too many collisions, skipping: {filename}")
-                        skipped_count += 1
-                        continue
-                    dest_file_path = resolved_path
-                
-                result = move_file_safely(file_path, dest_file_path, "EXT", allow_overwrite, dry_run)
-                if result in ["moved", "would_move", "would_overwrite"]:
-                    moved_count += 1
-                elif result == "skipped":
-                    skipped_count += 1
+            result = sort_file(folder_path, file_path, mode, dry_run)
+            if result in ["moved", "would_move", "would_overwrite"]:
+                moved_count += 1
+            elif result == "skipped":
+                skipped_count += 1
     
     except Exception as e:
-        logger.error(f"[{get_timestamp()}] ❌ Error sorting files in {folder_path}: {e}")
+        logger.error("❌ Error sorting files in %s: %s", folder_path, e)
     
     return moved_count, skipped_count
 
-def process_root_files(root_dir, folder_list, mode=1, dry_run=False):
-    """Process files in root directory using folder-first isolation."""
+def sort_file(folder_path, file_path, mode=1, dry_run=False):
+    """Move one file of a component folder into its standard subfolder by
+    the sorting rules. Returns the move_file_safely result, or None when no
+    rule matches the file."""
     logger = logging.getLogger(__name__)
     allow_overwrite = mode in [2, 4]
+    filename = os.path.basename(file_path)
+    
+    # Find target subfolder from the compiled rules
+    target_subfolder = _rules.get().classify(filename)
+    
+    # Move file if a rule matched
+    if not target_subfolder:
+        return None
+    
+    dest_folder_path = os.path.join(folder_path, target_subfolder)
+    dest_file_path = os.path.join(dest_folder_path, filename)
+    
+    # Handle filename collisions for extension-based sorting
+    if _name_index.get().exists(dest_file_path) and not files_are_identical(file_path, dest_file_path):
+        resolved_path = resolve_filename_collision(dest_file_path, allow_overwrite, mode, dry_run, file_path)
+        if resolved_path is None:
+            logger.error("❌ Too many collisions, skipping: %s", filename)
+            return "skipped"
+        dest_file_path = resolved_path
+    
+    return move_file_safely(file_path, dest_file_path, "EXT", allow_overwrite, dry_run)
+
+@instrumented
+def process_root_files(root_dir, folder_list, mode=1, dry_run=False, skip_file=None, auto_fuzzy=None,
+                       shard=None, locks=None, matcher=None):
+    """Process files in root directory using folder-first isolation.
+    skip_file(record), when given, can pass over files known to need no work;
+    auto_fuzzy, shard (ShardSpec) and locks (ShardLocks) are passed on to
+    file_root_file. matcher reuses a FolderMatcher built for folder_list."""
+    logger = logging.getLogger(__name__)
     
     stats = {
         'moved': 0,
@@ -713,175 +4302,1018 @@ def process_root_files(root_dir, folder_list, mode=1, dry_run=False):
         'failed': 0
     }
     
+    # Build the folder index once instead of rescanning folder_list per file
+    if matcher is None:
+        matcher = FolderMatcher(folder_list)
+    
     try:
-        for filename in os.listdir(root_dir):
-            file_path = os.path.join(root_dir, filename)
+        records = scan_directory(root_dir)
+        progress = ProgressSummary("Root entries checked", len(records))
+        for record in records:
+            progress.advance()
+            filename = record.name
+            file_path = record.path
             
             # Skip directories and hidden/system files
-            if os.path.isdir(file_path) or is_hidden_or_system_file(file_path):
+            if record.is_dir or is_hidden_or_system_file(file_path):
                 continue
             
-            # Check if file has supported extension
-            _, ext = os.path.splitext(filename)
-            if ext.lower() not in SUPPORTED_EXTENSIONS:
-                logger.debug(f"[{get_timestamp()}] ⏭️ Skipping unsupported file: {filename}")
+            # Check if any sorting rule covers the file
+            if _rules.get().classify(filename) is None:
+                logger.debug("⏭️ Skipping unsupported file: %s", filename)
                 continue
             
-            # Find matching folder
-            matched_folder, match_type = find_matching_folder(filename, folder_list)
+            if skip_file is not None and skip_file(record):
+                logger.debug("⏭️ Unchanged since last run: %s", filename)
+                continue
             
-            if matched_folder and match_type != "NONE":
-                # Verify folder exists
-                folder_path = os.path.join(root_dir, matched_folder)
-                if os.path.exists(folder_path):
-                    # Construct destination path
-                    dest_path = os.path.join(folder_path, filename)
-                    
-                    # Handle filename collisions for regular file moves
-                    if os.path.exists(dest_path) and not files_are_identical(file_path, dest_path):
-                        resolved_path = resolve_filename_collision(dest_path, allow_overwrite, mode)
-                        if resolved_path is None:
-                            logger.error(f"[{get_timestamp()}] ❌ Too many collisions, skipping: {filename}")
-                            stats['failed'] += 1
-                            continue
-                        dest_path = resolved_path
-                    
-                    # Move file
-                    result = move_file_safely(file_path, dest_path, match_type, allow_overwrite, dry_run)
-                    if result in ["moved", "would_move", "would_overwrite"]:
-                        stats['moved'] += 1
-                    elif result == "skipped":
-                        stats['skipped'] += 1
-                    elif result == "failed":
-                        stats['failed'] += 1
-                else:
-                    logger.error(f"[{get_timestamp()}] ❌ Folder not found: {matched_folder}")
-                    stats['unmatched'] += 1
-            else:
-                logger.warning(f"[{get_timestamp()}] [NONE] ⛔ No matching folder found for: {filename}")
-                stats['unmatched'] += 1
+            outcome, _ = file_root_file(root_dir, file_path, matcher, mode, dry_run, auto_fuzzy, shard, locks)
+            if outcome is not None:
+                stats[outcome] += 1
     
     except Exception as e:
-        logger.error(f"[{get_timestamp()}] ❌ Error processing root files: {e}")
+        logger.error("❌ Error processing root files: %s", e)
     
     return stats
 
-def execute_mode(mode, root_dir, folder_list, dry_run=False):
-    """Execute the specified mode logic."""
+def file_root_file(root_dir, file_path, matcher, mode=1, dry_run=False, auto_fuzzy=None, shard=None,
+                   locks=None):
+    """Move one root file into its matching component folder.
+    Files with no match get the closest folders logged as suggestions; with
+    auto_fuzzy, they are moved ([FUZZY]) when the best suggestion scores at
+    least that much and no other folder scores the same. With a shard, files
+    belonging to another shard are left alone, and with locks (ShardLocks)
+    the move only happens while this process holds the file's claim.
+    Returns (outcome, dest_path): outcome is the stats key to count
+    ('moved', 'skipped', 'unmatched' or 'failed'), or None for a file left
+    to another process; dest_path is where the file went, or None if it was
+    not moved."""
     logger = logging.getLogger(__name__)
+    filename = os.path.basename(file_path)
     
-    total_stats = {
-        'moved': 0,
-        'skipped': 0,
-        'unmatched': 0, 
-        'failed': 0,
-        'folders_created': 0,
-        'cleanup_moved': 0
-    }
+    # Find matching folder
+    matched_folder, match_type = matcher.match(filename)
+    
+    if not matched_folder or match_type == "NONE":
+        suggestions = matcher.suggest(filename)
+        if (auto_fuzzy is not None and suggestions and suggestions[0][1] >= auto_fuzzy
+                and (len(suggestions) == 1 or suggestions[1][1] < suggestions[0][1])):
+            matched_folder, match_type = suggestions[0][0], "FUZZY"
+            if shard is not None and not shard.owns(matched_folder):
+                return None, None
+            logger.info("[FUZZY] 🔍 Closest folder for %s: %s (score %.2f)",
+                        filename, matched_folder, suggestions[0][1])
+        else:
+            if shard is not None and not shard.owns(filename):
+                return None, None
+            logger.warning("[NONE] ⛔ No matching folder found for: %s", filename)
+            if suggestions:
+                logger.info("[NONE] 💡 Closest folders for %s: %s", filename,
+                            ", ".join(f"{folder} ({score:.2f})" for folder, score in suggestions))
+            return 'unmatched', None
+    elif shard is not None and not shard.owns(matched_folder):
+        return None, None
+    
+    if locks is None:
+        return _file_root_file_into(root_dir, file_path, matched_folder, match_type, mode, dry_run)
+    with locks.claim(filename) as claimed:
+        # Another process has the file, or moved it before this claim
+        if not claimed or not _filesystem.get().exists(file_path):
+            logger.debug("🔒 Claimed by another process: %s", filename)
+            return None, None
+        return _file_root_file_into(root_dir, file_path, matched_folder, match_type, mode, dry_run)
+
+def _file_root_file_into(root_dir, file_path, matched_folder, match_type, mode, dry_run):
+    """Move a root file into matched_folder; returns what file_root_file does."""
+    logger = logging.getLogger(__name__)
+    allow_overwrite = mode in [2, 4]
+    filename = os.path.basename(file_path)
+    
+    # Verify folder exists
+    folder_path = os.path.join(root_dir, matched_folder)
+    if not _filesystem.get().exists(folder_path):
+        logger.error("❌ Folder not found: %s", matched_folder)
+        return 'unmatched', None
+    
+    # Construct destination path
+    dest_path = os.path.join(folder_path, filename)
+    
+    # Serialize against any job still working in the destination folder
+    with _folder_locks.lock_for(folder_path):
+        # Handle filename collisions for regular file moves
+        if _name_index.get().exists(dest_path) and not files_are_identical(file_path, dest_path):
+            resolved_path = resolve_filename_collision(dest_path, allow_overwrite, mode, dry_run, file_path)
+            if resolved_path is None:
+                logger.error("❌ Too many collisions, skipping: %s", filename)
+                return 'failed', None
+            dest_path = resolved_path
+        
+        # Move file
+        result = move_file_safely(file_path, dest_path, match_type, allow_overwrite, dry_run)
+    if result in ["moved", "would_move", "would_overwrite"]:
+        return 'moved', dest_path
+    return result, None
+
+def file_and_sort_root_file(root_dir, file_path, matcher, stats, prepared_folders, mode=1, dry_run=False,
+                            auto_fuzzy=None):
+    """Take one root file all the way: move it into its component folder
+    (file_root_file), create that folder's standard folders unless it is in
+    prepared_folders, and sort the file by extension. Hidden and unsupported
+    files are ignored. Counts are added to stats (execute_mode's keys)."""
+    if is_hidden_or_system_file(file_path) or _rules.get().classify(os.path.basename(file_path)) is None:
+        return
+    outcome, dest_path = file_root_file(root_dir, file_path, matcher, mode, dry_run, auto_fuzzy)
+    stats[outcome] += 1
+    if dest_path is None:
+        return
+    folder_path = os.path.dirname(dest_path)
+    if folder_path not in prepared_folders:
+        stats['folders_created'] += create_standard_folders(folder_path, dry_run)
+        prepared_folders.add(folder_path)
+    result = sort_file(folder_path, dest_path, mode, dry_run)
+    if result in ["moved", "would_move", "would_overwrite"]:
+        stats['moved'] += 1
+    elif result == "skipped":
+        stats['skipped'] += 1
+
+def execute_mode(mode, root_dir, folder_list, dry_run=False, workers=1, scan_threads=1, plan=None,
+                 hash_cache=None, manifest=None, journal=None, resume_state=None, keep_trash=False,
+                 fd_relative=False, auto_fuzzy=None, shard=None, duplicates=None, matcher=None,
+                 dedup_links=False):
+    """Execute the specified mode logic.
+    Component folders are processed on `workers` threads during the Deep Cleanup
+    and Subfolder Structure phases; each cleanup reads its tree with up to
+    `scan_threads` directory reads in flight. When a plan is given, every
+    operation the run decides on is recorded into it. Dry runs are carried out
+    on an OverlayFilesystem, so nothing on disk changes but every phase sees
+    the pending effects of the ones before it. Duplicate checks reuse digests
+    stored in the hash_cache database, when a path is given. With a manifest
+    path the run is incremental: folders and root files unchanged since the
+    last real run are skipped, and real runs store the new state. Real runs
+    with a journal path write every operation ahead to that journal; with a
+    resume_state (from OperationJournal.read) the journal is continued and
+    component folders it marks as finished are skipped. Files the run
+    overwrites or purges wait in the journal's trash until it finishes, and
+    stay there for a later rollback when keep_trash is set. With
+    fd_relative, real runs work on directory descriptors (DirFdFilesystem)
+    where supported. auto_fuzzy is the score at which unmatched root files
+    are moved to their closest folder (see file_root_file). With a shard
+    (ShardSpec) only that shard's component folders and root files are
+    processed. A caller that keeps state between runs can pass its own
+    DuplicateDetector (left open) and a FolderMatcher already built for
+    folder_list. With dedup_links, files left in place as duplicates of
+    another are replaced by links to it (see DuplicateLinker)."""
+    logger = logging.getLogger(__name__)
+    
+    # Dry runs play out on an in-memory overlay so later steps see earlier ones
+    previous_filesystem = None
+    if dry_run and not _filesystem.get().virtual:
+        previous_filesystem = set_filesystem(OverlayFilesystem())
+    elif fd_relative and not _filesystem.get().virtual:
+        if dir_fd_supported():
+            previous_filesystem = set_filesystem(DirFdFilesystem(root_dir))
+        else:
+            logger.warning("⚠️ --fd-relative is not supported on this platform, using paths")
+    
+    cache = None
+    if hash_cache and duplicates is None:
+        try:
+            cache = HashCache(hash_cache)
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Hash cache unavailable, hashing without it: %s (%s)", hash_cache, e)
+    
+    run_manifest = None
+    if manifest:
+        try:
+            run_manifest = RunManifest(manifest, root_dir, mode)
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Manifest unavailable, running a full pass: %s (%s)", manifest, e)
+    
+    run_journal = None
+    if journal and not dry_run:
+        try:
+            run_journal = OperationJournal(journal, root_dir, mode, resume_state, keep_trash)
+        except OSError as e:
+            logger.warning("⚠️ Journal unavailable, running without one: %s (%s)", journal, e)
+    
+    run_duplicates = duplicates if duplicates is not None else DuplicateDetector(cache)
+    linker = DuplicateLinker() if dedup_links else None
+    tokens = [(_duplicates, _duplicates.set(run_duplicates)), (_active_plan, _active_plan.set(plan)),
+              (_journal, _journal.set(run_journal)), (_linker, _linker.set(linker))]
+    try:
+        with metered_filesystem():
+            total_stats = _execute_mode_phases(mode, root_dir, folder_list, dry_run, workers, scan_threads,
+                                               run_manifest, run_journal, auto_fuzzy, shard, matcher)
+        if linker is not None:
+            linker.add_to(total_stats)
+        if run_manifest is not None and not dry_run:
+            try:
+                run_manifest.save(root_dir, folder_list)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("⚠️ Could not update manifest %s: %s", manifest, e)
+        if run_journal is not None:
+            run_journal.finish()
+        return total_stats
+    finally:
+        for variable, token in reversed(tokens):
+            variable.reset(token)
+        if run_journal is not None:
+            run_journal.close()
+        if duplicates is None:
+            run_duplicates.close()
+        if run_manifest is not None:
+            run_manifest.close()
+        if previous_filesystem is not None:
+            if isinstance(_filesystem.get(), DirFdFilesystem):
+                _filesystem.get().close()
+            set_filesystem(previous_filesystem)
+
+def _execute_mode_phases(mode, root_dir, folder_list, dry_run, workers, scan_threads, manifest=None,
+                         journal=None, auto_fuzzy=None, shard=None, matcher=None):
+    """Run the cleanup, root file sorter and subfolder structure phases."""
+    logger = logging.getLogger(__name__)
+    
+    total_stats = new_stats()
+    
+    # Start every run with a fresh view of the destination directories
+    _name_index.get().clear()
+    
+    if manifest is not None:
+        manifest.begin(folder_list)
+    
+    # Other processes may work on the same root (--shard); claims keep them off each other's files
+    locks = ShardLocks(root_dir, shard) if shard is not None and _applies_changes(dry_run) else None
+    
+    def claimed(folder_path):
+        if locks is None:
+            return contextlib.nullcontext(True)
+        return locks.claim(os.path.basename(folder_path) + os.sep)
+    
+    def unchanged(folder_path, phase):
+        if journal is not None and journal.is_folder_done(phase, folder_path):
+            logger.debug("⏭️ Finished before the interruption: %s", os.path.basename(folder_path))
+            return True
+        if manifest is None or not manifest.folder_unchanged(folder_path):
+            return False
+        logger.debug("⏭️ Unchanged since last run: %s", os.path.basename(folder_path))
+        return True
+    
+    def cleanup_job(folder_path):
+        if unchanged(folder_path, 'cleanup'):
+            return 0, 0
+        with claimed(folder_path) as owned:
+            if not owned:
+                logger.warning("🔒 Claimed by another process, skipping cleanup: %s", os.path.basename(folder_path))
+                return 0, 0
+            logger.info("🧹 Processing cleanup for: %s", os.path.basename(folder_path))
+            with timed_folder('cleanup', folder_path):
+                result = cleanup_subfolders_recursively(folder_path, mode, dry_run, scan_threads, root_files)
+        if journal is not None:
+            journal.folder_done('cleanup', folder_path)
+        return result
+    
+    def structure_job(folder_path):
+        if unchanged(folder_path, 'structure'):
+            return 0, 0, 0
+        with claimed(folder_path) as owned:
+            if not owned:
+                logger.warning("🔒 Claimed by another process, skipping: %s", os.path.basename(folder_path))
+                return 0, 0, 0
+            logger.info("📁 Processing subfolder: %s", os.path.basename(folder_path))
+            
+            with timed_folder('structure', folder_path):
+                # Create standard folders
+                created_count = create_standard_folders(folder_path, dry_run)
+                
+                # Sort files by extension
+                moved_count, skipped_count = sort_files_in_folder(folder_path, mode, dry_run)
+        if journal is not None:
+            journal.folder_done('structure', folder_path)
+        return created_count, moved_count, skipped_count
+    
+    def existing_folder_paths():
+        folder_names = folder_list if shard is None else [name for name in folder_list if shard.owns(name)]
+        folder_paths = (os.path.join(root_dir, folder_name) for folder_name in folder_names)
+        return [folder_path for folder_path in folder_paths if _filesystem.get().exists(folder_path)]
     
     # Mode 3 & 4: Deep Cleanup phase
+    # Other shards file root files meanwhile, so Mode 3 compares against the root from before any of them did
+    root_files = None
+    if mode == 3 and locks is not None:
+        root_files = locks.root_snapshot(lambda: root_file_names(root_dir))
     if mode in [3, 4]:
-        logger.info(f"[{get_timestamp()}] 🧹 Deep Cleanup Phase: Recursively flattening subfolders...")
+        logger.info("🧹 Deep Cleanup Phase: Recursively flattening subfolders...", extra=CONSOLE_EXTRA)
         
-        for folder_name in folder_list:
-            folder_path = os.path.join(root_dir, folder_name)
-            if os.path.exists(folder_path):
-                logger.info(f"[{get_timestamp()}] 🧹 Processing cleanup for: {folder_name}")
-                cleanup_moved, cleanup_skipped = cleanup_subfolders_recursively(
-                    folder_path, mode, dry_run
-                )
+        # Results come back in folder order, so totals are only touched here
+        with timed_phase('cleanup'):
+            folder_paths = existing_folder_paths()
+            progress = ProgressSummary("Folders cleaned", len(folder_paths))
+            for cleanup_moved, cleanup_skipped in run_folder_jobs(cleanup_job, folder_paths, workers):
                 total_stats['cleanup_moved'] += cleanup_moved
                 total_stats['skipped'] += cleanup_skipped
+                progress.advance()
     
     # All modes: Root File Sorter
-    logger.info(f"[{get_timestamp()}] 🔄 Root File Sorter Phase...")
-    rfs_stats = process_root_files(root_dir, folder_list, mode, dry_run)
+    logger.info("🔄 Root File Sorter Phase...", extra=CONSOLE_EXTRA)
+    # Files an earlier run left unmatched may have a fuzzy match now, so auto_fuzzy checks them all
+    skip_file = manifest.root_file_unchanged if manifest is not None and auto_fuzzy is None else None
+    with timed_phase('root_files'):
+        rfs_stats = process_root_files(root_dir, folder_list, mode, dry_run, skip_file, auto_fuzzy, shard, locks,
+                                       matcher)
     
     # Update total stats
     for key in ['moved', 'skipped', 'unmatched', 'failed']:
         total_stats[key] += rfs_stats[key]
     
     # All modes: Subfolder Structure Creation and File Sorting
-    logger.info(f"[{get_timestamp()}] 🏗️ Subfolder Structure Phase...")
+    logger.info("🏗️ Subfolder Structure Phase...", extra=CONSOLE_EXTRA)
     
-    for folder_name in folder_list:
-        folder_path = os.path.join(root_dir, folder_name)
-        
-        if os.path.exists(folder_path):
-            logger.info(f"[{get_timestamp()}] 📁 Processing subfolder: {folder_name}")
-            
-            # Create standard folders
-            created_count = create_standard_folders(folder_path, dry_run)
+    with timed_phase('structure'):
+        folder_paths = existing_folder_paths()
+        progress = ProgressSummary("Folders sorted", len(folder_paths))
+        for created_count, moved_count, skipped_count in run_folder_jobs(structure_job, folder_paths, workers):
             total_stats['folders_created'] += created_count
-            
-            # Sort files by extension
-            moved_count, skipped_count = sort_files_in_folder(folder_path, mode, dry_run)
             total_stats['moved'] += moved_count
             total_stats['skipped'] += skipped_count
+            progress.advance()
+    
+    if manifest is not None:
+        logger.info("⏭️ Incremental: %s unchanged folders and %s known root files skipped",
+                    len(manifest.skipped_folders), manifest.skipped_files, extra=CONSOLE_EXTRA)
+    if locks is not None:
+        locks.close()
     
     return total_stats
 
+# =============================================================================
+# FIXER ENGINE
+# =============================================================================
+
+# Engine settings a TemplateFolderFixer config may override
+FIXER_DEFAULTS = {
+    'mode': 1,
+    'dry_run': False,
+    'workers': 1,
+    'scan_threads': 1,
+    'hash_cache': None,     # hash cache database path; None keeps hashes in memory only
+    'manifest': None,       # manifest database path; turns on incremental runs
+    'journal': None,        # operation journal path for real runs; None runs without one
+    'keep_trash': False,    # keep overwritten/purged files for --rollback after a run finishes
+    'fd_relative': False,
+    'auto_fuzzy': None,
+    'dedup_links': False,
+    'shard': None,          # ShardSpec or 'i/N'
+    'rules': None,          # SortingRules, a rule file path, or None to look for a rule file
+    'poll_interval': 0.5,
+    'metrics': None,        # RunMetrics collecting timings and counts of every call
+    'progress': None,       # ProgressReporter fed by every call; started and stopped by the caller
+}
+
+# Files a fixer keeps next to its root unless the config gives another path
+FIXER_ROOT_FILES = ('hash_cache', 'manifest', 'journal')
+
+# Logger of the fixer whose call runs in the current context
+_fixer_logger = contextvars.ContextVar('fixer_logger', default=None)
+
+# Fixer whose context is the current one, so one method can call another
+_current_fixer = contextvars.ContextVar('current_fixer', default=None)
+
+class _ForwardFilter(logging.Filter):
+    """Passes the module's records on to the logger of the fixer that logged them.
+
+    While any fixer forwards, the module logger's level is lowered to the
+    lowest level one of them asks for; records logged outside a fixer are
+    still held to the level the module logger had before.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._levels = []
+        self._base_level = logging.NOTSET
+        self._base_effective_level = logging.NOTSET
+
+    def filter(self, record):
+        target = _fixer_logger.get()
+        if target is None:
+            return not self._levels or record.levelno >= self._base_effective_level
+        if target.isEnabledFor(record.levelno):
+            target.handle(record)
+        return False
+
+    @contextlib.contextmanager
+    def forwarding(self, target):
+        """Send the records logged in the current context to target while the block runs."""
+        module_logger = logging.getLogger(__name__)
+        level = target.getEffectiveLevel()
+        with self._lock:
+            if not self._levels:
+                self._base_level = module_logger.level
+                self._base_effective_level = module_logger.getEffectiveLevel()
+            self._levels.append(level)
+            module_logger.setLevel(min(self._levels + [self._base_effective_level]))
+        token = _fixer_logger.set(target)
+        try:
+            yield
+        finally:
+            _fixer_logger.reset(token)
+            with self._lock:
+                self._levels.remove(level)
+                if self._levels:
+                    module_logger.setLevel(min(self._levels + [self._base_effective_level]))
+                else:
+                    module_logger.setLevel(self._base_level)
+
+# Added after _log_capture, so worker records are forwarded once they are replayed in order
+_forward_filter = _ForwardFilter()
+logging.getLogger(__name__).addFilter(_forward_filter)
+
+def _fixer_call(rules=True):
+    """Decorator running a TemplateFolderFixer method in the fixer's own
+    context, with its rules (unless rules is False), detector, metrics and
+    progress reporter installed and the module's records going to its logger.
+    A method called from another one runs in the context already entered."""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if _current_fixer.get() is self:
+                return method(self, *args, **kwargs)
+            return self._context.run(self._call, method, rules, args, kwargs)
+        return wrapper
+    return decorate
+
+class TemplateFolderFixer:
+    """The fixer as an object, for embedding in long-running programs.
+
+    Holds one root, a config (keys of FIXER_DEFAULTS) and a logger, and
+    keeps the scanned folder list, the FolderMatcher, the sorting rules and
+    the duplicate detector (with its hash cache) between calls, so small
+    updates through process_files() do not rebuild them. Call scan() when
+    component folders were added or removed behind the fixer's back; run()
+    and plan() rescan on their own. Relative hash_cache, manifest and
+    journal paths are taken relative to the root. Nothing calls
+    logging.basicConfig, os.getcwd() or input(): the engine's records go to
+    the given logger (default: this module's logger) and every method
+    returns its stats. Every call runs in the fixer's own contextvars
+    Context, which holds its filesystem backend, rules, detector, name
+    index, journal and plan, so several fixers can run at the same time in
+    one process; one fixer takes one call at a time. Use as a context
+    manager, or call close() when done.
+    """
+
+    def __init__(self, root_dir, config=None, logger=None):
+        config = dict(config or {})
+        unknown = set(config) - set(FIXER_DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown config keys: {', '.join(sorted(unknown))}")
+        self.root_dir = os.path.abspath(root_dir)
+        self.config = {**FIXER_DEFAULTS, **config}
+        if self.config['mode'] not in EXECUTION_MODES:
+            raise ValueError(f"mode must be one of {sorted(EXECUTION_MODES)}, got {self.config['mode']}")
+        if isinstance(self.config['shard'], str):
+            self.config['shard'] = ShardSpec.parse(self.config['shard'])
+        for key in FIXER_ROOT_FILES:
+            if self.config[key]:
+                self.config[key] = os.path.join(self.root_dir, self.config[key])
+        self.logger = logger or logging.getLogger(__name__)
+        self.rules = None
+        self.folders = None
+        self.matcher = None
+        self.loaded_plan = None
+        self.journal_state = None
+        self._duplicates = None
+        self._context = contextvars.Context()
+        self._context.run(self._install)
+
+    @classmethod
+    def from_plan(cls, plan, config=None, logger=None):
+        """Fixer for apply()ing a plan (an OperationPlan or a plan file): the
+        root and mode come from the plan. Raises OSError or ValueError for a
+        plan file that cannot be read."""
+        if not isinstance(plan, OperationPlan):
+            plan = OperationPlan.load(plan)
+        fixer = cls(plan.root_dir, {**(config or {}), 'mode': plan.mode}, logger)
+        fixer.loaded_plan = plan
+        return fixer
+
+    @classmethod
+    def from_journal(cls, journal, config=None, logger=None):
+        """Fixer for the run recorded in a journal, to resume() or rollback():
+        the root and mode come from the journal. Raises OSError or ValueError
+        for a journal that cannot be read."""
+        state = OperationJournal.read(journal)
+        header = state['header']
+        fixer = cls(header['root'], {**(config or {}), 'mode': header['mode'], 'journal': journal}, logger)
+        fixer.journal_state = state
+        return fixer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _install(self):
+        """Give the fixer's context its own name index (the other state starts from the defaults)."""
+        _current_fixer.set(self)
+        _name_index.set(DirectoryNameIndex())
+
+    def _call(self, method, rules, args, kwargs):
+        """Run one call inside the fixer's context (see _fixer_call)."""
+        if rules:
+            set_rules(self.load_rules())
+        _duplicates.set(self._detector())
+        set_metrics(self.config['metrics'])
+        set_progress(self.config['progress'])
+        if self.logger is logging.getLogger(__name__):
+            return method(self, *args, **kwargs)
+        with _forward_filter.forwarding(self.logger):
+            return method(self, *args, **kwargs)
+
+    def _detector(self):
+        if self._duplicates is None:
+            cache = None
+            if self.config['hash_cache']:
+                try:
+                    cache = HashCache(self.config['hash_cache'])
+                except sqlite3.Error as e:
+                    self.logger.warning("⚠️ Hash cache unavailable, hashing without it: %s (%s)",
+                                        self.config['hash_cache'], e)
+            self._duplicates = DuplicateDetector(cache)
+        return self._duplicates
+
+    def load_rules(self):
+        """Load the sorting rules once: the configured SortingRules or rule
+        file, else a rule file found for the root, else the built-in rules.
+        Raises OSError or ValueError for a rule file that cannot be used."""
+        if self.rules is None:
+            rules = self.config['rules']
+            if not isinstance(rules, SortingRules):
+                rules_path = rules or find_rules_file(self.root_dir)
+                if rules_path:
+                    rules = SortingRules.load(rules_path)
+                    self.logger.info("📐 Sorting rules: %s (%s rules)", rules_path, len(rules.rules),
+                                     extra=CONSOLE_EXTRA)
+                else:
+                    rules = DEFAULT_RULES
+            self.rules = rules
+        return self.rules
+
+    @_fixer_call()
+    def scan(self):
+        """Rescan the component folders and rebuild the match index; returns the folder list."""
+        with metered_filesystem():
+            self.folders = scan_folders(self.root_dir)
+            self.matcher = FolderMatcher(self.folders)
+        return self.folders
+
+    def check_journal(self):
+        """Raise RuntimeError if the configured journal holds an interrupted
+        run, which has to be resumed or rolled back before a new real run."""
+        journal = self.config['journal']
+        if not journal or self.config['dry_run']:
+            return
+        try:
+            previous = OperationJournal.read(journal)
+        except (OSError, ValueError):
+            return
+        if not previous['finished'] and not previous['rolled_back']:
+            raise RuntimeError(f"The previous run in {previous['header']['root']} was interrupted "
+                               f"(journal: {journal})")
+
+    def pending_state(self, resume=True):
+        """Return the state of the run in the configured journal (read again
+        after resume() or rollback()), raising RuntimeError if there is nothing to resume (resume=True) or
+        roll back: the run was rolled back already or, to resume, finished."""
+        journal = self.config['journal']
+        if self.journal_state is None:
+            self.journal_state = OperationJournal.read(journal)
+        state = self.journal_state
+        if state['rolled_back'] or (resume and state['finished']):
+            state_text = "rolled back" if state['rolled_back'] else "finished"
+            raise RuntimeError(f"The run in {journal} was already {state_text}; "
+                               f"nothing to {'resume' if resume else 'roll back'}")
+        return state
+
+    @_fixer_call()
+    def run(self, resume_state=None, plan=None):
+        """Run every phase of the configured mode over the root and return the
+        stats. resume_state (from OperationJournal.read) continues an
+        interrupted run; plan records the operations (see plan())."""
+        self.logger.info("📋 Step 1: Scanning subfolders...", extra=CONSOLE_EXTRA)
+        with timed_phase('scan_folders'):
+            self.scan()
+        
+        config = self.config
+        self.logger.info("🎯 Step 2: Executing Mode %s...", config['mode'], extra=CONSOLE_EXTRA)
+        return execute_mode(config['mode'], self.root_dir, self.folders, config['dry_run'],
+                            config['workers'], config['scan_threads'], plan, None, config['manifest'],
+                            config['journal'], resume_state, config['keep_trash'], config['fd_relative'],
+                            config['auto_fuzzy'], config['shard'], self._detector(), self.matcher,
+                            config['dedup_links'])
+
+    def resume(self):
+        """Finish the interrupted run in the configured journal, skipping the
+        component folders it finished; returns the stats."""
+        try:
+            return self.run(resume_state=self.pending_state())
+        finally:
+            self.journal_state = None
+
+    def plan(self):
+        """Work out every operation of a run without touching any files; returns an OperationPlan."""
+        plan = OperationPlan(self.root_dir, self.config['mode'])
+        dry_run = self.config['dry_run']
+        self.config['dry_run'] = True
+        try:
+            self.run(plan=plan)
+        finally:
+            self.config['dry_run'] = dry_run
+        return plan
+
+    @_fixer_call(rules=False)
+    def apply(self, plan=None):
+        """Apply an OperationPlan (or a plan file; default: the one given to
+        from_plan) without rescanning or matching; returns the stats.
+        With dry_run set, the plan is only played out in memory and logged."""
+        if plan is None:
+            plan = self.loaded_plan
+        elif not isinstance(plan, OperationPlan):
+            plan = OperationPlan.load(plan)
+        with timed_phase('apply_plan'), metered_filesystem():
+            return apply_plan(plan, self.config['dry_run'])
+
+    @_fixer_call(rules=False)
+    def rollback(self, journal_state=None):
+        """Undo the run recorded in the configured journal; returns the stats."""
+        if journal_state is None:
+            journal_state = self.pending_state(resume=False)
+        try:
+            with timed_phase('rollback'), metered_filesystem():
+                return rollback_journal(self.config['journal'], journal_state, self.config['dry_run'])
+        finally:
+            self.journal_state = None
+
+    @_fixer_call()
+    def watch(self, stop_event=None):
+        """File root files as they are dropped until stop_event is set (see watch_root)."""
+        config = self.config
+        with timed_phase('watch'), metered_filesystem():
+            return watch_root(self.root_dir, config['mode'], config['dry_run'], poll_interval=config['poll_interval'],
+                              stop_event=stop_event, auto_fuzzy=config['auto_fuzzy'],
+                              dedup_links=config['dedup_links'])
+
+    @_fixer_call()
+    def process_files(self, paths):
+        """Move the given root files into their component folders and sort
+        them by extension, using the kept folder index (scanned on first use).
+        Paths outside the root or no longer there are skipped. Returns the
+        stats of execute_mode."""
+        if self.matcher is None:
+            self.scan()
+        config = self.config
+        stats = new_stats()
+        with timed_phase('process_files'), metered_filesystem():
+            previous_filesystem = None
+            if config['dry_run'] and not _filesystem.get().virtual:
+                previous_filesystem = set_filesystem(OverlayFilesystem())
+            linker = DuplicateLinker() if config['dedup_links'] else None
+            linker_token = _linker.set(linker)
+            try:
+                _name_index.get().clear()
+                prepared_folders = set()
+                for path in paths:
+                    file_path = os.path.join(self.root_dir, path)
+                    if os.path.dirname(os.path.abspath(file_path)) != self.root_dir:
+                        self.logger.warning("⚠️ Not a root file, skipping: %s", path)
+                        continue
+                    if not _filesystem.get().isfile(file_path):
+                        self.logger.debug("⏭️ No longer there: %s", path)
+                        continue
+                    file_and_sort_root_file(self.root_dir, file_path, self.matcher, stats, prepared_folders,
+                                            config['mode'], config['dry_run'], config['auto_fuzzy'])
+            finally:
+                _linker.reset(linker_token)
+                if linker is not None:
+                    linker.add_to(stats)
+                if previous_filesystem is not None:
+                    set_filesystem(previous_filesystem)
+        return stats
+
+    def close(self):
+        """Close the hash cache (it is opened again if the fixer is used again)."""
+        if self._duplicates is not None:
+            self._duplicates.close()
+            self._duplicates = None
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def format_duration(duration):
+    """Format a duration in seconds as MM:SS."""
+    return f"{int(duration//60):02d}:{int(duration%60):02d}"
+
+def format_size(size):
+    """Format a byte count with binary units, e.g. 1.5 GiB."""
+    if size < 1024:
+        return f"{size} bytes"
+    for unit in ('KiB', 'MiB', 'GiB', 'TiB'):
+        size /= 1024
+        if size < 1024 or unit == 'TiB':
+            return f"{size:.1f} {unit}"
+
+def log_summary(mode, total_stats, duration_str):
+    """Log the end-of-run summary block."""
+    logger = logging.getLogger(__name__)
+    logger.info("📊 Summary:", extra=CONSOLE_EXTRA)
+    logger.info("  • Mode executed: %s - %s", mode, EXECUTION_MODES[mode], extra=CONSOLE_EXTRA)
+    logger.info("  • Files moved: %s", total_stats['moved'], extra=CONSOLE_EXTRA)
+    logger.info("  • Files skipped: %s", total_stats['skipped'], extra=CONSOLE_EXTRA)
+    logger.info("  • Files unmatched: %s", total_stats['unmatched'], extra=CONSOLE_EXTRA)
+    logger.info("  • Move failures: %s", total_stats['failed'], extra=CONSOLE_EXTRA)
+    logger.info("  • Folders created: %s", total_stats['folders_created'], extra=CONSOLE_EXTRA)
+    if total_stats['cleanup_moved'] > 0:
+        logger.info("  • Cleanup files moved: %s", total_stats['cleanup_moved'], extra=CONSOLE_EXTRA)
+    if total_stats['linked'] > 0:
+        logger.info("  • Duplicates linked: %s (%s reclaimed)", total_stats['linked'],
+                    format_size(total_stats['bytes_reclaimed']), extra=CONSOLE_EXTRA)
+    logger.info("  • Duration: %s", duration_str, extra=CONSOLE_EXTRA)
+
+def start_progress(args, **run_info):
+    """Start the live progress reporter when --progress or --heartbeat is given; returns it (or None)."""
+    if not args.progress and not args.heartbeat:
+        return None
+    progress = ProgressReporter(args.progress_interval, args.progress, args.heartbeat, dry_run=args.dry_run,
+                                **run_info)
+    set_progress(progress)
+    progress.start()
+    return progress
+
+def stop_progress(progress):
+    if progress is not None:
+        set_progress(None)
+        progress.stop()
+
+def batch_main(args):
+    """Headless entry point for --roots/--roots-file: no prompts and no input() calls.
+    Exits with status 1 if any root failed."""
+    roots = list(args.roots or [])
+    if args.roots_file:
+        try:
+            roots.extend(read_roots_file(args.roots_file))
+        except OSError as e:
+            print(f"❌ Could not read roots file {args.roots_file}: {e}")
+            sys.exit(1)
+    roots = [os.path.abspath(root_dir) for root_dir in roots]
+    
+    mode = args.mode or 1
+    logger = setup_logging(args.log_dir, mode, args.dry_run, args.debug, args.quiet_console)
+    start_time = time.time()
+    
+    options = {
+        'mode': mode,
+        'dry_run': args.dry_run,
+        'debug': args.debug,
+        'workers': args.workers,
+        'scan_threads': args.scan_threads,
+        'hash_cache': os.path.abspath(args.hash_cache) if args.hash_cache else None,
+        'no_hash_cache': args.no_hash_cache,
+        'incremental': args.incremental,
+        'manifest': os.path.abspath(args.manifest) if args.manifest else None,
+        'journal': not args.no_journal,
+        'keep_trash': args.keep_trash,
+        'fd_relative': args.fd_relative,
+        'auto_fuzzy': args.auto_fuzzy,
+        'dedup_links': args.dedup_links,
+        'rules': os.path.abspath(args.rules) if args.rules else None,
+        'metrics': bool(args.metrics_out),
+    }
+    processes = args.processes or max(1, min(len(roots), os.cpu_count() or 1))
+    progress = start_progress(args, mode=mode, roots=len(roots))
+    total_stats, failed_roots = run_batch(roots, options, processes, args.log_dir, args.metrics_out)
+    stop_progress(progress)
+    
+    dry_run_text = " (DRY RUN)" if args.dry_run else ""
+    if failed_roots:
+        logger.error("❌ Batch completed with %s failed roots of %s%s", len(failed_roots), len(roots), dry_run_text)
+    else:
+        logger.info("✅ Batch completed: %s roots%s", len(roots), dry_run_text, extra=CONSOLE_EXTRA)
+    log_summary(mode, total_stats, format_duration(time.time() - start_time))
+    shutdown_logging()
+    sys.exit(1 if failed_roots else 0)
+
+def shard_filename(args, filename):
+    """Shards of one root keep their own log, journal and hash cache."""
+    return args.shard.filename(filename) if args.shard else filename
+
+def fixer_config(args):
+    """TemplateFolderFixer config for a single-root run from the command line
+    (mode, root and, for --resume/--rollback, journal come from elsewhere)."""
+    # Without --log-dir these files sit in the root (relative paths, see TemplateFolderFixer)
+    def state_file(path, filename, per_shard=True):
+        if path:
+            return os.path.abspath(path)
+        if per_shard:
+            filename = shard_filename(args, filename)
+        return os.path.join(os.path.abspath(args.log_dir), filename) if args.log_dir else filename
+    
+    return {
+        'dry_run': args.dry_run,
+        'workers': args.workers,
+        'scan_threads': args.scan_threads,
+        'hash_cache': None if args.no_hash_cache else state_file(args.hash_cache, HASH_CACHE_FILENAME),
+        'manifest': state_file(args.manifest, MANIFEST_FILENAME, per_shard=False) if args.incremental else None,
+        'journal': None if args.dry_run or args.no_journal else state_file(args.journal, JOURNAL_FILENAME),
+        'keep_trash': args.keep_trash,
+        'fd_relative': args.fd_relative,
+        'auto_fuzzy': args.auto_fuzzy,
+        'dedup_links': args.dedup_links,
+        'shard': args.shard,
+        'rules': args.rules,
+        'poll_interval': args.poll_interval,
+    }
+
+def open_fixer(args):
+    """Build the fixer for a single-root run: a plan (--apply) or journal
+    (--resume/--rollback) carries its own root and mode, a new run works on
+    the current directory. Prints the problem and exits when the plan or
+    journal cannot be used, or an interrupted run is in the way."""
+    config = fixer_config(args)
+    if args.apply:
+        try:
+            return TemplateFolderFixer.from_plan(args.apply, config)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read plan {args.apply}: {e}")
+            sys.exit(1)
+    
+    if args.resume or args.rollback:
+        # The journal carries the mode and root of the run it recorded
+        journal_path = os.path.abspath(args.journal or os.path.join(args.log_dir or os.getcwd(),
+                                                                    shard_filename(args, JOURNAL_FILENAME)))
+        try:
+            fixer = TemplateFolderFixer.from_journal(journal_path, config)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read journal {journal_path}: {e}")
+            sys.exit(1)
+        try:
+            fixer.pending_state(resume=args.resume)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        return fixer
+    
+    fixer = TemplateFolderFixer(os.getcwd(), {**config, 'mode': get_execution_mode(args)})
+    # An interrupted run must be resumed or rolled back before a new one replaces its journal
+    try:
+        fixer.check_journal()
+    except RuntimeError as e:
+        print(f"❌ {e}.")
+        print("   Use --resume to finish it, --rollback to undo it, or delete the journal to start over.")
+        sys.exit(1)
+    return fixer
+
+def confirm_run(args, fixer):
+    """Safety prompt before a single-root run; returns False if the user cancels."""
+    flush_logging()
+    mode = fixer.config['mode']
+    dry_run_text = " (DRY RUN - No files will be modified)" if args.dry_run else ""
+    print(f"\n{'='*80}")
+    print(f"⚠️  WARNING: This script will organize files in the current directory{dry_run_text}")
+    print(f"Mode: {mode} - {EXECUTION_MODES[mode]}")
+    if fixer.loaded_plan is not None:
+        print(f"Plan: {args.apply} ({len(fixer.loaded_plan.operations)} operations in {fixer.root_dir})")
+    if args.shard:
+        print(f"Shard: {args.shard} (other shards may run on this folder at the same time)")
+    if fixer.journal_state is not None:
+        action_text = "Resume" if args.resume else "Roll back"
+        print(f"{action_text}: {fixer.config['journal']} ({len(fixer.journal_state['operations'])} operations "
+              f"recorded in {fixer.root_dir})")
+    print("Press Enter to continue or Ctrl+C to cancel...")
+    print("="*80)
+    try:
+        input()
+    except KeyboardInterrupt:
+        return False
+    return True
+
 def main():
     """Main function to orchestrate the folder fixing process."""
     # Parse command line arguments
     args = parse_arguments()
     
-    # Get execution mode
-    mode = get_execution_mode(args)
+    # Combine the reports of a sharded run; nothing else happens
+    if args.merge_metrics:
+        try:
+            total_stats = merge_metrics_files(args.merge_metrics, args.metrics_out)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not merge metrics: {e}")
+            sys.exit(1)
+        print(f"📈 Metrics of {len(args.merge_metrics)} shards written: {args.metrics_out}")
+        print(f"📊 Files moved: {total_stats.get('moved', 0)}, Skipped: {total_stats.get('skipped', 0)}, "
+              f"Unmatched: {total_stats.get('unmatched', 0)}")
+        return
+    
+    # Many roots at once run headless on a process pool
+    if args.roots or args.roots_file:
+        batch_main(args)
+        return
+    
+    fixer = open_fixer(args)
+    mode = fixer.config['mode']
+    root_dir = fixer.root_dir
     
     # Setup logging
-    logger = setup_logging(args.log_dir, mode, args.dry_run, args.debug)
+    log_file = log_file_path(args.log_dir)
+    log_file = os.path.join(os.path.dirname(log_file), shard_filename(args, os.path.basename(log_file)))
+    logger = setup_logging(args.log_dir, mode, args.dry_run, args.debug, args.quiet_console, log_file=log_file)
     start_time = time.time()
     
-    # Get current directory
-    root_dir = os.getcwd()
+    logger.info("📂 Working directory: %s", root_dir, extra=CONSOLE_EXTRA)
+    if args.shard:
+        logger.info("🧩 Shard %s: processing its share of the component folders and root files", args.shard,
+                    extra=CONSOLE_EXTRA)
     
-    logger.info(f"[{get_timestamp()}] 📂 Working directory: {root_dir}")
+    # Sorting rules can be changed without rebuilding the .exe
+    if not args.apply and not args.rollback:
+        try:
+            fixer.load_rules()
+        except (OSError, ValueError) as e:
+            logger.error("❌ Could not load sorting rules %s: %s", args.rules or find_rules_file(root_dir), e)
+            shutdown_logging()
+            sys.exit(1)
     
     # Safety prompt (unless disabled)
-    if not args.no_prompt:
-        dry_run_text = " (DRY RUN - No files will be modified)" if args.dry_run else ""
-        print(f"\n{'='*80}")
-        print(f"⚠️  WARNING: This script will organize files in the current directory{dry_run_text}")
-        print(f"Mode: {mode} - {EXECUTION_MODES[mode]}")
-        print("Press Enter to continue or Ctrl+C to cancel...")
-        print("="*80)
-        try:
-            input()
-        except KeyboardInterrupt:
-            logger.info(f"[{get_timestamp()}] ❌ Script cancelled by user")
-            return
+    if not args.no_prompt and not confirm_run(args, fixer):
+        logger.info("❌ Script cancelled by user")
+        return
     
-    # Step 1: Folder-First Isolation - Scan all subfolders
-    logger.info(f"[{get_timestamp()}] 📋 Step 1: Scanning subfolders...")
-    folder_list = scan_folders(root_dir)
+    metrics = RunMetrics() if args.metrics_out else None
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    progress = start_progress(args, root=root_dir, mode=mode, shard=str(args.shard) if args.shard else None)
+    fixer.config.update(metrics=metrics, progress=progress)
     
-    # Step 2: Execute selected mode
-    logger.info(f"[{get_timestamp()}] 🎯 Step 2: Executing Mode {mode}...")
-    total_stats = execute_mode(mode, root_dir, folder_list, args.dry_run)
+    if args.apply:
+        # Apply a reviewed plan: no scanning or matching, only per-operation checks
+        total_stats = fixer.apply()
+    elif args.rollback:
+        # Undo the journaled run, newest operation first
+        total_stats = fixer.rollback()
+    elif args.resume:
+        total_stats = fixer.resume()
+    elif args.watch:
+        # File newly dropped root files until interrupted
+        total_stats = fixer.watch()
+    elif args.plan_out:
+        # Work out every operation without touching files (--plan-out implies --dry-run)
+        new_plan = OperationPlan(root_dir, mode)
+        total_stats = fixer.run(plan=new_plan)
+        try:
+            new_plan.write(args.plan_out)
+            logger.info("📜 Plan written: %s (%s operations)", args.plan_out, len(new_plan.operations),
+                        extra=CONSOLE_EXTRA)
+        except OSError as e:
+            logger.error("❌ Failed to write plan %s: %s", args.plan_out, e)
+    else:
+        total_stats = fixer.run()
+    fixer.close()
+    stop_progress(progress)
     
     # Calculate duration
     end_time = time.time()
     duration = end_time - start_time
-    duration_str = f"{int(duration//60):02d}:{int(duration%60):02d}"
+    duration_str = format_duration(duration)
+    
+    if profiler is not None:
+        profiler.disable()
+        try:
+            profiler.dump_stats(args.profile)
+            logger.info("🔬 Profile written: %s", args.profile, extra=CONSOLE_EXTRA)
+        except OSError as e:
+            logger.error("❌ Failed to write profile %s: %s", args.profile, e)
+    
+    if metrics is not None:
+        try:
+            metrics.write(args.metrics_out, version=__version__, mode=mode, root=root_dir,
+                          shard=str(args.shard) if args.shard else None,
+                          dry_run=args.dry_run, workers=args.workers,
+                          started=datetime.fromtimestamp(start_time).isoformat(),
+                          duration=duration, stats=total_stats)
+            logger.info("📈 Metrics written: %s", args.metrics_out, extra=CONSOLE_EXTRA)
+        except OSError as e:
+            logger.error("❌ Failed to write metrics %s: %s", args.metrics_out, e)
     
     # Final summary
     dry_run_text = " (DRY RUN)" if args.dry_run else ""
-    logger.info(f"[{get_timestamp()}] ✅ Script completed successfully!{dry_run_text}")
-    logger.info(f"[{get_timestamp()}] 📊 Summary:")
-    logger.info(f"[{get_timestamp()}]   • Mode executed: {mode} - {EXECUTION_MODES[mode]}")
-    logger.info(f"[{get_timestamp()}]   • Files moved: {total_stats['moved']}")
-    logger.info(f"[{get_timestamp()}]   • Files skipped: {total_stats['skipped']}")
-    logger.info(f"[{get_timestamp()}]   • Files unmatched: {total_stats['unmatched']}")
-    logger.info(f"[{get_timestamp()}]   • Move failures: {total_stats['failed']}")
-    logger.info(f"[{get_timestamp()}]   • Folders created: {total_stats['folders_created']}")
-    if total_stats['cleanup_moved'] > 0:
-        logger.info(f"[{get_timestamp()}]   • Cleanup files moved: {total_stats['cleanup_moved']}")
-    logger.info(f"[{get_timestamp()}]   • Duration: {duration_str}")
+    logger.info("✅ Script completed successfully!%s", dry_run_text, extra=CONSOLE_EXTRA)
+    log_summary(mode, total_stats, duration_str)
+    shutdown_logging()
     
     log_location = args.log_dir if args.log_dir else "current directory"
     debug_text = " Debug logging was enabled." if args.debug else ""
-    print(f"\n✅ Process completed!{dry_run_text} Check 'template_fixer_log.txt' in {log_location} for detailed logs.{debug_text}")
+    print(f"\n✅ Process completed!{dry_run_text} Check '{os.path.basename(log_file)}' in {log_location} for detailed logs.{debug_text}")
     print(f"📊 Files moved: {total_stats['moved']}, Skipped: {total_stats['skipped']}, Unmatched: {total_stats['unmatched']}")
     
     # Prevent auto-exit in .exe builds
@@ -895,4 +5327,6 @@ def main():
 # =============================================================================
 
 if __name__ == "__main__":
+    # Lets batch worker processes start from a frozen .exe build
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+=============================================================================
+Script Name: benchmark_fixer.py
+Companion to: Template_Folder_fixer.py
+
+Purpose: Development benchmarks for the Template Folder Fixer.
+1. Walker: serial vs read-ahead streaming walk on a latency-injected tree
+2. Logging: per-file overhead of logging in move_file_safely, debug off and on
+3. Rules: file classification throughput of the compiled sorting rules
+4. Fuzzy: per-file suggestion time of the n-gram index vs brute-force edit
+   distance over every folder name
+5. Phases: scan, cleanup, root file sorting and extension sorting per mode on
+   a synthetic production tree, checked against a stored baseline
+
+Requirements: Python 3.11+, Standard libraries only
+=============================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import random
+import logging
+import argparse
+import tempfile
+import fnmatch
+import re
+import tracemalloc
+
+import Template_Folder_fixer as fixer
+
+# =============================================================================
+# TEST TREES
+# =============================================================================
+
+def build_nested_tree(root_dir, dir_count=200, files_per_dir=5, max_depth=6, seed=0):
+    """Create a random nested folder tree with empty files under root_dir."""
+    rng = random.Random(seed)
+    dirs = [root_dir]
+    for index in range(dir_count):
+        parent = rng.choice(dirs)
+        depth = os.path.relpath(parent, root_dir).count(os.sep) + 1
+        if depth >= max_depth:
+            parent = root_dir
+        new_dir = os.path.join(parent, f"sub_{index}")
+        os.makedirs(new_dir)
+        dirs.append(new_dir)
+    for dir_path in dirs:
+        for index in range(files_per_dir):
+            with open(os.path.join(dir_path, f"file_{index}.blend"), 'wb'):
+                pass
+    return dirs
+
+def build_production_tree(root_dir, components=200, junk_dirs=2, junk_depth=3, files_per_component=6,
+                          root_files=300, collisions=40, suffixed=30, seed=0):
+    """Create a root that looks like a production drive.
+
+    Component folders are named TEMPLATE_BASEFIT_VERSION from the fixer's own
+    lists and hold loose files plus nested junk subfolders. Loose root files
+    cover every match type ([FULL], [BASE+VER], [BASE], [NONE]) and some
+    unsupported extensions. `collisions` root files reuse a name already in
+    their component with different content, and `suffixed` components hold
+    `_N` copies next to the original. Returns the component folder names.
+    """
+    rng = random.Random(seed)
+    extensions = list(fixer.SUPPORTED_EXTENSIONS)
+
+    def write(path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(content)
+
+    names = set()
+    while len(names) < components:
+        template = rng.choice(fixer.TEMPLATES).upper()
+        basefit = rng.choice(fixer.BASEFIT_IDS)
+        names.add(f"{template}_{basefit}_{rng.randint(0, 3)}")
+    names = sorted(names)
+
+    loose_files = {}
+    for name in names:
+        folder = os.path.join(root_dir, name)
+        os.makedirs(folder)
+        loose_files[name] = []
+        for index in range(files_per_component):
+            filename = f"{name}_part{index}{rng.choice(extensions)}"
+            write(os.path.join(folder, filename), f"{name} {index}")
+            loose_files[name].append(filename)
+        if rng.random() < 0.3:
+            os.makedirs(os.path.join(folder, rng.choice(fixer.STANDARD_FOLDERS)))
+        for junk in range(junk_dirs):
+            junk_path = os.path.join(folder, *[f"old_{junk}_{level}" for level in range(rng.randint(1, junk_depth))])
+            for index in range(rng.randint(1, files_per_component)):
+                # Some nested files share a name with a loose file in the component
+                if rng.random() < 0.2:
+                    filename = rng.choice(loose_files[name])
+                else:
+                    filename = f"{name}_old{junk}_{index}{rng.choice(extensions)}"
+                write(os.path.join(junk_path, filename), f"nested {junk} {index}")
+
+    for name in rng.sample(names, min(suffixed, len(names))):
+        original = rng.choice(loose_files[name])
+        stem, ext = os.path.splitext(original)
+        for suffix in range(1, rng.randint(2, 4)):
+            write(os.path.join(root_dir, name, f"{stem}_{suffix}{ext}"), f"copy {suffix}")
+
+    for index in range(root_files):
+        name = rng.choice(names)
+        template, basefit, version = name.split('_')
+        kind = rng.random()
+        if kind < 0.25:
+            filename = f"{name}{rng.choice(extensions)}"
+        elif kind < 0.55:
+            filename = f"OTHER{index}_{basefit}_{version}_export{rng.choice(extensions)}"
+        elif kind < 0.75:
+            filename = f"OTHER{index}_{basefit}_9_draft{rng.choice(extensions)}"
+        elif kind < 0.9:
+            filename = f"unsorted_{index}{rng.choice(extensions)}"
+        else:
+            filename = f"{name}_notes_{index}.txt"
+        write(os.path.join(root_dir, filename), f"root {index}")
+
+    for name in rng.sample(names, min(collisions, len(names))):
+        write(os.path.join(root_dir, rng.choice(loose_files[name])), "root copy with different content")
+
+    return names
+
+def tree_digest(root_dir):
+    """Digest of every file path and size under root_dir, to compare outcomes."""
+    digest = hashlib.blake2b(digest_size=16)
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            path = os.path.join(dir_path, file_name)
+            digest.update(f"{os.path.relpath(path, root_dir)}:{os.path.getsize(path)}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+class LatencyInjector:
+    """Patch fixer.scan_directory so every directory read costs extra latency,
+    approximating a round-trip to an SMB/NFS share."""
+
+    def __init__(self, latency_seconds):
+        self.latency_seconds = latency_seconds
+        self._original = fixer.scan_directory
+
+    def _slow_scan(self, dir_path):
+        time.sleep(self.latency_seconds)
+        return self._original(dir_path)
+
+    def __enter__(self):
+        fixer.scan_directory = self._slow_scan
+        return self
+
+    def __exit__(self, *exc_info):
+        fixer.scan_directory = self._original
+
+# =============================================================================
+# BENCHMARKS
+# =============================================================================
+
+def _walk(root_dir, scan_threads=1):
+    """Stream walk_tree over root_dir; return (dirs, files, order digest, peak bytes)."""
+    digest = hashlib.blake2b(digest_size=16)
+    dir_count = file_count = 0
+    tracemalloc.start()
+    try:
+        for entry in fixer.walk_tree(root_dir, lambda name: True, scan_threads):
+            digest.update(f"{entry.relative_path}|{entry.is_dir}\n".encode("utf-8"))
+            if entry.is_dir:
+                dir_count += 1
+            else:
+                file_count += 1
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return dir_count, file_count, digest.hexdigest(), peak
+
+def bench_walker(dir_count, files_per_dir, latency_ms, scan_threads):
+    """Time the serial vs read-ahead streaming walk_tree and check they agree."""
+    with tempfile.TemporaryDirectory() as root_dir:
+        build_nested_tree(root_dir, dir_count, files_per_dir)
+        with LatencyInjector(latency_ms / 1000.0):
+            start = time.perf_counter()
+            serial = _walk(root_dir)
+            serial_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            concurrent = _walk(root_dir, scan_threads)
+            concurrent_time = time.perf_counter() - start
+
+    if serial[:3] != concurrent[:3]:
+        print("❌ Concurrent walker returned different results than the serial walker")
+        return False
+
+    print(f"📁 Walker: {serial[0] + 1} dirs, {serial[1]} files, {latency_ms} ms per read")
+    print(f"  • Serial:     {serial_time:8.3f} s (peak {serial[3] / 1024:.0f} KiB)")
+    print(f"  • Concurrent: {concurrent_time:8.3f} s ({scan_threads} reads in flight, "
+          f"{serial_time / concurrent_time:.1f}x, peak {concurrent[3] / 1024:.0f} KiB)")
+    return True
+
+def _time_moves(file_count):
+    """Move file_count in-memory files with move_file_safely; return seconds per file."""
+    filesystem = fixer.MemoryFilesystem()
+    previous = fixer.set_filesystem(filesystem)
+    try:
+        filesystem.makedirs("/bench/src")
+        filesystem.makedirs("/bench/dst")
+        for index in range(file_count):
+            filesystem.write_file(f"/bench/src/file_{index}.blend", b"")
+        start = time.perf_counter()
+        for index in range(file_count):
+            fixer.move_file_safely(f"/bench/src/file_{index}.blend", f"/bench/dst/file_{index}.blend", "EXT")
+        elapsed = time.perf_counter() - start
+    finally:
+        fixer.set_filesystem(previous)
+    return elapsed / file_count
+
+def bench_logging(file_count):
+    """Time move_file_safely with logging disabled, at INFO and at DEBUG.
+    The moves run on a MemoryFilesystem so the difference is logging cost."""
+    with tempfile.TemporaryDirectory() as log_dir:
+        logging.disable(logging.CRITICAL)
+        baseline = _time_moves(file_count)
+        logging.disable(logging.NOTSET)
+        
+        results = {}
+        for debug in (False, True):
+            fixer.setup_logging(log_dir, debug=debug, quiet_console=True)
+            results[debug] = _time_moves(file_count)
+            fixer.shutdown_logging()
+        logging.getLogger().handlers.clear()
+    
+    print(f"📝 Logging: {file_count} moves through move_file_safely (in-memory filesystem)")
+    print(f"  • No logging: {baseline * 1e6:8.1f} µs/file")
+    for debug, per_file in results.items():
+        label = "Debug on: " if debug else "Debug off:"
+        print(f"  • {label}  {per_file * 1e6:8.1f} µs/file "
+              f"(+{(per_file - baseline) * 1e6:.1f} µs logging)")
+    return True
+
+def _legacy_classify(filename):
+    """Extension lookup as sort_file did it before the rule engine."""
+    _, ext = os.path.splitext(filename)
+    for subfolder, extensions in fixer.EXTENSION_MAPPING.items():
+        if ext.lower() in extensions:
+            return subfolder
+    return None
+
+def _naive_classify(rules, filename):
+    """Evaluate each rule in turn (extensions, then globs, then regexes)."""
+    ext = os.path.splitext(filename)[1].lower()
+    for rule in rules:
+        if (ext in rule['extensions']
+                or any(fnmatch.fnmatch(filename.lower(), glob.lower()) for glob in rule['globs'])
+                or any(re.fullmatch(pattern, filename, re.IGNORECASE | re.DOTALL) for pattern in rule['regex'])):
+            return rule['folder']
+    return None
+
+def _synthetic_rules(rule_count, seed=0):
+    """rule_count rules mixing extensions, globs and regexes."""
+    rng = random.Random(seed)
+    rules = []
+    for index in range(rule_count):
+        rules.append({
+            'folder': f"Folder {index % 8}",
+            'extensions': [f".e{index}x{n}" for n in range(rng.randint(1, 4))],
+            'globs': [f"*_g{index}_*.bin"] if index % 3 == 0 else [],
+            'regex': [rf"r{index}_\d+\.dat"] if index % 4 == 0 else [],
+        })
+    return rules
+
+def _classify_rate(classify, names):
+    start = time.perf_counter()
+    results = [classify(name) for name in names]
+    return results, len(names) / (time.perf_counter() - start)
+
+def bench_rules(file_count, rule_count):
+    """Classification throughput: compiled rules vs the old extension loop on
+    the built-in rules, and vs evaluating rule by rule on a large rule set."""
+    rng = random.Random(0)
+    extensions = list(fixer.SUPPORTED_EXTENSIONS) + ['.txt', '.obj', '.BLEND', '.Png', '']
+    names = [f"MERIDIAN1_U403R_{index % 4}_file{index}{rng.choice(extensions)}" for index in range(file_count)]
+    legacy, legacy_rate = _classify_rate(_legacy_classify, names)
+    compiled, compiled_rate = _classify_rate(fixer.DEFAULT_RULES.classify, names)
+    if legacy != compiled:
+        print("❌ Compiled built-in rules classify differently than the extension loop")
+        return False
+
+    rules = _synthetic_rules(rule_count)
+    synthetic = fixer.SortingRules(rules)
+    kinds = [lambda i: f"file{i}.e{rng.randrange(rule_count)}x0",
+             lambda i: f"part_g{rng.randrange(0, rule_count, 3)}_{i}.bin",
+             lambda i: f"r{rng.randrange(0, rule_count, 4)}_{i}.dat",
+             lambda i: f"unmatched{i}.zzz"]
+    mixed = [kinds[index % 4](index) for index in range(file_count)]
+    naive, naive_rate = _classify_rate(lambda name: _naive_classify(synthetic.rules, name), mixed)
+    engine, engine_rate = _classify_rate(synthetic.classify, mixed)
+    if naive != engine:
+        print("❌ Compiled rules classify differently than rule-by-rule evaluation")
+        return False
+
+    print(f"📐 Rules: {file_count} files")
+    print(f"  • Built-in, extension loop:  {legacy_rate:12,.0f} files/s")
+    print(f"  • Built-in, compiled:        {compiled_rate:12,.0f} files/s ({compiled_rate / legacy_rate:.1f}x)")
+    print(f"  • {rule_count} rules, rule by rule: {naive_rate:12,.0f} files/s")
+    print(f"  • {rule_count} rules, compiled:     {engine_rate:12,.0f} files/s ({engine_rate / naive_rate:.1f}x)")
+    return True
+
+def _synthetic_folder_names(count, rng):
+    """Component folder names in the TEMPLATE_BASEFIT_VERSION_Description layout."""
+    words = ["Girl", "Boy", "Top", "Shirt", "Fitted", "Dress", "Uniform", "Skirt", "Pants", "Long",
+             "Jacket", "Blazer", "Short", "Sleeve", "Pleated", "Sweater", "Polo", "Tunic", "Cardigan"]
+    names = set()
+    while len(names) < count:
+        description = " ".join(rng.choice(words) for _ in range(rng.randint(2, 4)))
+        names.add(f"{rng.choice(fixer.TEMPLATES).upper()}_{rng.choice(fixer.BASEFIT_IDS)}_"
+                  f"{rng.randrange(4)}_{description}")
+    return sorted(names)
+
+def _misspell(name, rng):
+    """Drop, double or swap one character of name."""
+    index = rng.randrange(len(name) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return name[:index] + name[index + 1:]
+    if kind == 1:
+        return name[:index] + name[index] + name[index:]
+    return name[:index] + name[index + 1] + name[index] + name[index + 2:]
+
+def bench_fuzzy(folder_count, file_count, brute_files=5):
+    """Suggestion time per unmatched file: n-gram index vs edit distance to every folder."""
+    rng = random.Random(0)
+    folders = _synthetic_folder_names(folder_count, rng)
+    targets = [rng.choice(folders) for _ in range(file_count)]
+    names = [_misspell(target, rng) for target in targets]
+
+    start = time.perf_counter()
+    index = fixer.FuzzyFolderIndex(folders)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    suggestions = [index.suggest(name) for name in names]
+    index_time = (time.perf_counter() - start) / file_count
+    found = sum(1 for target, found in zip(targets, suggestions) if found and found[0][0] == target)
+
+    start = time.perf_counter()
+    for name in names[:brute_files]:
+        min(folders, key=lambda folder: fixer.edit_distance(name.lower(), folder.lower()))
+    brute_time = (time.perf_counter() - start) / brute_files
+
+    print(f"🔍 Fuzzy: {folder_count} folders, {file_count} misspelt names")
+    print(f"  • Index build:              {build_time * 1000:10.1f} ms")
+    print(f"  • Edit distance, all names: {brute_time * 1000:10.3f} ms/file")
+    print(f"  • N-gram index:             {index_time * 1000:10.3f} ms/file ({brute_time / index_time:,.0f}x)")
+    print(f"  • Top suggestion correct:   {found / file_count:10.1%}")
+    return True
+
+PHASES = ('scan_folders', 'cleanup_subfolders_recursively', 'process_root_files', 'sort_files_in_folder')
+
+def _run_phases(tree_config, mode, fd_relative=False):
+    """Build a fresh tree and run every phase of one mode; return (timings, results).
+    With fd_relative the phases run on a DirFdFilesystem."""
+    timings = {}
+    results = {}
+    with tempfile.TemporaryDirectory() as root_dir:
+        build_production_tree(root_dir, **tree_config)
+        fixer._name_index.clear()
+        fixer._duplicates = fixer.DuplicateDetector()
+        filesystem = fixer.DirFdFilesystem(root_dir) if fd_relative else None
+        previous = fixer.set_filesystem(filesystem) if filesystem is not None else None
+        try:
+            _time_phases(root_dir, mode, timings, results)
+        finally:
+            if filesystem is not None:
+                fixer.set_filesystem(previous)
+                filesystem.close()
+        results['tree'] = tree_digest(root_dir)
+    return timings, results
+
+def _time_phases(root_dir, mode, timings, results):
+    """Run every phase of one mode on root_dir, filling timings and results."""
+    start = time.perf_counter()
+    folder_list = fixer.scan_folders(root_dir)
+    timings['scan_folders'] = time.perf_counter() - start
+    results['folders'] = len(folder_list)
+    folder_paths = [os.path.join(root_dir, name) for name in folder_list]
+
+    if mode in [3, 4]:
+        start = time.perf_counter()
+        cleanup = [fixer.cleanup_subfolders_recursively(path, mode) for path in folder_paths]
+        timings['cleanup_subfolders_recursively'] = time.perf_counter() - start
+        results['cleanup_moved'] = sum(moved for moved, _ in cleanup)
+
+    start = time.perf_counter()
+    rfs_stats = fixer.process_root_files(root_dir, folder_list, mode)
+    timings['process_root_files'] = time.perf_counter() - start
+    results.update(rfs_stats)
+
+    for path in folder_paths:
+        fixer.create_standard_folders(path)
+    start = time.perf_counter()
+    sorted_counts = [fixer.sort_files_in_folder(path, mode) for path in folder_paths]
+    timings['sort_files_in_folder'] = time.perf_counter() - start
+    results['sorted'] = sum(moved for moved, _ in sorted_counts)
+
+def bench_phases(tree_config, baseline_path, repeats=3, tolerance=0.25, update_baseline=False, fd_relative=False):
+    """Time each phase for modes 1-4 (best of `repeats`) and compare with the baseline.
+    Fails if any mode produces a different tree or counts, or if a phase is
+    slower than the baseline by more than `tolerance` (and more than 5 ms)."""
+    logging.disable(logging.CRITICAL)
+    try:
+        measured = {}
+        for mode in [1, 2, 3, 4]:
+            best = {}
+            results = None
+            for _ in range(repeats):
+                timings, run_results = _run_phases(tree_config, mode, fd_relative)
+                if results is not None and run_results != results:
+                    print(f"❌ Mode {mode}: results differ between repeats")
+                    return False
+                results = run_results
+                for phase, seconds in timings.items():
+                    best[phase] = min(seconds, best.get(phase, seconds))
+            measured[str(mode)] = {'timings': best, 'results': results}
+    finally:
+        logging.disable(logging.NOTSET)
+
+    baseline = None
+    if os.path.exists(baseline_path) and not update_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        if baseline.get('config') != tree_config:
+            print(f"❌ Baseline {baseline_path} was recorded with a different tree; rerun with --update-baseline")
+            return False
+
+    print(f"⏱️ Phases: {tree_config['components']} components, {tree_config['root_files']} root files "
+          f"(best of {repeats})")
+    ok = True
+    for mode, current in measured.items():
+        reference = baseline['modes'].get(mode) if baseline else None
+        if reference and reference['results'] != current['results']:
+            print(f"  ❌ Mode {mode}: results changed: {reference['results']} → {current['results']}")
+            ok = False
+        for phase in PHASES:
+            if phase not in current['timings']:
+                continue
+            seconds = current['timings'][phase]
+            line = f"  • Mode {mode} {phase:32} {seconds * 1000:9.1f} ms"
+            if reference and phase in reference['timings']:
+                previous = reference['timings'][phase]
+                line += f"  (baseline {previous * 1000:.1f} ms, {seconds / previous - 1:+.0%})"
+                if seconds > previous * (1 + tolerance) and seconds - previous > 0.005:
+                    line += "  ❌ regression"
+                    ok = False
+            print(line)
+
+    if baseline is None:
+        with open(baseline_path, 'w', encoding='utf-8') as handle:
+            json.dump({'config': tree_config, 'modes': measured}, handle, indent=2, sort_keys=True)
+        print(f"  📌 Baseline written: {baseline_path}")
+    return ok
+
+# =============================================================================
+# SCRIPT ENTRY POINT
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Template Folder Fixer benchmarks")
+    parser.add_argument('benchmark', nargs='?', default='all', choices=['all', 'walker', 'logging', 'rules', 'fuzzy',
+                                                                         'phases'],
+                        help='Benchmark to run (default: all)')
+    parser.add_argument('--dirs', type=int, default=200, help='Directories in the walker tree')
+    parser.add_argument('--files-per-dir', type=int, default=5, help='Files per directory')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='Injected latency per directory read')
+    parser.add_argument('--scan-threads', type=int, default=16, help='Concurrent reads for the concurrent walker')
+    parser.add_argument('--moves', type=int, default=20000, help='Files moved by the logging benchmark')
+    parser.add_argument('--classify', type=int, default=200000, help='File names classified by the rules benchmark')
+    parser.add_argument('--rule-count', type=int, default=60, help='Rules in the synthetic rule set')
+    parser.add_argument('--folders', type=int, default=5000, help='Folder names indexed by the fuzzy benchmark')
+    parser.add_argument('--misspelt', type=int, default=2000, help='Misspelt file names looked up by the fuzzy benchmark')
+    parser.add_argument('--components', type=int, default=200, help='Component folders in the production tree')
+    parser.add_argument('--junk-dirs', type=int, default=2, help='Nested junk subfolder chains per component')
+    parser.add_argument('--junk-depth', type=int, default=3, help='Maximum depth of each junk chain')
+    parser.add_argument('--root-files', type=int, default=300, help='Loose files in the root')
+    parser.add_argument('--collisions', type=int, default=40, help='Root files that collide with a component file')
+    parser.add_argument('--suffixed', type=int, default=30, help='Components holding _N suffixed duplicates')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the production tree')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per mode; the best time is kept')
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           'benchmark_baseline.json'),
+                        help='Baseline file for the phase benchmark (written if missing)')
+    parser.add_argument('--update-baseline', action='store_true', help='Overwrite the baseline with this run')
+    parser.add_argument('--fd-relative', action='store_true',
+                        help='Run the phases on directory descriptors (compare against a path-based baseline)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown per phase (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    ok = True
+    if args.benchmark in ('all', 'walker'):
+        ok = bench_walker(args.dirs, args.files_per_dir, args.latency_ms, args.scan_threads) and ok
+    if args.benchmark in ('all', 'logging'):
+        ok = bench_logging(args.moves) and ok
+    if args.benchmark in ('all', 'rules'):
+        ok = bench_rules(args.classify, args.rule_count) and ok
+    if args.benchmark in ('all', 'fuzzy'):
+        ok = bench_fuzzy(args.folders, args.misspelt) and ok
+    if args.benchmark in ('all', 'phases'):
+        tree_config = {
+            'components': args.components, 'junk_dirs': args.junk_dirs, 'junk_depth': args.junk_depth,
+            'files_per_component': args.files_per_dir, 'root_files': args.root_files,
+            'collisions': args.collisions, 'suffixed': args.suffixed, 'seed': args.seed,
+        }
+        ok = bench_phases(tree_config, args.baseline, args.repeats, args.tolerance, args.update_baseline,
+                          args.fd_relative) and ok
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+
+import Template_Folder_fixer as fixer
+
+
+def test_incoming_copy_of_a_suffixed_file_gets_no_new_suffix(tmp_path):
+    component = f"{fixer.TEMPLATES[0].upper()}_{fixer.BASEFIT_IDS[0]}_0"
+    sorted_dir = tmp_path / component / "Maya-Blender files"
+    sorted_dir.mkdir(parents=True)
+    (sorted_dir / f"{component}_part.blend").write_bytes(b"a" * 4096)
+    (sorted_dir / f"{component}_part_1.blend").write_bytes(b"b" * 4096)
+    incoming = tmp_path / component / f"{component}_part.blend"
+    incoming.write_bytes(b"b" * 4096)
+
+    with fixer.TemplateFolderFixer(str(tmp_path), {'mode': 1, 'dedup_links': True}) as fixer_engine:
+        stats = fixer_engine.run()
+
+    assert not (sorted_dir / f"{component}_part_2.blend").exists()
+    assert os.path.samefile(incoming, sorted_dir / f"{component}_part_1.blend")
+    assert stats['linked'] == 1
+
+
+def test_without_dedup_links_the_copy_takes_the_next_suffix(tmp_path):
+    component = f"{fixer.TEMPLATES[0].upper()}_{fixer.BASEFIT_IDS[0]}_0"
+    sorted_dir = tmp_path / component / "Maya-Blender files"
+    sorted_dir.mkdir(parents=True)
+    (sorted_dir / f"{component}_part.blend").write_bytes(b"a" * 4096)
+    (sorted_dir / f"{component}_part_1.blend").write_bytes(b"b" * 4096)
+    (tmp_path / component / f"{component}_part.blend").write_bytes(b"b" * 4096)
+
+    with fixer.TemplateFolderFixer(str(tmp_path), {'mode': 1}) as fixer_engine:
+        fixer_engine.run()
+
+    assert (sorted_dir / f"{component}_part_2.blend").read_bytes() == b"b" * 4096
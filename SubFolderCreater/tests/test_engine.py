@@ -0,0 +1,63 @@
+import logging
+import threading
+
+import benchmark_fixer
+import Template_Folder_fixer as fixer
+
+
+class RecordList(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def build_roots(tmp_path, name, seed):
+    roots = []
+    for copy in ("expected", "actual"):
+        root = tmp_path / copy / name
+        root.mkdir(parents=True)
+        benchmark_fixer.build_production_tree(str(root), components=30, root_files=60, collisions=10,
+                                              suffixed=5, seed=seed)
+        roots.append(str(root))
+    return roots
+
+
+def test_fixers_run_side_by_side(tmp_path):
+    jobs = []
+    for index, mode in enumerate([3, 4]):
+        expected, actual = build_roots(tmp_path, f"root{index}", index)
+        fixer.execute_mode(mode, expected, fixer.scan_folders(expected))
+        handler = RecordList()
+        logger = logging.getLogger(f"test_engine.root{index}")
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        logger.addHandler(handler)
+        engine = fixer.TemplateFolderFixer(actual, {'mode': mode, 'workers': 4}, logger)
+        jobs.append((engine, expected, actual, handler))
+
+    # Both fixers plan and then run at the same time, each on worker threads
+    barrier = threading.Barrier(len(jobs))
+    results = {}
+
+    def work(engine):
+        barrier.wait()
+        engine.plan()
+        results[engine.root_dir] = engine.run()
+
+    threads = [threading.Thread(target=work, args=(engine,)) for engine, _, _, _ in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for engine, expected, actual, handler in jobs:
+        engine.close()
+        assert results[engine.root_dir]['failed'] == 0
+        assert benchmark_fixer.tree_digest(actual) == benchmark_fixer.tree_digest(expected)
+        messages = [record.getMessage() for record in handler.records if record.name == fixer.__name__]
+        assert any(engine.root_dir in message for message in messages)
+        other_roots = [other.root_dir for other, _, _, _ in jobs if other is not engine]
+        assert not any(root in message for message in messages for root in other_roots)
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+import Template_Folder_fixer as fixer
+
+
+def random_name(rng):
+    parts = [rng.choice(fixer.TEMPLATES[:30]), rng.choice(fixer.BASEFIT_IDS[:25])]
+    if rng.random() < 0.8:
+        parts.append(str(rng.randint(0, 12)))
+    if rng.random() < 0.4:
+        parts.append(rng.choice(["Thing", "final", "v2", "x", ""]))
+    name = rng.choice(["_", "_", "-", " "]).join(parts)
+    return rng.choice([name, name.upper(), name.lower(), f" {name} "])
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_folder_matcher_agrees_with_linear_matching(seed):
+    rng = random.Random(seed)
+    folders = [random_name(rng) for _ in range(150)]
+    files = [random_name(rng) + rng.choice([".fbx", ".glb", ".zprj", ".blend"]) for _ in range(400)]
+    files += [folder + ".fbx" for folder in rng.sample(folders, 50)]
+    files += ["notes.txt", "unsorted_1.ma", "a_b.fbx", "x__1.fbx", "U101.fbx"]
+
+    matcher = fixer.FolderMatcher(folders)
+    match_types = set()
+    for filename in files:
+        expected = fixer.find_matching_folder(filename, folders)
+        assert matcher.match(filename) == expected, filename
+        match_types.add(expected[1])
+    assert match_types == {"FULL", "BASE+VER", "BASE", "NONE"}
+
+
+def test_first_folder_wins_on_ties():
+    folders = ["ABBY1_U101_0_b", "ABBY1_U101_0_a"]
+    assert fixer.FolderMatcher(folders).match("ABBY1_U101_0_x.fbx") == ("ABBY1_U101_0_b", "BASE+VER")
+    assert fixer.find_matching_folder("ABBY1_U101_0_x.fbx", folders) == ("ABBY1_U101_0_b", "BASE+VER")
+
+
+def test_scanned_folders_tie_by_name(tmp_path):
+    for name in ["ABBY1_U101_0_b", "ABBY1_U101_0_c", "ABBY1_U101_0_a"]:
+        (tmp_path / name).mkdir()
+    folders = fixer.scan_folders(str(tmp_path))
+    assert folders == ["ABBY1_U101_0_a", "ABBY1_U101_0_b", "ABBY1_U101_0_c"]
+    assert fixer.FolderMatcher(folders).match("ABBY1_U101_0_x.fbx") == ("ABBY1_U101_0_a", "BASE+VER")
+
+
+@pytest.mark.parametrize("folders, filename, expected", [
+    # A basefit ID only matches itself, not a longer ID it is a prefix of
+    (["ABBY1_U101RSH_0"], "ABBY1_U101_0.fbx", (None, "NONE")),
+    # Versions are compared whole: 1 is not 10
+    (["ABBY1_U101_10"], "ABBY1_U101_1_x.fbx", ("ABBY1_U101_10", "BASE")),
+    (["ABBY1_U101_10", "ABBY1_U101_1"], "ABBY1_U101_1_x.fbx", ("ABBY1_U101_1", "BASE+VER")),
+    # A folder of the file's own template wins over an earlier one
+    (["ACACIA1_U101_0", "ABBY1_U101_0"], "ABBY1_U101_0_x.fbx", ("ABBY1_U101_0", "BASE+VER")),
+])
+def test_matching_compares_parsed_names(folders, filename, expected):
+    assert fixer.find_matching_folder(filename, folders) == expected
+    assert fixer.FolderMatcher(folders).match(filename) == expected
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+import benchmark_fixer
+import Template_Folder_fixer as fixer
+
+
+def build_root(tmp_path, mode):
+    root = tmp_path / "root"
+    root.mkdir()
+    benchmark_fixer.build_production_tree(str(root), components=20, root_files=80, collisions=15,
+                                          suffixed=10, seed=mode)
+    return str(root)
+
+
+def run(root, mode, journal, **options):
+    return fixer.execute_mode(mode, root, fixer.scan_folders(root), journal=journal, **options)
+
+
+@pytest.mark.parametrize("mode", sorted(fixer.EXECUTION_MODES))
+def test_rollback_restores_the_tree(tmp_path, mode):
+    root = build_root(tmp_path, mode)
+    before = benchmark_fixer.tree_digest(root)
+    journal = str(tmp_path / "journal.jsonl")
+
+    stats = run(root, mode, journal, keep_trash=True)
+    assert stats['moved'] > 0
+    assert benchmark_fixer.tree_digest(root) != before
+
+    stats = fixer.rollback_journal(journal, fixer.OperationJournal.read(journal))
+
+    assert stats['failed'] == 0
+    assert benchmark_fixer.tree_digest(root) == before
+    assert not os.path.exists(os.path.join(root, fixer.JOURNAL_TRASH_DIRNAME))
+    assert fixer.OperationJournal.read(journal)['rolled_back']
+
+
+@pytest.mark.parametrize("mode", [2, 4])
+def test_interrupted_run_rolls_back_without_keep_trash(tmp_path, monkeypatch, mode):
+    root = build_root(tmp_path, mode)
+    before = benchmark_fixer.tree_digest(root)
+    journal = str(tmp_path / "journal.jsonl")
+
+    # The process dies before the end marker is written
+    monkeypatch.setattr(fixer.OperationJournal, 'finish', fixer.OperationJournal.close)
+    run(root, mode, journal)
+    state = fixer.OperationJournal.read(journal)
+    assert not state['finished']
+
+    stats = fixer.rollback_journal(journal, state)
+
+    assert stats['failed'] == 0
+    assert benchmark_fixer.tree_digest(root) == before
+
+
+def test_finished_run_empties_the_trash(tmp_path):
+    root = build_root(tmp_path, 4)
+    journal = str(tmp_path / "journal.jsonl")
+
+    run(root, 4, journal)
+
+    state = fixer.OperationJournal.read(journal)
+    assert any(operation.get('overwrite') for operation in state['operations'])
+    assert state['trash_emptied']
+    assert not os.path.exists(os.path.join(root, fixer.JOURNAL_TRASH_DIRNAME))
+
+    stats = fixer.rollback_journal(journal, state)
+
+    assert stats['failed'] == 0
+    assert stats['moved'] > 0
+
+
+def test_keep_trash_keeps_overwritten_files(tmp_path):
+    root = build_root(tmp_path, 4)
+    journal = str(tmp_path / "journal.jsonl")
+
+    run(root, 4, journal, keep_trash=True)
+
+    state = fixer.OperationJournal.read(journal)
+    replaced = [operation for operation in state['operations']
+                if operation['op'] == 'purge' or operation.get('overwrite')]
+    assert replaced
+    assert not state['trash_emptied']
+    for operation in replaced:
+        assert os.path.isfile(os.path.join(state['header']['trash'], operation['trash']))
+
+
+def test_dry_run_rollback_changes_nothing(tmp_path):
+    root = build_root(tmp_path, 1)
+    journal = str(tmp_path / "journal.jsonl")
+    run(root, 4, journal, keep_trash=True)
+    after = benchmark_fixer.tree_digest(root)
+
+    stats = fixer.rollback_journal(journal, fixer.OperationJournal.read(journal), dry_run=True)
+
+    assert stats['moved'] > 0
+    assert benchmark_fixer.tree_digest(root) == after
+    assert not fixer.OperationJournal.read(journal)['rolled_back']
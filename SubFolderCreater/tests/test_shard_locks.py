@@ -0,0 +1,56 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+
+import Template_Folder_fixer as fixer
+
+
+def write_lock(locks, filename, host, pid):
+    os.makedirs(locks.lock_dir, exist_ok=True)
+    lock_path = locks._lock_path(filename)
+    with open(lock_path, 'w', encoding='utf-8') as handle:
+        json.dump({'file': filename, 'shard': '2/2', 'host': host, 'pid': pid, 'since': 'earlier'}, handle)
+    return lock_path
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_lock_of_a_dead_process_is_taken_over(tmp_path):
+    locks = fixer.ShardLocks(str(tmp_path), fixer.ShardSpec(1, 2))
+    write_lock(locks, 'a.fbx', socket.gethostname(), dead_pid())
+
+    with locks.claim('a.fbx') as owned:
+        assert owned
+    locks.close()
+    assert not os.path.exists(locks.lock_dir)
+
+
+def test_live_lock_is_respected_and_reported(tmp_path):
+    locks = fixer.ShardLocks(str(tmp_path), fixer.ShardSpec(1, 2))
+    lock_path = write_lock(locks, 'a.fbx', socket.gethostname(), os.getppid())
+
+    with locks.claim('a.fbx') as owned:
+        assert not owned
+    assert os.path.exists(lock_path)
+    assert locks.report() == 1
+    locks.close()
+    assert os.path.exists(lock_path)
+
+
+def test_old_lock_from_another_host_is_taken_over(tmp_path):
+    locks = fixer.ShardLocks(str(tmp_path), fixer.ShardSpec(1, 2))
+    lock_path = write_lock(locks, 'Folder' + os.sep, 'other-host', 1)
+    with locks.claim('Folder' + os.sep) as owned:
+        assert not owned
+
+    old = os.stat(lock_path).st_mtime - fixer.ShardLocks.STALE_AFTER - 60
+    os.utime(lock_path, (old, old))
+    with locks.claim('Folder' + os.sep) as owned:
+        assert owned
+    assert not os.listdir(locks.lock_dir)
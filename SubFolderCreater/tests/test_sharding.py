@@ -0,0 +1,34 @@
+import os
+
+import Template_Folder_fixer as fixer
+
+
+def test_mode_3_shards_see_the_root_from_before_any_shard_filed_it(tmp_path):
+    # Folder "b" matches the root file b.fbx; folder "a" holds a nested copy of that name
+    names = [f"{fixer.TEMPLATES[i].upper()}_{fixer.BASEFIT_IDS[i]}_0" for i in range(20)]
+    shard_a, shard_b = fixer.ShardSpec(1, 2), fixer.ShardSpec(2, 2)
+    folder_a = next(name for name in names if shard_a.owns(name))
+    folder_b = next(name for name in names if shard_b.owns(name))
+
+    def build(root):
+        os.makedirs(root / folder_a / "old")
+        os.makedirs(root / folder_b)
+        (root / folder_a / "old" / f"{folder_b}.fbx").write_text("nested")
+        (root / f"{folder_b}.fbx").write_text("root")
+
+    def listing(root):
+        return sorted(os.path.relpath(os.path.join(dir_path, name), root)
+                      for dir_path, _, file_names in os.walk(root) for name in file_names)
+
+    single = tmp_path / "single"
+    build(single)
+    fixer.execute_mode(3, str(single), fixer.scan_folders(str(single)))
+
+    # Shard b files the root file before shard a cleans its folder
+    sharded = tmp_path / "sharded"
+    build(sharded)
+    for shard in (shard_b, shard_a):
+        fixer.execute_mode(3, str(sharded), fixer.scan_folders(str(sharded)), shard=shard)
+
+    assert listing(sharded) == listing(single)
+    assert not os.path.exists(sharded / fixer.SHARD_LOCK_DIRNAME)
@@ -0,0 +1,37 @@
+import pytest
+
+import Template_Folder_fixer as fixer
+
+
+def rules(*regexes):
+    return [{'folder': f"Folder {index}", 'regex': [regex]} for index, regex in enumerate(regexes)]
+
+
+def test_patterns_are_combined():
+    sorting_rules = fixer.SortingRules(rules(r"render_\d+\.exr", r"(scene|shot)_\w+\.txt"))
+    assert sorting_rules.classify("render_12.exr") == "Folder 0"
+    assert sorting_rules.classify("SHOT_a.txt") == "Folder 1"
+    assert sorting_rules.classify("notes.txt") is None
+
+
+@pytest.mark.parametrize("regexes", [
+    [r"(?P<name>a+)\.txt", r"(?P<name>b+)\.txt"],
+    [r"(a)\1\.txt"],
+    [r"(a)?(?(1)b|c)\.txt"],
+])
+def test_group_names_and_references_are_rejected(regexes):
+    with pytest.raises(ValueError, match="rule 1: pattern"):
+        fixer.SortingRules(rules(*regexes))
+
+
+def test_escaped_backslash_before_a_digit_is_allowed():
+    sorting_rules = fixer.SortingRules(rules(r"a\\1\.txt"))
+    assert sorting_rules.classify("a\\1.txt") == "Folder 0"
+
+
+def test_patterns_that_cannot_be_combined_name_the_rule_file(tmp_path):
+    rule_file = tmp_path / "rules.toml"
+    rule_file.write_text('[[rules]]\nfolder = "A"\nregex = ["x"]\n\n'
+                         '[[rules]]\nfolder = "B"\nregex = ["(?i)y"]\n', encoding='utf-8')
+    with pytest.raises(ValueError, match="rules.toml"):
+        fixer.SortingRules.load(str(rule_file))
@@ -0,0 +1,50 @@
+import os
+import random
+
+import pytest
+
+import Template_Folder_fixer as fixer
+
+
+def build_tree(root, dir_count=60, files_per_dir=4, max_depth=5, seed=0):
+    rng = random.Random(seed)
+    directories = [root]
+    for index in range(dir_count):
+        parent = rng.choice([path for path in directories if path.count(os.sep) - root.count(os.sep) < max_depth])
+        path = os.path.join(parent, f"dir_{index}")
+        os.mkdir(path)
+        directories.append(path)
+    for path in directories:
+        for index in range(files_per_dir):
+            with open(os.path.join(path, f"file_{index}.fbx"), 'w') as handle:
+                handle.write("x")
+
+
+def walk(folder_path, scan_threads):
+    entries = fixer.walk_tree(folder_path, lambda name: True, scan_threads)
+    return [entry.path for entry in entries if not entry.is_dir]
+
+
+@pytest.mark.parametrize("scan_threads", [1, 4])
+def test_walk_lists_each_directory_once_without_stat_calls(tmp_path, monkeypatch, scan_threads):
+    build_tree(str(tmp_path))
+    directories = sum(1 for _ in os.walk(tmp_path))
+    files = sum(len(file_names) for _, _, file_names in os.walk(tmp_path))
+
+    calls = {'scandir': 0, 'stat': 0}
+
+    def counting(name):
+        original = getattr(os, name)
+
+        def counted(*args, **kwargs):
+            calls['stat' if name in ('stat', 'lstat') else name] += 1
+            return original(*args, **kwargs)
+        return counted
+
+    for name in ('scandir', 'stat', 'lstat'):
+        monkeypatch.setattr(os, name, counting(name))
+    walked = walk(str(tmp_path), scan_threads)
+    monkeypatch.undo()
+
+    assert len(walked) == files
+    assert calls == {'scandir': directories, 'stat': 0}